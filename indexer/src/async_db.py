@@ -0,0 +1,113 @@
+"""
+IAsyncDB Implementation using motor package
+"""
+import os
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import motor.motor_asyncio
+from dotenv import load_dotenv
+from pymongo.errors import BulkWriteError
+from pymongo.write_concern import WriteConcern
+
+from db import check_environ, get_bulk_operations, get_upserted_count
+from interfaces.iasyncdb import IAsyncDB
+
+load_dotenv()
+
+
+class AsyncDB(IAsyncDB):
+    """
+    @inheritdoc IAsyncDB
+
+    The client binds to the event loop that it is first used on, so all of the
+    calls must be made from the same loop, e.g. the `IOLoop`.
+    """
+
+    def __init__(self):
+        check_environ("MONGO_URI")
+        self.client = motor.motor_asyncio.AsyncIOMotorClient(os.getenv("MONGO_URI"))
+
+    def _get_collection(self, database_name: str, collection_name: str):
+        return self.client[database_name][collection_name]
+
+    async def put_item(
+        self, item: Any, database_name: str, collection_name: str
+    ) -> None:
+        collection = self._get_collection(database_name, collection_name)
+        await collection.replace_one({"_id": item["_id"]}, item, upsert=True)
+
+    # pylint: disable=too-many-arguments
+    async def put_items_bulk(
+        self,
+        items: List[Any],
+        database_name: str,
+        collection_name: str,
+        batch_size: int = 1000,
+        write_concern: Optional[Dict] = None,
+        overwrite: bool = False,
+    ) -> Dict[str, int]:
+        collection = self._get_collection(database_name, collection_name)
+        if write_concern is not None:
+            collection = collection.with_options(
+                write_concern=WriteConcern(**write_concern)
+            )
+
+        counts = {"inserted": 0, "duplicates": 0}
+
+        for start in range(0, len(items), batch_size):
+            batch = items[start : start + batch_size]
+
+            try:
+                result = await collection.bulk_write(
+                    get_bulk_operations(batch, overwrite), ordered=False
+                )
+                upserted = result.upserted_count
+            except BulkWriteError as e:
+                upserted = get_upserted_count(e)
+
+            counts["inserted"] += upserted
+            counts["duplicates"] += len(batch) - upserted
+
+        return counts
+
+    async def get_item(
+        self,
+        identifier: str,
+        database_name: str,
+        collection_name: str,
+        projection: Optional[List[str]] = None,
+    ) -> Any:
+        collection = self._get_collection(database_name, collection_name)
+        return await collection.find_one({"_id": identifier}, projection)
+
+    # pylint: disable=too-many-arguments
+    async def iter_batches(
+        self,
+        database_name: str,
+        collection_name: str,
+        options: Optional[Dict] = None,
+        batch_size: int = 1000,
+        projection: Optional[List[str]] = None,
+    ) -> AsyncIterator[List[Any]]:
+        options = options or {}
+
+        cursor = self._get_collection(database_name, collection_name).find(
+            options.get("query_clause", {}),
+            projection,
+            batch_size=batch_size,
+            allow_disk_use=True,
+        )
+
+        if "sort" in options:
+            cursor = cursor.sort(
+                options["sort"]["sort_by"], options["sort"]["direction"]
+            )
+
+        try:
+            while True:
+                batch = await cursor.to_list(length=batch_size)
+                if len(batch) == 0:
+                    return
+                yield batch
+        finally:
+            await cursor.close()
@@ -0,0 +1,353 @@
+"""
+Local stand-in for the Covalent API. Serves the transactions, log events and
+latest block endpoints from recorded or synthetic fixtures, and can inject
+latency, rate limiting (429) and `error: true` payloads.
+
+Run it on its own with
+
+`python -m benchmarks.covalent_server --transactions 10000 --port 8545`
+
+and point the extractor at it with `COVALENT_API_URI=http://localhost:8545/v1`.
+"""
+import argparse
+import json
+import random
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+TRANSFER_EVENT = "0xddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef"
+
+ZERO_ADDRESS = "0x0000000000000000000000000000000000000000"
+
+
+def _topic(value: int) -> str:
+    return f"0x{value:064x}"
+
+
+def _address(value: int) -> str:
+    return f"0x{value:040x}"
+
+
+def synthetic_transactions(
+    count: int,
+    address: str,
+    start_block: int = 12_000_000,
+    transactions_per_block: int = 3,
+    holders: int = 500,
+) -> List[Any]:
+    """
+    Makes ERC721 mints and transfers of `address`, shaped like the items of the
+    transactions endpoint, with decoded log events.
+
+    Args:
+        count (int): number of transactions.
+        address (str): address of the contract that emits the events.
+        start_block (int): block of the first transaction.
+        transactions_per_block (int): transactions in each block.
+        holders (int): number of distinct addresses that trade the tokens.
+
+    Returns:
+        List[Any]: transactions, in ascending block order.
+    """
+
+    # pylint: disable=too-many-locals
+
+    address = address.lower()
+    rng = random.Random(count)
+    owners: Dict[int, str] = {}
+    genesis = datetime(2021, 5, 1)
+    transactions = []
+
+    for ix in range(count):
+        block_height = start_block + ix // transactions_per_block
+        block_signed_at = (genesis + timedelta(seconds=13 * ix)).strftime(
+            "%Y-%m-%dT%H:%M:%SZ"
+        )
+        tx_hash = _topic(ix)
+
+        # * every third transaction mints a new token
+        token_id = rng.randrange(len(owners)) if owners and ix % 3 else len(owners)
+        from_ = owners.get(token_id, ZERO_ADDRESS)
+        to_ = _address(rng.randrange(1, holders + 1))
+        owners[token_id] = to_
+
+        params = [
+            ("from", "address", from_),
+            ("to", "address", to_),
+            ("tokenId", "uint256", str(token_id)),
+        ]
+        transactions.append(
+            {
+                "block_signed_at": block_signed_at,
+                "block_height": block_height,
+                "tx_hash": tx_hash,
+                "tx_offset": ix % transactions_per_block,
+                "successful": True,
+                "from_address": to_,
+                "to_address": address,
+                "value": "0",
+                "log_events": [
+                    {
+                        "block_signed_at": block_signed_at,
+                        "block_height": block_height,
+                        "tx_offset": ix % transactions_per_block,
+                        "log_offset": 0,
+                        "tx_hash": tx_hash,
+                        "raw_log_topics": [
+                            TRANSFER_EVENT,
+                            _topic(int(from_, 16)),
+                            _topic(int(to_, 16)),
+                            _topic(token_id),
+                        ],
+                        "sender_address": address,
+                        "raw_log_data": None,
+                        "decoded": {
+                            "name": "Transfer",
+                            "signature": "Transfer(indexed address from,"
+                            " indexed address to, indexed uint256 tokenId)",
+                            "params": [
+                                {
+                                    "name": name,
+                                    "type": type_,
+                                    "indexed": True,
+                                    "decoded": True,
+                                    "value": value,
+                                }
+                                for name, type_, value in params
+                            ],
+                        },
+                    }
+                ],
+            }
+        )
+
+    return transactions
+
+
+def load_fixture(filename: str) -> List[Any]:
+    """
+    Loads recorded transactions. The file holds either a list of transactions,
+    or recorded transactions endpoint responses (one json document per line).
+
+    Args:
+        filename (str): path to the fixture.
+
+    Returns:
+        List[Any]: transactions, in ascending block order.
+    """
+
+    with open(filename, "r", encoding="utf-8") as f:
+        content = f.read()
+
+    try:
+        transactions = json.loads(content)
+    except ValueError:
+        transactions = []
+        for line in content.splitlines():
+            if line.strip():
+                transactions.extend(json.loads(line)["data"]["items"])
+
+    return sorted(transactions, key=lambda txn: (txn["block_height"], txn["tx_offset"]))
+
+
+class Faults:
+    """What the server injects into its responses"""
+
+    def __init__(
+        self, latency: float = 0.0, rate_429: float = 0.0, rate_error: float = 0.0
+    ):
+        self.latency = latency
+        self.rate_429 = rate_429
+        self.rate_error = rate_error
+
+
+class CovalentServer(ThreadingHTTPServer):
+    """Serves the fixtures. Transactions must be in ascending block order."""
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        port: int,
+        transactions: List[Any],
+        faults: Optional[Faults] = None,
+        chain_id: int = 1,
+    ):
+        super().__init__(("127.0.0.1", port), CovalentRequestHandler)
+
+        self.transactions = transactions
+        self.faults = Faults() if faults is None else faults
+        self.chain_id = chain_id
+        self.log_events = [event for txn in transactions for event in txn["log_events"]]
+        # * the latest block, one after the last transaction unless it is set
+        self.head = transactions[-1]["block_height"] + 1
+        # * paths of the requests that were received, in order
+        self.requests: List[str] = []
+
+    def get_uri(self) -> str:
+        """
+        Returns:
+            str: value for the COVALENT_API_URI environment variable.
+        """
+        return f"http://127.0.0.1:{self.server_port}/v1"
+
+
+class CovalentRequestHandler(BaseHTTPRequestHandler):
+    """Routes the covalent endpoints that the extractors use"""
+
+    server: CovalentServer
+
+    def _send(self, status: int, payload: Any, headers: Optional[Dict] = None) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_data(self, items: List[Any], page_number: int, has_more: bool) -> None:
+        now = datetime.utcnow()
+        self._send(
+            200,
+            {
+                "data": {
+                    "updated_at": now.strftime("%Y-%m-%dT%H:%M:%S.%fZ"),
+                    "next_update_at": (now + timedelta(minutes=5)).strftime(
+                        "%Y-%m-%dT%H:%M:%S.%fZ"
+                    ),
+                    "quote_currency": "USD",
+                    "chain_id": self.server.chain_id,
+                    "items": items,
+                    "pagination": {
+                        "has_more": has_more,
+                        "page_number": page_number,
+                        "page_size": len(items),
+                        "total_count": None,
+                    },
+                },
+                "error": False,
+                "error_message": None,
+                "error_code": None,
+            },
+        )
+
+    def _inject_faults(self) -> bool:
+        """
+        Returns:
+            bool: True if a fault was sent instead of the response.
+        """
+
+        faults = self.server.faults
+
+        if faults.latency:
+            time.sleep(faults.latency)
+
+        if random.random() < faults.rate_429:
+            self._send(429, {"error": True}, {"Retry-After": "1"})
+            return True
+
+        if random.random() < faults.rate_error:
+            self._send(
+                200,
+                {
+                    "data": None,
+                    "error": True,
+                    "error_message": "Injected error",
+                    "error_code": 500,
+                },
+            )
+            return True
+
+        return False
+
+    # pylint: disable=invalid-name
+    def do_GET(self):
+        """Serves the fixtures"""
+
+        self.server.requests.append(self.path)
+
+        if self._inject_faults():
+            return
+
+        url = urlparse(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        parts = [part for part in url.path.split("/") if part]
+        page_number = int(query.get("page-number", 0))
+        page_size = int(query.get("page-size", 100))
+
+        if parts[2:4] == ["block_v2", "latest"]:
+            self._send_data([{"height": self.server.head}], 0, False)
+
+        elif parts[2] == "address" and parts[4] == "transactions_v2":
+            items = self.server.transactions
+            if query.get("block-signed-at-asc", "false") == "false":
+                items = items[::-1]
+            page = items[page_number * page_size : (page_number + 1) * page_size]
+            has_more = (page_number + 1) * page_size < len(items)
+            self._send_data(page, page_number, has_more)
+
+        elif parts[2:4] == ["events", "address"]:
+            starting_block = int(query["starting-block"])
+            ending_block = int(query["ending-block"])
+            items = [
+                event
+                for event in self.server.log_events
+                if starting_block <= event["block_height"] <= ending_block
+            ]
+            page = items[page_number * page_size : (page_number + 1) * page_size]
+            has_more = (page_number + 1) * page_size < len(items)
+            self._send_data(page, page_number, has_more)
+
+        else:
+            self._send(404, {"error": True})
+
+    def log_message(self, *_):
+        pass
+
+
+def serve(port: int, transactions: List[Any], faults: Optional[Faults] = None) -> None:
+    """
+    Serves until the process is terminated.
+
+    Args:
+        port (int): port to listen on.
+        transactions (List[Any]): fixtures, in ascending block order.
+        faults (Optional[Faults]): what to inject into the responses.
+    """
+
+    with CovalentServer(port, transactions, faults) as server:
+        server.serve_forever()
+
+
+def main():
+    """Serves synthetic or recorded fixtures"""
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n", maxsplit=1)[0])
+    parser.add_argument("--port", type=int, default=8545)
+    parser.add_argument("--address", default="0x" + "ab" * 20)
+    parser.add_argument("--transactions", type=int, default=10_000)
+    parser.add_argument("--fixture", help="recorded transactions, overrides the above")
+    parser.add_argument("--latency", type=float, default=0.0, help="in seconds")
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    parser.add_argument("--rate-error", type=float, default=0.0)
+    args = parser.parse_args()
+
+    if args.fixture:
+        transactions = load_fixture(args.fixture)
+    else:
+        transactions = synthetic_transactions(args.transactions, args.address)
+
+    serve(
+        args.port,
+        transactions,
+        Faults(args.latency, args.rate_429, args.rate_error),
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""
+Extract throughput benchmark. Runs a full history extraction against the local
+Covalent stand-in server and reports pages/sec, txns/sec, retries and peak RSS.
+
+In `src`, run
+
+`python -m benchmarks.extract_benchmark --transactions 20000 --latency 0.2`
+
+The stand-in server runs in its own process, so that the peak RSS is the
+extractor's alone.
+"""
+import argparse
+import json
+import os
+import resource
+import socket
+import sys
+import time
+from multiprocessing import Process
+
+from benchmarks.covalent_server import (
+    Faults,
+    load_fixture,
+    serve,
+    synthetic_transactions,
+)
+from benchmarks.memory_db import MemoryDB
+
+ADDRESS = "0x" + "ab" * 20
+NETWORK_ID = 1
+
+
+def _get_free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_for_server(port: int, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1):
+                return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.05)
+
+
+def _get_peak_rss_mb() -> float:
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # * kilobytes on linux, bytes on macos
+    return peak_rss / (1 << 20) if sys.platform == "darwin" else peak_rss / (1 << 10)
+
+
+def run(args: argparse.Namespace) -> dict:
+    """
+    Starts the stand-in server, runs a single full extraction and tears the
+    server down.
+
+    Returns:
+        dict: the benchmark report.
+    """
+
+    # pylint: disable=too-many-locals
+
+    if args.fixture:
+        transactions = load_fixture(args.fixture)
+    else:
+        transactions = synthetic_transactions(args.transactions, ADDRESS)
+
+    port = _get_free_port()
+    server = Process(
+        target=serve,
+        args=(port, transactions, Faults(args.latency, args.rate_429, args.rate_error)),
+        daemon=True,
+    )
+    server.start()
+
+    try:
+        _wait_for_server(port)
+
+        os.environ["COVALENT_API_URI"] = f"http://127.0.0.1:{port}/v1"
+        os.environ.setdefault("COVALENT_API_KEY", "benchmark")
+        os.environ["COVALENT_RATE_LIMIT"] = str(args.rate_limit)
+
+        # pylint: disable=import-outside-toplevel
+        from config import Config
+        from extract.main import Extract
+
+        from db import DB
+        from sqlite_db import SqliteDB
+
+        config = Config(ADDRESS, "benchmark.log", "", NETWORK_ID)
+        if args.mongo:
+            db = DB()
+        elif args.sqlite:
+            db = SqliteDB(args.sqlite)
+        else:
+            db = MemoryDB()
+        extract = Extract(
+            config,
+            pages_in_flight=args.pages_in_flight,
+            flush_every_pages=args.flush_every_pages,
+            db=db,
+        )
+
+        # * fixtures are no longer needed by this process
+        del transactions
+        rss_before = _get_peak_rss_mb()
+
+        start = time.monotonic()
+        extract.extract()
+        extract.flush()
+        elapsed = time.monotonic() - start
+    finally:
+        server.terminate()
+        server.join()
+
+    stats = extract._covalent.get_stats()  # pylint: disable=protected-access
+    # * requests that succeeded, i.e. pages
+    pages = stats["requests"] - stats["retries"] - stats["failures"]
+    extracted = sum(
+        1
+        for _ in db.iter_items(
+            "ethereum-indexer", f"{ADDRESS}-{NETWORK_ID}", projection=["_id"]
+        )
+    )
+
+    return {
+        "seconds": round(elapsed, 3),
+        "pages": pages,
+        "pages_per_sec": round(pages / elapsed, 2),
+        "txns": extracted,
+        "txns_per_sec": round(extracted / elapsed, 2) if extracted else None,
+        "retries": stats["retries"],
+        "rate_limited": stats["rate_limited"],
+        "throttled_seconds": round(stats["throttled_seconds"], 3),
+        "failures": stats["failures"],
+        "latency_avg": round(stats["latency_avg"], 4),
+        "latency_max": round(stats["latency_max"], 4),
+        "peak_rss_mb_before": round(rss_before, 1),
+        "peak_rss_mb": round(_get_peak_rss_mb(), 1),
+    }
+
+
+def main():
+    """Parses the arguments and prints the report as json"""
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n", maxsplit=1)[0])
+    parser.add_argument("--transactions", type=int, default=10_000)
+    parser.add_argument("--fixture", help="recorded transactions, overrides the above")
+    parser.add_argument("--latency", type=float, default=0.05, help="in seconds")
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    parser.add_argument("--rate-error", type=float, default=0.0)
+    parser.add_argument(
+        "--rate-limit",
+        type=float,
+        default=1_000_000,
+        help="requests per second that the rate governor allows",
+    )
+    parser.add_argument("--pages-in-flight", type=int, default=8)
+    parser.add_argument("--flush-every-pages", type=int, default=10)
+    parser.add_argument(
+        "--mongo", action="store_true", help="write to MONGO_URI instead of memory"
+    )
+    parser.add_argument("--sqlite", help="write to this sqlite file instead of memory")
+    args = parser.parse_args()
+
+    print(json.dumps(run(args), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+In-memory IDB implementation, so that the benchmarks measure the extractor and
+not the database.
+"""
+import copy
+from typing import Any, Dict, List, Optional, Tuple
+
+from interfaces.idb import IDB
+
+
+class MemoryDB(IDB):
+    """@inheritdoc IDB"""
+
+    def __init__(self):
+        self._collections: Dict[str, Dict[Any, Any]] = {}
+
+    def _get_collection(self, database_name: str, collection_name: str) -> Dict:
+        return self._collections.setdefault(f"{database_name}.{collection_name}", {})
+
+    def put_item(self, item: Any, database_name: str, collection_name: str) -> None:
+        self._get_collection(database_name, collection_name)[item["_id"]] = item
+
+    # pylint: disable=too-many-arguments
+    def put_items_bulk(
+        self,
+        items: List[Any],
+        database_name: str,
+        collection_name: str,
+        batch_size: int = 1000,
+        write_concern: Optional[Dict] = None,
+        overwrite: bool = False,
+    ) -> Dict[str, int]:
+        collection = self._get_collection(database_name, collection_name)
+        counts = {"inserted": 0, "duplicates": 0}
+
+        for item in items:
+            exists = item["_id"] in collection
+            if not exists or overwrite:
+                collection[item["_id"]] = item
+            counts["duplicates" if exists else "inserted"] += 1
+
+        return counts
+
+    def put_items_atomic(
+        self,
+        writes: List[Tuple[str, str, List[Any]]],
+        write_concern: Optional[Dict] = None,
+    ) -> bool:
+        for database_name, collection_name, items in writes:
+            for item in items:
+                self.put_item(item, database_name, collection_name)
+
+        return True
+
+    def drop_collection(self, database_name: str, collection_name: str) -> None:
+        self._collections.pop(f"{database_name}.{collection_name}", None)
+
+    def get_item(
+        self,
+        identifier: str,
+        database_name: str,
+        collection_name: str,
+        projection: Optional[List[str]] = None,
+    ) -> Any:
+        item = self._get_collection(database_name, collection_name).get(identifier)
+        if item is not None and projection is not None:
+            item = {k: v for k, v in item.items() if k == "_id" or k in projection}
+        return copy.deepcopy(item)
+
+    def get_all_items(
+        self, database_name: str, collection_name: str, options: Optional[Dict] = None
+    ) -> List[Any]:
+        return list(self._get_collection(database_name, collection_name).values())
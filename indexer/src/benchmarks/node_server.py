@@ -0,0 +1,203 @@
+"""
+Local stand-in for an Ethereum node's JSON-RPC API. Serves `eth_blockNumber`,
+`eth_getLogs` and `eth_getBlockByNumber`, single or batched, from the same
+fixtures as the covalent stand-in, and refuses log ranges with more logs than
+a real node would return at once.
+
+Run it on its own with
+
+`python -m benchmarks.node_server --transactions 10000 --port 8546`
+
+and point the extractor at it with `ETH_RPC_URI=http://localhost:8546`.
+"""
+import argparse
+import json
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+from benchmarks.covalent_server import synthetic_transactions
+
+# what geth refuses to return from a single eth_getLogs call
+MAX_LOGS = 10_000
+
+# unix time of the first fixture block. A block every 12 seconds after it
+GENESIS_TIMESTAMP = 1_620_000_000
+
+
+class JsonRpcFault(Exception):
+    """The error that a call is answered with"""
+
+    def __init__(self, error: Dict[str, Any]):
+        super().__init__(error["message"])
+        self.error = error
+
+
+def to_node_log(log_event: Any) -> Any:
+    """
+    Returns:
+        Any: the covalent log event, shaped like the logs of `eth_getLogs`.
+    """
+
+    return {
+        "address": log_event["sender_address"],
+        "blockNumber": hex(log_event["block_height"]),
+        "transactionIndex": hex(log_event["tx_offset"]),
+        "logIndex": hex(log_event["log_offset"]),
+        "transactionHash": log_event["tx_hash"],
+        "topics": log_event["raw_log_topics"],
+        "data": log_event["raw_log_data"] or "0x",
+        "removed": False,
+    }
+
+
+class NodeServer(ThreadingHTTPServer):
+    """Serves the fixtures. Transactions must be in ascending block order."""
+
+    daemon_threads = True
+
+    # pylint: disable=too-many-arguments
+    def __init__(
+        self,
+        port: int,
+        transactions: List[Any],
+        head: Optional[int] = None,
+        max_logs: int = MAX_LOGS,
+        error: Optional[Dict[str, Any]] = None,
+        reject_batches: bool = False,
+    ):
+        """
+        Args:
+            port (int): port to listen on, 0 for any free port.
+            transactions (List[Any]): fixtures, as the covalent stand-in serves.
+            head (Optional[int]): the latest block. Defaults to the block of
+            the last transaction.
+            max_logs (int): `eth_getLogs` ranges with more logs are refused.
+            error (Optional[Dict[str, Any]]): if given, every `eth_getLogs`
+            call is answered with this error, e.g. an auth error.
+            reject_batches (bool): answer batches with a single error object,
+            like the nodes that do not support them.
+        """
+
+        super().__init__(("127.0.0.1", port), NodeRequestHandler)
+
+        self.logs = [
+            to_node_log(event) for txn in transactions for event in txn["log_events"]
+        ]
+        self.head = transactions[-1]["block_height"] if head is None else head
+        self.max_logs = max_logs
+        self.error = error
+        self.reject_batches = reject_batches
+        # * (method, params) of the calls that were received, in order
+        self.calls: List[Any] = []
+
+    def get_uri(self) -> str:
+        """
+        Returns:
+            str: value for the ETH_RPC_URI environment variable.
+        """
+        return f"http://127.0.0.1:{self.server_port}"
+
+
+class NodeRequestHandler(BaseHTTPRequestHandler):
+    """Answers the JSON-RPC calls that the node extractor makes"""
+
+    server: NodeServer
+
+    def _send(self, payload: Any) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _get_logs(self, log_filter: Dict[str, Any]) -> Any:
+        if self.server.error is not None:
+            raise JsonRpcFault(self.server.error)
+
+        from_block = int(log_filter["fromBlock"], 16)
+        to_block = int(log_filter["toBlock"], 16)
+        logs = [
+            log
+            for log in self.server.logs
+            if from_block <= int(log["blockNumber"], 16) <= to_block
+            and log["address"] == log_filter["address"].lower()
+        ]
+
+        if len(logs) > self.server.max_logs:
+            raise JsonRpcFault(
+                {
+                    "code": -32005,
+                    "message": f"query returned more than {self.server.max_logs}"
+                    " results",
+                }
+            )
+
+        return logs
+
+    def _answer(self, call: Dict[str, Any]) -> Dict[str, Any]:
+        method, params = call["method"], call.get("params", [])
+        self.server.calls.append((method, params))
+
+        response: Dict[str, Any] = {"jsonrpc": "2.0", "id": call["id"]}
+        try:
+            if method == "eth_blockNumber":
+                response["result"] = hex(self.server.head)
+            elif method == "eth_getLogs":
+                response["result"] = self._get_logs(params[0])
+            elif method == "eth_getBlockByNumber":
+                number = int(params[0], 16)
+                response["result"] = {
+                    "number": params[0],
+                    "timestamp": hex(GENESIS_TIMESTAMP + 12 * number),
+                }
+            else:
+                raise JsonRpcFault(
+                    {"code": -32601, "message": f"the method {method} does not exist"}
+                )
+        except JsonRpcFault as e:
+            response["error"] = e.error
+
+        return response
+
+    # pylint: disable=invalid-name
+    def do_POST(self):
+        """Answers a call, or a batch of calls"""
+
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+
+        if not isinstance(body, list):
+            self._send(self._answer(body))
+        elif self.server.reject_batches:
+            self._send(
+                {
+                    "jsonrpc": "2.0",
+                    "id": None,
+                    "error": {"code": -32600, "message": "batch requests are disabled"},
+                }
+            )
+        else:
+            self._send([self._answer(call) for call in body])
+
+    def log_message(self, *_):
+        pass
+
+
+def main():
+    """Serves synthetic fixtures"""
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n", maxsplit=1)[0])
+    parser.add_argument("--port", type=int, default=8546)
+    parser.add_argument("--address", default="0x" + "ab" * 20)
+    parser.add_argument("--transactions", type=int, default=10_000)
+    parser.add_argument("--max-logs", type=int, default=MAX_LOGS)
+    args = parser.parse_args()
+
+    transactions = synthetic_transactions(args.transactions, args.address)
+
+    with NodeServer(args.port, transactions, max_logs=args.max_logs) as server:
+        server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
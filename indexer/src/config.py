@@ -1,6 +1,7 @@
 """
 Defines Configuration schema and factory methods.
 """
+from typing import List, Union
 
 
 class Config:
@@ -9,13 +10,30 @@ class Config:
     working of indexer and transformer.
     """
 
+    # pylint: disable=too-many-arguments
     def __init__(
-        self, address: str, log_filename: str, transformer_name: str, network_id: int
+        self,
+        address: str,
+        log_filename: str,
+        transformer_name: Union[str, List[str]],
+        network_id: int,
+        deploy_block: int = 0,
     ) -> None:
+        transformer_names = (
+            [transformer_name]
+            if isinstance(transformer_name, str)
+            else list(transformer_name)
+        )
+        if len(transformer_names) == 0:
+            raise ValueError("At least one transformer is required.")
+        if len(set(transformer_names)) != len(transformer_names):
+            raise ValueError(f"Duplicate transformers: {transformer_names}")
+
         self._address = address
         self._log_filename = log_filename
-        self._transformer_name = transformer_name
+        self._transformer_names = transformer_names
         self._network_id = network_id
+        self._deploy_block = deploy_block
 
     # Protecc the private attributes
 
@@ -25,8 +43,9 @@ class Config:
         forbid_reset_on = [
             "_address",
             "_log_filename",
-            "_transformer_name",
+            "_transformer_names",
             "_network_id",
+            "_deploy_block",
         ]
         for k in forbid_reset_on:
             if key == k and hasattr(self, k):
@@ -66,9 +85,20 @@ class Config:
         Returns:
             str: this is the name of the transformer folder
             where the logic that transforms the raw transaction
-            data sits.
+            data sits. The first one, if there are several.
+        """
+        return self._transformer_names[0]
+
+    def get_transformer_names(self) -> List[str]:
+        """
+        Getter function for private attribute _transformer_names.
+
+        Returns:
+            List[str]: the names of all of the transformer folders that
+            transform the raw transaction data of the address. They share a
+            single read of it.
         """
-        return self._transformer_name
+        return list(self._transformer_names)
 
     def get_network_id(self) -> int:
         """
@@ -79,6 +109,16 @@ class Config:
         """
         return self._network_id
 
+    def get_deploy_block(self) -> int:
+        """
+        Getter function for private attribute _deploy_block.
+
+        Returns:
+            int: block number at or before which the contract was deployed.
+            There are no transactions to extract before this block.
+        """
+        return self._deploy_block
+
     # Presets
 
     @classmethod
@@ -101,8 +141,11 @@ class Config:
         log_filename = "example_rumble_kong_league.log"
         transformer_name = "example_rumble_kong_league"
         network_id = 1
+        # * a lower bound of the deployment (Oct 2020), which is all that the
+        # * backfill needs. The exact block only saves a few empty windows
+        deploy_block = 11_000_000
 
-        return cls(address, log_filename, transformer_name, network_id)
+        return cls(address, log_filename, transformer_name, network_id, deploy_block)
 
     @classmethod
     def rkl_club_auction_kovan(cls):
@@ -124,5 +167,7 @@ class Config:
         log_filename = "rkl_club_auction_kovan.log"
         transformer_name = "rkl_club_auction"
         network_id = 42
+        # * a lower bound of the deployment (May 2021), see above
+        deploy_block = 25_000_000
 
-        return cls(address, log_filename, transformer_name, network_id)
+        return cls(address, log_filename, transformer_name, network_id, deploy_block)
@@ -1,16 +1,37 @@
 """
 IDB Implementation using pymongo package
 """
+import logging
 import os
-from typing import Any, Dict, List, Optional
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
 
 from dotenv import load_dotenv
-from pymongo import MongoClient
+from pymongo import IndexModel, MongoClient, ReplaceOne, UpdateOne
+from pymongo.client_session import ClientSession
+from pymongo.change_stream import CollectionChangeStream
+from pymongo.errors import BulkWriteError, OperationFailure
+from pymongo.write_concern import WriteConcern
 
 from interfaces.idb import IDB
+from interfaces.iwatch import IWatch
 
 load_dotenv()
 
+# mongo's duplicate key error. Two upserts of the same `_id` that race can both
+# try to insert it
+DUPLICATE_KEY_ERROR = 11000
+
+# mongo's error when a standalone server, which has no transactions, is asked
+# for one
+ILLEGAL_OPERATION = 20
+
+# number of `_id`s in a single `$in` query of `get_items`
+MAX_IDS_PER_QUERY = 1000
+
+# how long the server holds a change stream request open, waiting for changes
+WATCH_AWAIT_MS = 100
+
 
 def check_environ(env_var: str) -> None:
     """
@@ -23,14 +44,90 @@ def check_environ(env_var: str) -> None:
         raise ValueError(f"{env_var} environment variable not set.")
 
 
-check_environ("MONGO_URI")
+def get_bulk_operations(
+    items: List[Any], overwrite: bool
+) -> List[Union[ReplaceOne, UpdateOne]]:
+    """
+    Args:
+        items (List[Any]): items with an `_id`.
+        overwrite (bool): replace the items that are already there, instead of
+        leaving them as they are.
+
+    Returns:
+        List[Union[ReplaceOne, UpdateOne]]: one upsert per item, for
+        `bulk_write`.
+    """
+
+    if overwrite:
+        return [ReplaceOne({"_id": item["_id"]}, item, upsert=True) for item in items]
+
+    # * $setOnInsert is a no-op for the items that are already there
+    return [
+        UpdateOne(
+            {"_id": item["_id"]},
+            {"$setOnInsert": {k: v for k, v in item.items() if k != "_id"}},
+            upsert=True,
+        )
+        for item in items
+    ]
+
+
+def get_upserted_count(error: BulkWriteError) -> int:
+    """
+    Args:
+        error (BulkWriteError): error of an unordered upsert `bulk_write`.
+
+    Raises:
+        BulkWriteError: if anything other than racing upserts failed.
+
+    Returns:
+        int: number of items that the bulk write inserted nonetheless.
+    """
+
+    if any(
+        write_error["code"] != DUPLICATE_KEY_ERROR
+        for write_error in error.details["writeErrors"]
+    ):
+        raise error
+
+    return error.details["nUpserted"]
+
+
+class Watch(IWatch):
+    """@inheritdoc IWatch"""
+
+    def __init__(self, stream: CollectionChangeStream):
+        self._stream = stream
+
+    def wait(self, timeout: float) -> bool:
+        deadline = time.monotonic() + timeout
+        written = False
+
+        while True:
+            # * returns None once the server had nothing for WATCH_AWAIT_MS
+            change = self._stream.try_next()
+
+            if change is not None:
+                # * drains the rest of a burst of writes, so that they wake the
+                # * waiter up once
+                written = True
+                continue
+
+            if written or time.monotonic() >= deadline:
+                return written
+
+    def close(self) -> None:
+        self._stream.close()
 
 
 class DB(IDB):
     """@inheritdoc IDB"""
 
     def __init__(self):
+        check_environ("MONGO_URI")
         self.client = MongoClient(os.getenv("MONGO_URI"))
+        # * known after the first `put_items_atomic`
+        self._has_transactions: Optional[bool] = None
 
     def put_item(self, item: Dict, database_name: str, collection_name: str) -> None:
         db = self.client[database_name]
@@ -45,15 +142,159 @@ class DB(IDB):
         db = self.client[database_name]
         db[collection_name].insert_many(items)
 
+    # pylint: disable=too-many-arguments
+    def put_items_bulk(
+        self,
+        items: List[Any],
+        database_name: str,
+        collection_name: str,
+        batch_size: int = 1000,
+        write_concern: Optional[Dict] = None,
+        overwrite: bool = False,
+    ) -> Dict[str, int]:
+        collection = self.client[database_name][collection_name]
+        if write_concern is not None:
+            collection = collection.with_options(
+                write_concern=WriteConcern(**write_concern)
+            )
+
+        counts = {"inserted": 0, "duplicates": 0}
+
+        for start in range(0, len(items), batch_size):
+            batch = items[start : start + batch_size]
+
+            try:
+                upserted = collection.bulk_write(
+                    get_bulk_operations(batch, overwrite), ordered=False
+                ).upserted_count
+            except BulkWriteError as e:
+                upserted = get_upserted_count(e)
+
+            counts["inserted"] += upserted
+            counts["duplicates"] += len(batch) - upserted
+
+        return counts
+
+    def put_items_atomic(
+        self,
+        writes: List[Tuple[str, str, List[Any]]],
+        write_concern: Optional[Dict] = None,
+    ) -> bool:
+        if self._has_transactions is False:
+            return False
+
+        def write(session: ClientSession) -> None:
+            for database_name, collection_name, items in writes:
+                if len(items) > 0:
+                    self.client[database_name][collection_name].bulk_write(
+                        get_bulk_operations(items, overwrite=True), session=session
+                    )
+
+        try:
+            with self.client.start_session() as session:
+                # * retries the whole transaction on transient errors
+                session.with_transaction(
+                    write,
+                    write_concern=None
+                    if write_concern is None
+                    else WriteConcern(**write_concern),
+                )
+        except OperationFailure as e:
+            # * transactions need a replica set
+            if e.code != ILLEGAL_OPERATION:
+                raise
+            logging.warning(f"No transactions, writing without them: {e}")
+            self._has_transactions = False
+            return False
+
+        self._has_transactions = True
+        return True
+
+    def drop_collection(self, database_name: str, collection_name: str) -> None:
+        self.client[database_name][collection_name].drop()
+
+    def ensure_indexes(
+        self, database_name: str, collection_name: str, indexes: List[Dict]
+    ) -> None:
+        if len(indexes) == 0:
+            return
+
+        # * creating an index that already exists is a no-op
+        self.client[database_name][collection_name].create_indexes(
+            [
+                IndexModel(
+                    index["keys"], **{k: v for k, v in index.items() if k != "keys"}
+                )
+                for index in indexes
+            ]
+        )
+
+    def get_index_stats(
+        self, database_name: str, collection_name: str
+    ) -> List[Dict[str, Any]]:
+        collection = self.client[database_name][collection_name]
+
+        return [
+            {
+                "name": stats["name"],
+                "accesses": stats["accesses"]["ops"],
+                "since": stats["accesses"]["since"],
+            }
+            for stats in collection.aggregate([{"$indexStats": {}}])
+        ]
+
     def get_item(
-        self, identifier: str, database_name: str, collection_name: str
+        self,
+        identifier: str,
+        database_name: str,
+        collection_name: str,
+        projection: Optional[List[str]] = None,
     ) -> Any:
         db = self.client[database_name]
+        return db[collection_name].find_one({"_id": identifier}, projection)
+
+    def get_items(
+        self,
+        ids: List[Any],
+        database_name: str,
+        collection_name: str,
+        projection: Optional[List[str]] = None,
+    ) -> List[Any]:
+        collection = self.client[database_name][collection_name]
+        found: Dict[Any, Any] = {}
+
+        # * keeps the queries well under the 16MB limit of a command
+        for start in range(0, len(ids), MAX_IDS_PER_QUERY):
+            batch = ids[start : start + MAX_IDS_PER_QUERY]
+            for item in collection.find({"_id": {"$in": batch}}, projection):
+                found[item["_id"]] = item
+
+        return [found.get(identifier) for identifier in ids]
+
+    def watch_item(
+        self, identifier: Any, database_name: str, collection_name: str
+    ) -> Optional[IWatch]:
+        collection = self.client[database_name][collection_name]
+
         try:
-            return db[collection_name].find({"_id": identifier})[0]
-        except Exception:
+            stream = collection.watch(
+                [
+                    {
+                        "$match": {
+                            "operationType": {"$in": ["insert", "replace", "update"]},
+                            "documentKey._id": identifier,
+                        }
+                    }
+                ],
+                max_await_time_ms=WATCH_AWAIT_MS,
+            )
+        except OperationFailure as e:
+            # * change streams need a replica set
+            logging.warning(f"Can not watch {collection_name}: {e}")
             return None
 
+        return Watch(stream)
+
     # todo: concrete type for options
     def get_all_items(
         self, database_name: str, collection_name: str, options: Optional[Dict] = None
@@ -83,13 +324,66 @@ class DB(IDB):
         # todo if removed
         return list(db[collection_name].find())
 
+    # pylint: disable=too-many-arguments
+    def iter_items(
+        self,
+        database_name: str,
+        collection_name: str,
+        options: Optional[Dict] = None,
+        batch_size: int = 1000,
+        projection: Optional[List[str]] = None,
+    ) -> Iterator[Any]:
+        options = options or {}
+
+        cursor = self.client[database_name][collection_name].find(
+            options.get("query_clause", {}),
+            projection,
+            batch_size=batch_size,
+            allow_disk_use=True,
+        )
+
+        if "sort" in options:
+            cursor = cursor.sort(
+                options["sort"]["sort_by"], options["sort"]["direction"]
+            )
+
+        # * the cursor fetches the next batch as the previous one is consumed
+        with cursor:
+            yield from cursor
+
     def get_any_item(
-        self, database_name: str, collection_name: str, _: Optional[Dict] = None
+        self,
+        database_name: str,
+        collection_name: str,
+        _: Optional[Dict] = None,
+        projection: Optional[List[str]] = None,
     ) -> Any:
         """
-        MongoDB will return an empty list is collection does not exist
+        MongoDB will return None if collection does not exist
         """
-        all_items = self.get_all_items(database_name, collection_name)
-        if len(all_items) == 0:
-            return None
-        return all_items[0]
+        db = self.client[database_name]
+        return db[collection_name].find_one({}, projection)
+
+
+def get_db() -> IDB:
+    """
+    Storage backend selected by the DB_BACKEND environment variable: "mongo"
+    (the default) at MONGO_URI, or "sqlite", an embedded file at SQLITE_PATH
+    for single node deployments.
+
+    Returns:
+        IDB: the backend.
+    """
+
+    backend = os.getenv("DB_BACKEND", "mongo")
+
+    if backend == "mongo":
+        return DB()
+
+    if backend == "sqlite":
+        # pylint: disable=import-outside-toplevel
+        from sqlite_db import SqliteDB
+
+        return SqliteDB()
+
+    raise ValueError(f"Unknown DB_BACKEND: {backend}")
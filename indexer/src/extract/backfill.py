@@ -0,0 +1,304 @@
+"""
+Backfills the transaction history of an address by splitting the block range
+from the contract deployment to the head into shards that are extracted by a
+pool of worker processes.
+"""
+import logging
+from multiprocessing import Pool
+from typing import Any, List, Optional, Tuple
+
+from config import Config
+from db import get_db
+from interfaces.idb import IDB
+
+from extract.covalent import CONFIRMATIONS, Covalent
+
+# number of blocks requested at a time from the log events endpoint. Shard
+# boundaries are aligned to it
+BLOCKS_PER_REQUEST = 100_000
+
+# number of shards planned per worker. Shards are handed out to the workers as
+# they become free, so more shards balance out ranges with heavier activity
+SHARDS_PER_WORKER = 4
+
+# _id of the document, in the block height collection, that holds the plan
+PLAN_ID = "shards"
+
+
+def get_shard_checkpoint_id(starting_block: int, ending_block: int) -> str:
+    """
+    Returns:
+        str: _id of the document, in the block height collection, that holds
+        the checkpoint of the shard.
+    """
+
+    return f"shard-{starting_block}-{ending_block}"
+
+
+def plan_shards(
+    starting_block: int, ending_block: int, shards: int
+) -> List[Tuple[int, int]]:
+    """
+    Splits the block range into at most `shards` consecutive ranges whose
+    boundaries are aligned to `BLOCKS_PER_REQUEST`.
+
+    Args:
+        starting_block (int): first block, inclusive.
+        ending_block (int): last block, inclusive.
+        shards (int): maximum number of ranges.
+
+    Returns:
+        List[Tuple[int, int]]: inclusive (starting block, ending block) ranges.
+        Empty if the range is.
+    """
+
+    if ending_block < starting_block:
+        return []
+
+    first_window = starting_block // BLOCKS_PER_REQUEST
+    windows = ending_block // BLOCKS_PER_REQUEST - first_window + 1
+    windows_per_shard = -(-windows // shards)
+
+    plan = []
+    for window in range(first_window, first_window + windows, windows_per_shard):
+        plan.append(
+            (
+                max(window * BLOCKS_PER_REQUEST, starting_block),
+                min(
+                    (window + windows_per_shard) * BLOCKS_PER_REQUEST - 1, ending_block
+                ),
+            )
+        )
+
+    return plan
+
+
+def backfill_shard(
+    config: Config, shard: Tuple[int, int], latest_block: Optional[int]
+) -> None:
+    """
+    Worker process entrypoint. Every worker makes its own db and covalent
+    clients, since those can not be shared across processes.
+
+    Args:
+        config (Config): config of the address to backfill.
+        shard (Tuple[int, int]): inclusive block range to backfill.
+        latest_block (Optional[int]): the latest block when the plan was made.
+    """
+
+    ShardedBackfill(config).extract_shard(*shard, latest_block)
+
+
+class ShardedBackfill:
+    """
+    The plan and the per shard checkpoints are stored in the extractor's block
+    height collection, so an interrupted backfill resumes every shard from its
+    last extracted window. Once all the shards are complete, the block height
+    is set to the head that the plan was made up to, and the regular extractor
+    carries on from there.
+    """
+
+    def __init__(
+        self,
+        config: Config,
+        workers: int = 1,
+        db: Optional[IDB] = None,
+        covalent: Optional[Covalent] = None,
+    ):
+        """
+        Args:
+            config (Config): config of the address to backfill. Without a
+            deploy block, the backfill is never required.
+            workers (int): number of worker processes. A single worker extracts
+            the shards in this process, with the clients below.
+            db (Optional[IDB]): where to write the transactions and the
+            checkpoints. Defaults to the db of the DB_BACKEND.
+            covalent (Optional[Covalent]): client for the config's network.
+            Defaults to a new client.
+        """
+
+        self._config = config
+        self._workers = workers
+
+        self._covalent = (
+            Covalent(self._config.get_network_id()) if covalent is None else covalent
+        )
+
+        self._db_name = "ethereum-indexer"
+
+        self._db = get_db() if db is None else db
+
+    def _get_collection_name(self) -> str:
+        return f"{self._config.get_address()}-{self._config.get_network_id()}"
+
+    def _get_block_height_collection_name(self) -> str:
+        return (
+            f"{self._config.get_address()}-{self._config.get_network_id()}-block-height"
+        )
+
+    def _get_checkpoint(self, identifier: str) -> Optional[Any]:
+        return self._db.get_item(
+            identifier, self._db_name, self._get_block_height_collection_name()
+        )
+
+    def _put_checkpoint(self, item: Any) -> None:
+        self._db.put_item(
+            item=item,
+            database_name=self._db_name,
+            collection_name=self._get_block_height_collection_name(),
+        )
+
+    def is_required(self) -> bool:
+        """
+        Returns:
+            bool: True if the extractor has not extracted anything for the address
+            yet, i.e. there is no block height, and the deploy block of the
+            address is known. From block 0, most of the shards would be empty
+            block ranges, which cost a request each, and the extractor's walk
+            over the transaction history is cheaper.
+        """
+
+        if self._config.get_deploy_block() == 0:
+            return False
+
+        return self._get_checkpoint(1) is None
+
+    def _determine_plan(self) -> Any:
+        """
+        Reuses the plan of an interrupted backfill, otherwise plans the shards
+        up to the confirmed head, i.e. `CONFIRMATIONS` blocks behind the latest
+        block. Every window of the plan is then cached, and the extractor
+        picks up the unconfirmed blocks.
+        """
+
+        plan = self._get_checkpoint(PLAN_ID)
+
+        if plan is not None:
+            return plan
+
+        latest_block = self._covalent.request_latest_block_height()
+        head = max(latest_block - CONFIRMATIONS, self._config.get_deploy_block() - 1)
+        shards = plan_shards(
+            self._config.get_deploy_block(), head, self._workers * SHARDS_PER_WORKER
+        )
+
+        plan = {
+            "_id": PLAN_ID,
+            "head": head,
+            "latest_block": latest_block,
+            "shards": shards,
+        }
+        self._put_checkpoint(plan)
+
+        return plan
+
+    def _request_log_events(
+        self, starting_block: int, ending_block: int, latest_block: Optional[int]
+    ) -> List[Any]:
+        log_events = []
+        page_number = 0
+
+        while True:
+            response = self._covalent.request_log_events(
+                self._config.get_address(),
+                starting_block,
+                ending_block,
+                page_number,
+                latest_block,
+            )
+            log_events.extend(self._covalent.get_transactions(response))
+
+            if not self._covalent.has_more(response):
+                return log_events
+
+            page_number += 1
+
+    def extract_shard(
+        self,
+        starting_block: int,
+        ending_block: int,
+        latest_block: Optional[int] = None,
+    ) -> None:
+        """
+        Extracts the transactions of the block range one request window at a
+        time, checkpointing after each window.
+
+        Args:
+            starting_block (int): first block of the shard.
+            ending_block (int): last block of the shard, inclusive.
+            latest_block (Optional[int]): the latest block when the plan was
+            made. The windows that are confirmed as of it are cached.
+        """
+
+        checkpoint_id = get_shard_checkpoint_id(starting_block, ending_block)
+        checkpoint = self._get_checkpoint(checkpoint_id)
+
+        block = starting_block
+        if checkpoint is not None:
+            block = checkpoint["block_height"] + 1
+
+        while block <= ending_block:
+            window_end = min(
+                (block // BLOCKS_PER_REQUEST + 1) * BLOCKS_PER_REQUEST - 1,
+                ending_block,
+            )
+
+            log_events = self._request_log_events(block, window_end, latest_block)
+            transactions = self._covalent.group_log_events(log_events)
+
+            # * upserts, since a window that was interrupted before its
+            # * checkpoint is extracted again
+            self._db.put_items_bulk(
+                transactions, self._db_name, self._get_collection_name()
+            )
+
+            self._put_checkpoint({"_id": checkpoint_id, "block_height": window_end})
+
+            logging.info(
+                f"Shard {checkpoint_id}: extracted {len(transactions)} transactions"
+                f" up to block {window_end}"
+            )
+
+            block = window_end + 1
+
+    def _merge(self, plan: Any) -> None:
+        """
+        Sets the block height once every shard has reached its ending block.
+        """
+
+        for starting_block, ending_block in plan["shards"]:
+            checkpoint = self._get_checkpoint(
+                get_shard_checkpoint_id(starting_block, ending_block)
+            )
+
+            if checkpoint is None or checkpoint["block_height"] < ending_block:
+                raise RuntimeError(
+                    f"Shard {starting_block} - {ending_block} is not complete."
+                )
+
+        self._put_checkpoint({"_id": 1, "block_height": plan["head"]})
+
+    def __call__(self):
+        plan = self._determine_plan()
+
+        logging.info(
+            f"Backfilling {self._config.get_address()} up to block {plan['head']}"
+            f" in {len(plan['shards'])} shards across {self._workers} workers"
+        )
+
+        # * not in the plans of an earlier version
+        latest_block = plan.get("latest_block")
+
+        if self._workers == 1:
+            for shard in plan["shards"]:
+                self.extract_shard(*shard, latest_block)
+        else:
+            with Pool(processes=self._workers) as pool:
+                pool.starmap(
+                    backfill_shard,
+                    [(self._config, shard, latest_block) for shard in plan["shards"]],
+                )
+
+        self._merge(plan)
+
+        logging.info(f"Backfill complete, block height: {plan['head']}")
@@ -0,0 +1,153 @@
+"""
+On-disk, compressed cache of raw API responses
+"""
+import gzip
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from typing import Any, Dict, Optional
+
+CACHE_MAX_BYTES = 1 << 30  # 1 GiB
+
+# eviction removes the least recently used entries until the cache is this
+# fraction of its maximum size, so that it does not run on every put
+EVICT_TO = 0.9
+
+
+class ResponseCache:
+    """
+    Stores response bodies gzipped, in files named after the hash of the request
+    key. Reads refresh the file's modification time, which is what the size
+    based eviction uses to remove the least recently used entries.
+
+    Entries are written atomically, so the cache can be shared between
+    processes, e.g. the sharded backfill workers.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = CACHE_MAX_BYTES):
+        self._directory = directory
+        self._max_bytes = max_bytes
+
+        os.makedirs(self._directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._size = sum(size for _, _, size in self._entries())
+        self._stats = {"cache_hits": 0, "cache_misses": 0}
+
+    @classmethod
+    def from_environ(cls) -> Optional["ResponseCache"]:
+        """
+        Returns:
+            Optional[ResponseCache]: cache in the RESPONSE_CACHE_DIR directory,
+            limited to RESPONSE_CACHE_MAX_BYTES. None if the directory is not set.
+        """
+
+        directory = os.getenv("RESPONSE_CACHE_DIR")
+
+        if not directory:
+            return None
+
+        return cls(
+            directory, int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(CACHE_MAX_BYTES)))
+        )
+
+    def _get_path(self, key: Any) -> str:
+        digest = hashlib.sha256(
+            json.dumps(key, sort_keys=True).encode("utf-8")
+        ).hexdigest()
+        # * two levels keep the directories small
+        return os.path.join(self._directory, digest[:2], f"{digest}.gz")
+
+    def _entries(self):
+        for root, _, files in os.walk(self._directory):
+            for name in files:
+                if not name.endswith(".gz"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield path, stat.st_mtime, stat.st_size
+
+    def _record(self, key: str) -> None:
+        with self._lock:
+            self._stats[key] += 1
+
+    def get(self, key: Any) -> Optional[bytes]:
+        """
+        Args:
+            key (Any): json serializable request key, e.g. a list with the network,
+            address, page and block range.
+
+        Returns:
+            Optional[bytes]: the cached response body, None on a miss.
+        """
+
+        path = self._get_path(key)
+
+        try:
+            with gzip.open(path, "rb") as f:
+                body = f.read()
+            os.utime(path)
+        except (FileNotFoundError, OSError, EOFError):
+            self._record("cache_misses")
+            return None
+
+        self._record("cache_hits")
+        return body
+
+    def put(self, key: Any, body: bytes) -> None:
+        """
+        Args:
+            key (Any): json serializable request key.
+            body (bytes): response body to cache.
+        """
+
+        path = self._get_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(gzip.compress(body))
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._size += os.path.getsize(path)
+            evict = self._size > self._max_bytes
+
+        if evict:
+            self._evict()
+
+    def _evict(self) -> None:
+        """
+        Removes the least recently used entries. The size is recomputed from the
+        directory, since other processes may have written to it too.
+        """
+
+        with self._lock:
+            entries = sorted(self._entries(), key=lambda entry: entry[1])
+            size = sum(entry_size for _, _, entry_size in entries)
+
+            for path, _, entry_size in entries:
+                if size <= self._max_bytes * EVICT_TO:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                size -= entry_size
+
+            logging.info(f"Evicted response cache down to {size} bytes")
+            self._size = size
+
+    def get_stats(self) -> Dict[str, int]:
+        """
+        Returns:
+            Dict[str, int]: number of cache hits and misses.
+        """
+        with self._lock:
+            return dict(self._stats)
@@ -3,41 +3,134 @@ Covalent API client
 """
 import logging
 import os
-import time
-from typing import Any, Dict, Optional
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
 
 import requests
 from dotenv import load_dotenv
 
+from extract.cache import ResponseCache
+from extract.governor import RateGovernor
+from extract.session import PooledSession
+
 load_dotenv()
 
+# blocks this close to the latest block can still be reorged. The log events of
+# a block range are only cached once the whole range is this far behind it
+CONFIRMATIONS = 12
+
+
+def get_api_uri() -> str:
+    """
+    Returns:
+        str: the base uri of the API. It can be pointed elsewhere with
+        COVALENT_API_URI, e.g. at the stand-in server of the benchmarks.
+    """
+
+    return os.getenv("COVALENT_API_URI", "https://api.covalenthq.com/v1")
+
+
 # ETHEREUM_MAINNET_CHAIN_ID = 1
 # ETHEREUM_KOVAN_CHAIN_ID = 42
 
 # * notes
 # - possible to pull from a different blockchain if `chain_id` is different
+# - the API key is not part of the URIs. The rate governor hands out a key for
+# every request
 # - `block_signed_at=false` pulls all transactions putting most recent ones
 # at the top
 COVALENT_TRANSACTIONS_URI = lambda address, page_number, network_id: (
-    f"https://api.covalenthq.com/v1/{network_id}/address/"
+    f"{get_api_uri()}/{network_id}/address/"
     + str(address)
     + "/transactions_v2/?quote-currency=USD"
     + "&format=JSON&block-signed-at-asc=false"
     + "&no-logs=false&page-number="
     + str(page_number)
-    + "&key="
-    + os.environ["COVALENT_API_KEY"]
     + "&page-size=100"
 )
 
-REQUEST_TRANSACTIONS_SLEEP = 5  # in seconds
+
+# pylint: disable=too-many-arguments
+def get_log_events_uri(
+    address: str,
+    starting_block: int,
+    ending_block: int,
+    page_number: int,
+    network_id: int,
+) -> str:
+    """
+    Returns:
+        str: the log events emitted by the address, in ascending order, between
+        the starting and ending blocks (both inclusive).
+    """
+
+    return (
+        f"{get_api_uri()}/{network_id}/events/address/"
+        + str(address)
+        + "/?format=JSON&starting-block="
+        + str(starting_block)
+        + "&ending-block="
+        + str(ending_block)
+        + "&page-number="
+        + str(page_number)
+        + "&page-size=1000"
+    )
+
+
+def get_latest_block_uri(network_id: int) -> str:
+    """
+    Returns:
+        str: the latest block of the network.
+    """
+
+    return f"{get_api_uri()}/{network_id}/block_v2/latest/" + "?format=JSON"
 
 
 class Covalent:
     """Client for interacting with Covalent API"""
 
-    def __init__(self, network_id: int):
+    def __init__(
+        self,
+        network_id: int,
+        session: Optional[PooledSession] = None,
+        cache: Optional[ResponseCache] = None,
+        governor: Optional[RateGovernor] = None,
+    ):
         self._network_id = network_id
+        # * the session can be shared between the clients
+        self._session = PooledSession() if session is None else session
+        # * responses that can not change are served from the cache, if there is one
+        self._cache = ResponseCache.from_environ() if cache is None else cache
+        # * the governor's buckets are shared by all of the processes on the host
+        self._governor = RateGovernor.from_environ() if governor is None else governor
+
+    def _request(
+        self, request_uri: str, cache_key: Optional[List[Any]] = None
+    ) -> requests.Response:
+        """
+        Consults the cache first, if there is a `cache_key`. Otherwise requests
+        and validates the response, caching it if there is a `cache_key`.
+        """
+
+        if self._cache is not None and cache_key is not None:
+            body = self._cache.get(cache_key)
+
+            if body is not None:
+                response = requests.Response()
+                response.status_code = 200
+                # pylint: disable=protected-access
+                response._content = body
+                return response
+
+        response = self._session.get(request_uri, self._should_retry, self._governor)
+
+        response_json = response.json()
+        self._validate_transactions_response(response_json)
+
+        if self._cache is not None and cache_key is not None:
+            self._cache.put(cache_key, response.content)
+
+        return response
 
     @staticmethod
     def _validate_transactions_response(response: Dict[str, Any]) -> None:
@@ -110,10 +203,19 @@ class Covalent:
             }
         }
 
+        Pages are in descending block order, so new transactions shift the
+        older ones onto later pages: what a page holds depends on the head of
+        the history. The pages are therefore not cached, unlike the block
+        ranges of `request_log_events`.
+
         Args:
             for_address (str): _description_
             page_number (int): _description_
 
+        Raises:
+            RetriesExhaustedError: if covalent keeps failing for longer than
+            the retry budget of the session.
+
         Returns:
             Any: _description_
         """
@@ -126,30 +228,216 @@ class Covalent:
             for_address, page_number, self._network_id
         )
 
-        response = requests.get(request_uri)
+        return self._request(request_uri)
 
-        if response.status_code != 200:
-            logging.warning(
-                f"Can't pull transactions. Response status code:{response.status_code}.",
-                f" Response:{response.text}. Retrying...",
-            )
-            # todo: might need tweaking
-            time.sleep(REQUEST_TRANSACTIONS_SLEEP)
-            return self.request_transactions(for_address, page_number)
+    # pylint: disable=too-many-arguments
+    def request_log_events(
+        self,
+        for_address: str,
+        starting_block: int,
+        ending_block: int,
+        page_number: int,
+        latest_block: Optional[int] = None,
+    ) -> requests.Response:
+        """
+        Requests the log events emitted by the address between the two blocks.
+        Items of the response are the log events that are found in the
+        `log_events` of the transactions endpoint items.
+
+        Args:
+            for_address (str): address that emitted the events.
+            starting_block (int): first block of the range.
+            ending_block (int): last block of the range, inclusive.
+            page_number (int): covalent page number.
+            latest_block (Optional[int]): the latest block, as of the request.
+            The response is only cached if the range ends at least
+            `CONFIRMATIONS` blocks before it. Not cached if None.
+
+        Raises:
+            RetriesExhaustedError: if covalent keeps failing for longer than
+            the retry budget of the session.
+
+        Returns:
+            requests.Response: the response. Validated like the transactions one.
+        """
+
+        logging.info(
+            f"Extracting log events for: {for_address}, blocks: {starting_block}"
+            f" - {ending_block}, covalent page number: {page_number}"
+        )
+
+        request_uri = get_log_events_uri(
+            for_address, starting_block, ending_block, page_number, self._network_id
+        )
+
+        # * a confirmed block range can not change. The backfill windows are
+        # * aligned to the block numbers, so a re-index requests the very same
+        # * ranges
+        is_confirmed = (
+            latest_block is not None and ending_block <= latest_block - CONFIRMATIONS
+        )
+
+        return self._request(
+            request_uri,
+            [
+                self._network_id,
+                for_address,
+                "events",
+                page_number,
+                starting_block,
+                ending_block,
+            ]
+            if is_confirmed
+            else None,
+        )
+
+    def request_latest_block_height(self) -> int:
+        """
+        Requests the number of the latest block that covalent knows of.
+
+        Raises:
+            RetriesExhaustedError: if covalent keeps failing for longer than
+            the retry budget of the session.
+
+        Returns:
+            int: the latest block number.
+        """
+
+        response = self._session.get(
+            get_latest_block_uri(self._network_id),
+            self._should_retry,
+            self._governor,
+        )
 
         response_json = response.json()
         self._validate_transactions_response(response_json)
 
-        if response_json["error"] is not False:
-            logging.warning(
-                f"Covalent data error. Error code:{response_json['error_code']}.",
-                f" Error message:{response_json['error_message']}. Retrying...",
+        return response_json["data"]["items"][0]["height"]
+
+    @staticmethod
+    def _parse_timestamp(timestamp: Optional[str]) -> Optional[datetime]:
+        # e.g. 2022-02-22T12:29:52.068887528Z, python parses up to microseconds
+        if not timestamp:
+            return None
+
+        seconds, _, fraction = timestamp.rstrip("Z").partition(".")
+        parsed = datetime.strptime(seconds, "%Y-%m-%dT%H:%M:%S").replace(
+            tzinfo=timezone.utc
+        )
+
+        return parsed.replace(microsecond=int(fraction[:6].ljust(6, "0")))
+
+    def get_update_times(
+        self, response: requests.Response
+    ) -> Tuple[Optional[datetime], Optional[datetime]]:
+        """
+        Covalent refreshes the data of an address periodically, and tells
+        when it last did and when it will next.
+
+        Args:
+            response (requests.Response): a validated covalent response.
+
+        Returns:
+            Tuple[Optional[datetime], Optional[datetime]]: `updated_at` and
+            `next_update_at`, if present.
+        """
+
+        data = response.json()["data"]
+
+        return (
+            self._parse_timestamp(data.get("updated_at")),
+            self._parse_timestamp(data.get("next_update_at")),
+        )
+
+    @staticmethod
+    def has_more(response: requests.Response) -> bool:
+        """
+        Args:
+            response (requests.Response): a validated covalent response.
+
+        Returns:
+            bool: True if there are more pages after this one.
+        """
+
+        pagination = response.json()["data"].get("pagination") or {}
+        return pagination.get("has_more", False) is True
+
+    @staticmethod
+    def group_log_events(log_events: List[Any]) -> List[Any]:
+        """
+        Groups log events into transactions that are shaped like the items of
+        the transactions endpoint, such that the transformers can consume them.
+        Only the fields that the log events carry are set on the transactions.
+
+        Args:
+            log_events (List[Any]): log events, e.g. items of the log events
+            endpoint.
+
+        Returns:
+            List[Any]: transactions, in the order of their first log event.
+        """
+
+        transactions: Dict[str, Any] = {}
+
+        for event in log_events:
+            tx_hash = event["tx_hash"]
+
+            if tx_hash not in transactions:
+                transactions[tx_hash] = {
+                    "_id": tx_hash,
+                    "tx_hash": tx_hash,
+                    "tx_offset": event.get("tx_offset"),
+                    "block_height": event["block_height"],
+                    "block_signed_at": event["block_signed_at"],
+                    "log_events": [],
+                }
+
+            transactions[tx_hash]["log_events"].append(event)
+
+        return list(transactions.values())
+
+    @staticmethod
+    def _should_retry(response: requests.Response) -> Optional[str]:
+        """
+        Covalent can respond with a 200 and still indicate an error in the body.
+
+        Args:
+            response (requests.Response): response with a 200 status code.
+
+        Returns:
+            Optional[str]: reason to retry the request, None if it is good.
+        """
+
+        try:
+            response_json = response.json()
+        except ValueError:
+            return "response is not json"
+
+        if response_json.get("error", False) is not False:
+            return (
+                f"Covalent data error. Error code:{response_json.get('error_code')}."
+                f" Error message:{response_json.get('error_message')}"
             )
-            # todo: might need tweaking
-            time.sleep(REQUEST_TRANSACTIONS_SLEEP)
-            return self.request_transactions(for_address, page_number)
 
-        return response
+        return None
+
+    def get_stats(self) -> Dict[str, float]:
+        """
+        Request statistics of the underlying session. See `PooledSession.get_stats`.
+
+        Returns:
+            Dict[str, float]: request, retry, failure counts and latencies.
+            Cache hits and misses, if there is a cache. Throttling by the
+            rate governor.
+        """
+
+        stats = self._session.get_stats()
+        stats.update(self._governor.get_stats())
+
+        if self._cache is not None:
+            stats.update(self._cache.get_stats())
+
+        return stats
 
     # todo: return type
     def get_transactions(self, response: requests.Response) -> Any:
@@ -0,0 +1,229 @@
+"""
+Token bucket rate governor that is shared by every process on the host
+"""
+import fcntl
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from dotenv import load_dotenv
+
+from db import check_environ
+
+load_dotenv()
+
+# requests per second that a single covalent API key is allowed
+RATE_LIMIT = 5.0
+# requests that a key can burst after it has been idle, at most
+BURST = 5.0
+# the bucket state of all of the processes on the host lives in this file
+STATE_FILENAME = "ethereum-indexer-rate-governor.json"
+
+
+class RateGovernor:
+    """
+    Keeps the requests of all of the extractors on the host within the quota of
+    the API keys. Each key has a token bucket that refills at `rate` tokens per
+    second, up to `burst`. A request takes a token from the fullest bucket, and
+    waits for one if they are all empty, so the load is spread across the keys
+    and the throughput sits at the combined quota instead of overshooting it.
+
+    The buckets live in a state file that is guarded by an exclusive `flock`,
+    which is what makes them shared between processes. Keys are only ever
+    written to it as hashes.
+    """
+
+    def __init__(
+        self,
+        keys: List[str],
+        rate: float = RATE_LIMIT,
+        burst: float = BURST,
+        state_path: Optional[str] = None,
+    ):
+        """
+        Args:
+            keys (List[str]): API keys to spread the requests across.
+            rate (float): requests per second per key.
+            burst (float): bucket capacity per key.
+            state_path (Optional[str]): the shared state file. Defaults to
+            STATE_FILENAME in the temp directory.
+
+        Raises:
+            ValueError: if there are no keys, the rate is not positive, or the
+            bucket can not hold a single token.
+        """
+
+        if len(keys) == 0:
+            raise ValueError("The governor needs at least one key.")
+
+        if rate <= 0:
+            raise ValueError(f"The rate must be positive, got: {rate}")
+
+        if burst < 1:
+            raise ValueError(f"The burst must be at least 1, got: {burst}")
+
+        self._keys = {self._hash(key): key for key in keys}
+        self._rate = rate
+        self._burst = burst
+        self._state_path = state_path or os.path.join(
+            tempfile.gettempdir(), STATE_FILENAME
+        )
+
+        self._lock = threading.Lock()
+        self._stats = {"throttled": 0, "throttled_seconds": 0.0, "rate_limited": 0}
+
+    @classmethod
+    def from_environ(cls) -> "RateGovernor":
+        """
+        Reads the comma separated COVALENT_API_KEYS, falling back to
+        COVALENT_API_KEY, and the per key COVALENT_RATE_LIMIT.
+
+        Raises:
+            ValueError: if neither of the key variables is set.
+
+        Returns:
+            RateGovernor: the governor.
+        """
+
+        keys = os.getenv("COVALENT_API_KEYS")
+        if not keys:
+            check_environ("COVALENT_API_KEY")
+            keys = os.environ["COVALENT_API_KEY"]
+        rate = float(os.getenv("COVALENT_RATE_LIMIT", str(RATE_LIMIT)))
+
+        return cls(
+            [key.strip() for key in keys.split(",") if key.strip()],
+            rate=rate,
+            burst=max(rate, 1.0),
+        )
+
+    @staticmethod
+    def _hash(key: str) -> str:
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+
+    def _update_state(self, update: Callable[[Dict[str, Any]], Any]) -> Any:
+        """
+        Runs `update` on the shared buckets while holding the file lock, and
+        writes them back.
+        """
+
+        with open(self._state_path, "a+", encoding="utf-8") as f:
+            # * released when the file is closed
+            fcntl.flock(f, fcntl.LOCK_EX)
+
+            f.seek(0)
+            try:
+                state = json.loads(f.read() or "{}")
+            except ValueError:
+                state = {}
+
+            result = update(state)
+
+            f.truncate(0)
+            f.write(json.dumps(state))
+
+        return result
+
+    def _refill(self, bucket: Optional[Dict[str, float]], now: float) -> Dict:
+        if bucket is None:
+            return {"tokens": self._burst, "updated_at": now, "blocked_until": 0.0}
+
+        elapsed = max(now - bucket["updated_at"], 0)
+        bucket["tokens"] = min(bucket["tokens"] + elapsed * self._rate, self._burst)
+        bucket["updated_at"] = now
+        return bucket
+
+    def _try_acquire(self, state: Dict[str, Any]) -> Any:
+        """
+        Returns:
+            Any: the hash of the key that a token was taken from, or the
+            seconds to wait before the next token is available.
+        """
+
+        now = time.time()
+        wait_for = float("inf")
+        best = None
+
+        for key_hash in self._keys:
+            bucket = state[key_hash] = self._refill(state.get(key_hash), now)
+
+            if bucket["blocked_until"] > now:
+                wait_for = min(wait_for, bucket["blocked_until"] - now)
+                continue
+
+            if bucket["tokens"] >= 1:
+                if best is None or bucket["tokens"] > state[best]["tokens"]:
+                    best = key_hash
+            else:
+                wait_for = min(wait_for, (1 - bucket["tokens"]) / self._rate)
+
+        if best is None:
+            return wait_for
+
+        state[best]["tokens"] -= 1
+        return best
+
+    def acquire(self) -> str:
+        """
+        Blocks until one of the keys has a token, and takes it.
+
+        Returns:
+            str: the key to make the request with.
+        """
+
+        waited = 0.0
+        while True:
+            result = self._update_state(self._try_acquire)
+
+            if isinstance(result, str):
+                break
+
+            time.sleep(result)
+            waited += result
+
+        if waited > 0:
+            with self._lock:
+                self._stats["throttled"] += 1
+                self._stats["throttled_seconds"] += waited
+
+        return self._keys[result]
+
+    def penalize(self, key: str, retry_after: Optional[float]) -> None:
+        """
+        Records that the provider rate limited the key. No process uses the key
+        again until `retry_after` has passed, and its bucket is drained.
+
+        Args:
+            key (str): the key that was rate limited.
+            retry_after (Optional[float]): the `Retry-After` of the response, in
+            seconds. Defaults to the time that it takes to refill the bucket.
+        """
+
+        key_hash = self._hash(key)
+        if retry_after is None:
+            retry_after = self._burst / self._rate
+
+        def update(state: Dict[str, Any]) -> None:
+            now = time.time()
+            bucket = state[key_hash] = self._refill(state.get(key_hash), now)
+            bucket["tokens"] = 0.0
+            bucket["blocked_until"] = max(bucket["blocked_until"], now + retry_after)
+
+        self._update_state(update)
+
+        with self._lock:
+            self._stats["rate_limited"] += 1
+
+    def get_stats(self) -> Dict[str, float]:
+        """
+        Returns:
+            Dict[str, float]: number of requests that had to wait for a token
+            and for how long in total, and the number of rate limited responses.
+            Of this process only.
+        """
+        with self._lock:
+            return dict(self._stats)
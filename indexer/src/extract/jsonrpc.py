@@ -0,0 +1,180 @@
+"""
+Ethereum JSON-RPC client
+"""
+import itertools
+from typing import Any, Dict, List, Optional, Tuple
+
+from extract.session import PooledSession
+
+# maximum number of calls sent in a single JSON-RPC batch request
+MAX_BATCH_SIZE = 100
+
+
+class JsonRpcError(Exception):
+    """Raised when the node responds to a call with an error"""
+
+    def __init__(self, error: Dict[str, Any]):
+        super().__init__(f"{error.get('code')}: {error.get('message')}")
+        self.code = error.get("code")
+        self.message = error.get("message")
+
+
+class JsonRpc:
+    """Client for interacting with an Ethereum node over JSON-RPC"""
+
+    def __init__(self, uri: str, session: Optional[PooledSession] = None):
+        self._uri = uri
+        self._session = PooledSession() if session is None else session
+        self._ids = itertools.count()
+
+    def _call(self, method: str, params: List[Any]) -> Dict[str, Any]:
+        return {
+            "jsonrpc": "2.0",
+            "id": next(self._ids),
+            "method": method,
+            "params": params,
+        }
+
+    @staticmethod
+    def _get_result(response: Dict[str, Any]) -> Any:
+        if response.get("error") is not None:
+            raise JsonRpcError(response["error"])
+
+        return response["result"]
+
+    def request(self, method: str, params: List[Any]) -> Any:
+        """
+        Makes a single JSON-RPC call.
+
+        Args:
+            method (str): e.g. eth_blockNumber.
+            params (List[Any]): positional params of the method.
+
+        Raises:
+            JsonRpcError: if the node responds with an error.
+            RetriesExhaustedError: if the node can not be reached.
+
+        Returns:
+            Any: the result of the call.
+        """
+
+        response = self._session.post(self._uri, self._call(method, params))
+
+        return self._get_result(response.json())
+
+    def batch(self, calls: List[Tuple[str, List[Any]]]) -> List[Any]:
+        """
+        Makes the calls in JSON-RPC batch requests of up to `MAX_BATCH_SIZE`
+        calls each.
+
+        Args:
+            calls (List[Tuple[str, List[Any]]]): (method, params) pairs.
+
+        Raises:
+            JsonRpcError: if the node responds to any of the calls with an
+            error, or rejects the batch as a whole.
+            RetriesExhaustedError: if the node can not be reached.
+
+        Returns:
+            List[Any]: results, in the order of the calls.
+        """
+
+        results = []
+
+        for start in range(0, len(calls), MAX_BATCH_SIZE):
+            batch = [
+                self._call(method, params)
+                for method, params in calls[start : start + MAX_BATCH_SIZE]
+            ]
+
+            response_json = self._session.post(self._uri, batch).json()
+
+            # * a node that rejects the batch, e.g. because it does not support
+            # * batches or it is too large, answers with a single error object
+            if isinstance(response_json, dict):
+                raise JsonRpcError(
+                    response_json.get("error")
+                    or {"message": "The batch was not answered."}
+                )
+
+            # * responses to a batch may come in any order
+            responses = {response["id"]: response for response in response_json}
+
+            for call in batch:
+                if call["id"] not in responses:
+                    raise JsonRpcError(
+                        {"message": f"Call {call['method']} was not answered."}
+                    )
+                results.append(self._get_result(responses[call["id"]]))
+
+        return results
+
+    def get_block_number(self) -> int:
+        """
+        Returns:
+            int: number of the latest block.
+        """
+        return int(self.request("eth_blockNumber", []), 16)
+
+    def get_logs(
+        self,
+        address: str,
+        from_block: int,
+        to_block: int,
+        topics: Optional[List[Any]] = None,
+    ) -> List[Any]:
+        """
+        Args:
+            address (str): address that emitted the logs.
+            from_block (int): first block, inclusive.
+            to_block (int): last block, inclusive.
+            topics (Optional[List[Any]], optional): topic filters, as in
+            `eth_getLogs`. Defaults to None.
+
+        Raises:
+            JsonRpcError: e.g. if the range has more logs than the node is
+            willing to return at once.
+
+        Returns:
+            List[Any]: the logs, as returned by the node.
+        """
+
+        log_filter = {
+            "address": address,
+            "fromBlock": hex(from_block),
+            "toBlock": hex(to_block),
+        }
+
+        if topics is not None:
+            log_filter["topics"] = topics
+
+        return self.request("eth_getLogs", [log_filter])
+
+    def get_block_timestamps(self, block_numbers: List[int]) -> Dict[int, int]:
+        """
+        Looks up the blocks' timestamps in batch requests.
+
+        Args:
+            block_numbers (List[int]): unique block numbers.
+
+        Returns:
+            Dict[int, int]: block number to its unix timestamp.
+        """
+
+        blocks = self.batch(
+            [("eth_getBlockByNumber", [hex(number), False]) for number in block_numbers]
+        )
+
+        return {
+            number: int(block["timestamp"], 16)
+            for number, block in zip(block_numbers, blocks)
+        }
+
+    def get_stats(self) -> Dict[str, float]:
+        """
+        Request statistics of the underlying session. See `PooledSession.get_stats`.
+
+        Returns:
+            Dict[str, float]: request, retry, failure counts and latencies.
+        """
+        return self._session.get_stats()
@@ -1,45 +1,113 @@
 import logging
 import time
+from contextlib import contextmanager
+from concurrent.futures import Future, ThreadPoolExecutor
+from multiprocessing.synchronize import Event
+from typing import Any, Dict, Iterator, List, Optional
 
 from config import Config
-from db import DB
+from db import get_db
+from interfaces.iasyncdb import IAsyncDB
+from interfaces.idb import IDB
 from interfaces.iextract import IExtract
+from io_loop import get_async_db, get_io_loop
+from threaded_db import ThreadedDB
 
 from extract.covalent import Covalent
+from extract.scheduler import PollScheduler
+from extract.session import RetriesExhaustedError
 
 # todo: eventually would want each extractor running in its own process
 # for now the solution around that would be to simply run this pipeline
 # multiple times
 
-EXTRACT_SLEEP_TIME = 15  # in seconds
+# maximum number of covalent pages that are requested concurrently when walking
+# the transaction history. The window starts at a single page and doubles while
+# every page is new, so that the regular polls only ever request page 0
+MAX_PAGES_IN_FLIGHT = 8
+
+# number of covalent pages after which the extracted transactions are written to
+# the db, together with a checkpoint to resume the walk from. 0 keeps all of the
+# extracted transactions in memory until `flush`
+FLUSH_EVERY_PAGES = 10
+
+# _id of the document, in the block height collection, that tracks the progress
+# of a transaction history walk that spans more than `FLUSH_EVERY_PAGES` pages
+BACKFILL_CHECKPOINT_ID = "backfill"
 
 
 class Extract(IExtract):
     """@inheritdoc IExtract"""
 
-    def __init__(self, config: Config):
+    # pylint: disable=too-many-arguments,too-many-instance-attributes
+    def __init__(
+        self,
+        config: Config,
+        pages_in_flight: int = MAX_PAGES_IN_FLIGHT,
+        flush_every_pages: int = FLUSH_EVERY_PAGES,
+        db: Optional[IDB] = None,
+        covalent: Optional[Covalent] = None,
+        new_data: Optional[Event] = None,
+        async_db: Optional[IAsyncDB] = None,
+    ):
         """
         Args:
-            address (str): address for which to extract the raw historical
-        transaction data.
+            config (Config): holds the address for which to extract the raw
+            historical transaction data.
+            pages_in_flight (int): maximum number of covalent pages requested
+            concurrently during backfills.
+            flush_every_pages (int): stream the transactions to the db every
+            this many pages. 0 disables streaming.
+            db (Optional[IDB]): where to write the transactions. Defaults to
+            the db of the DB_BACKEND.
+            covalent (Optional[Covalent]): client for the config's network,
+            e.g. to share its session. Defaults to a new client.
+            new_data (Optional[Event]): set whenever the block height moves
+            past new transactions, e.g. to wake up the transformer.
+            async_db (Optional[IAsyncDB]): writes the transactions in the
+            background, while the next pages are requested. Defaults to the
+            asyncio db of the DB_BACKEND, or to `db` in a thread pool if `db`
+            is given.
         """
 
+        if pages_in_flight < 1:
+            raise ValueError("pages_in_flight must be at least 1.")
+
+        if flush_every_pages < 0:
+            raise ValueError("flush_every_pages can not be negative.")
+
         self._config = config
+        self._pages_in_flight = pages_in_flight
+        self._flush_every_pages = flush_every_pages
 
         # todo: validate to ensure that this address is not in the db
 
         # block number up to which the extraction has happened
         self._block_height: int = 0
 
-        self._covalent = Covalent(self._config.get_network_id())
+        self._covalent = (
+            Covalent(self._config.get_network_id()) if covalent is None else covalent
+        )
 
         self._db_name = "ethereum-indexer"
 
-        self._db = DB()
+        self._db = get_db() if db is None else db
+
+        if async_db is None:
+            async_db = get_async_db() if db is None else ThreadedDB(db)
+        self._async_db = async_db
+        # * at most one write is in flight, the next one waits for it
+        self._pending_write: Optional[Future] = None
 
         # todo: type of transactions
         self._transactions = []
 
+        # progress of the current transaction history walk
+        self._backfill: Dict[str, Any] = {}
+
+        self._scheduler = PollScheduler()
+        self._new_data = new_data
+
     def _get_collection_name(self) -> str:
         return f"{self._config.get_address()}-{self._config.get_network_id()}"
 
@@ -55,8 +123,9 @@ class Extract(IExtract):
         we need to restart it.
         """
 
-        block_height_item = self._db.get_any_item(
-            self._db_name, self._get_block_height_collection_name()
+        # _id: 1, the collection also holds the backfill checkpoint
+        block_height_item = self._db.get_item(
+            1, self._db_name, self._get_block_height_collection_name()
         )
         # If it is None, then we have already set it to 0 in the
         # __init__. This will signal the extractor to extract
@@ -82,15 +151,151 @@ class Extract(IExtract):
             collection_name=self._get_block_height_collection_name(),
         )
 
-    def _request_transactions(self, page_number: int) -> None:
+        # * the transformer reads up to the block height, so only now can it
+        # * read the new transactions
+        if self._new_data is not None:
+            self._new_data.set()
+
+    def _determine_backfill(self) -> Optional[Dict[str, Any]]:
+        """
+        Finds the checkpoint of a transaction history walk that was interrupted
+        before it completed. The walk is complete once the block height has
+        caught up with its target block height.
+
+        Returns:
+            Optional[Dict[str, Any]]: the walk's progress, None if there is no
+            walk to resume.
+        """
+
+        backfill = self._db.get_item(
+            BACKFILL_CHECKPOINT_ID,
+            self._db_name,
+            self._get_block_height_collection_name(),
+        )
+
+        if backfill is None or backfill["target_block_height"] <= self._block_height:
+            return None
+
+        del backfill["_id"]
+        return backfill
+
+    def _get_backfill_checkpoint(self) -> Dict[str, Any]:
+        """
+        Returns:
+            Dict[str, Any]: the progress of the current transaction history
+            walk, as it is persisted. A copy, since the walk goes on while it is
+            written.
+        """
+
+        return {
+            "_id": BACKFILL_CHECKPOINT_ID,
+            **self._backfill,
+            "tx_hashes": list(self._backfill["tx_hashes"]),
+        }
+
+    def _request_transactions(self, page_number: int) -> Any:
         return self._covalent.request_transactions(
             self._config.get_address(), page_number
         )
 
+    def _request_pages(self, executor: ThreadPoolExecutor, page_numbers: range) -> Any:
+        """
+        Requests the given pages concurrently and yields the responses in the
+        order of the page numbers. Requests that are not yet running are
+        cancelled if the caller stops consuming the responses.
+
+        Args:
+            executor (ThreadPoolExecutor): pool that performs the requests.
+            page_numbers (range): consecutive covalent page numbers.
+
+        Yields:
+            requests.Response: covalent response for each page, in order.
+        """
+
+        futures = [
+            executor.submit(self._request_transactions, page_number)
+            for page_number in page_numbers
+        ]
+        try:
+            for future in futures:
+                yield future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def _collect_new_transactions(
+        self, transactions: List[Any], last_block_height: int
+    ) -> bool:
+        """
+        Keeps the transactions that are after `last_block_height`.
+
+        Args:
+            transactions (List[Any]): transactions of a single covalent page,
+            in descending block order.
+            last_block_height (int): block number up to which we already have
+            the data.
+
+        Returns:
+            bool: True if the page did not reach `last_block_height`, i.e. the
+            next page still needs to be requested.
+        """
+
+        for txn in transactions:
+            block_height = self._covalent.get_block_height_from_transaction(txn)
+
+            if (block_height is None) or (block_height <= last_block_height):
+                return False
+
+            if self._is_collected(txn):
+                continue
+
+            txn["_id"] = txn["tx_hash"]
+            self._transactions.append(txn)
+
+            # * transactions come in descending block order, so this is the
+            # * lowest block that we have collected so far
+            if block_height != self._backfill["block_height"]:
+                self._backfill["block_height"] = block_height
+                self._backfill["tx_hashes"] = []
+            self._backfill["tx_hashes"].append(txn["tx_hash"])
+
+        # * an empty page means that we have walked the complete history
+        return len(transactions) > 0
+
+    def _is_collected(self, txn: Any) -> bool:
+        """
+        New transactions push the older ones onto the later pages. When that
+        happens during the walk, or before an interrupted walk is resumed, a
+        page can repeat transactions that we have already collected.
+
+        Args:
+            txn (Any): transaction from a covalent page.
+
+        Returns:
+            bool: True if the transaction was already collected by this walk.
+        """
+
+        lowest_block_height = self._backfill["block_height"]
+
+        if lowest_block_height is None:
+            return False
+
+        block_height = self._covalent.get_block_height_from_transaction(txn)
+
+        return block_height > lowest_block_height or (
+            block_height == lowest_block_height
+            and txn["tx_hash"] in self._backfill["tx_hashes"]
+        )
+
     def _extract_txn_history_since(self, block_height: int) -> None:
         """
         Makes requests to Covalent, and only extracts transactions after `block_height`
-        block number.
+        block number. Pages are requested concurrently, in windows of up to
+        `pages_in_flight` pages, but are always processed in order.
+
+        With streaming enabled, the transactions are written to the db every
+        `flush_every_pages` pages, and an interrupted walk resumes from the
+        last written page.
 
         Args:
             block_height (int): We have data for this address up to and including this
@@ -102,62 +307,149 @@ class Extract(IExtract):
             f"Extracting {self._config.get_address()} since block: {block_height}"
         )
 
-        page_number = 0
+        self._backfill = self._determine_backfill() or {
+            # * the head of the history, as seen on the first page
+            "target_block_height": None,
+            # * next page to request
+            "page_number": 0,
+            # * lowest block collected, and the transactions collected in it
+            "block_height": None,
+            "tx_hashes": [],
+        }
+
+        if self._backfill["page_number"] > 0:
+            logging.info(f"Resuming extraction from: {self._backfill}")
+
+        page_number = self._backfill["page_number"]
+        # * a resumed walk already knows its target, so there is no update time
+        update_times = (None, None)
+        pages_since_flush = 0
+        window = 1
         last_block_height = block_height
-        latest_block_height = 0
         keep_looping = True
 
-        while keep_looping:
+        with ThreadPoolExecutor(
+            max_workers=self._pages_in_flight
+        ) as executor, self._writes_completed():
+            while keep_looping:
 
-            response = self._request_transactions(page_number)
-            block_height = self._covalent.get_block_height(response)
+                page_numbers = range(page_number, page_number + window)
 
-            if page_number == 0:
-                latest_block_height = block_height
+                for response in self._request_pages(executor, page_numbers):
 
-            transactions = self._covalent.get_transactions(response)
+                    if self._backfill["target_block_height"] is None:
+                        self._backfill["target_block_height"] = (
+                            self._covalent.get_block_height(response) or 0
+                        )
+                        update_times = self._covalent.get_update_times(response)
 
-            for txn in transactions:
-                # * block height cannot be zero here due to the check earlier
-                block_height = self._covalent.get_block_height_from_transaction(txn)
+                    transactions = self._covalent.get_transactions(response)
+                    keep_looping = self._collect_new_transactions(
+                        transactions, last_block_height
+                    )
 
-                if (block_height is None) or (block_height <= last_block_height):
-                    keep_looping = False
-                    break
+                    if not keep_looping:
+                        break
 
-                if block_height > last_block_height:
-                    txn["_id"] = txn["tx_hash"]
-                    self._transactions.append(txn)
+                    page_number += 1
+                    pages_since_flush += 1
 
-            if not keep_looping:
-                break
+                    if self._flush_every_pages and (
+                        pages_since_flush >= self._flush_every_pages
+                    ):
+                        # * the checkpoint is written after the transactions
+                        # * that it covers, while the next pages are requested
+                        self._backfill["page_number"] = page_number
+                        self._write_transactions(self._get_backfill_checkpoint())
+                        pages_since_flush = 0
 
-            if block_height is None:
-                break
+                # * every page in the window was new, so the history is
+                # * long enough to request more pages at a time
+                window = min(window * 2, self._pages_in_flight)
 
-            if block_height > last_block_height:
-                page_number += 1
+            if self._flush_every_pages:
+                # * the block height must never be ahead of the written
+                # * transactions
+                self._write_transactions()
 
+        latest_block_height = self._backfill["target_block_height"]
         if latest_block_height > last_block_height:
             self._update_block_height(latest_block_height)
 
-        logging.info("Extractor sleeping...")
-        time.sleep(EXTRACT_SLEEP_TIME)
+        self._scheduler.update(latest_block_height > last_block_height, *update_times)
 
-    # Interface Implementation
+    def _write_transactions(self, checkpoint: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Hands the collected transactions, and then the checkpoint that covers
+        them, to the io loop, and returns without waiting for the writes. Waits
+        for the previous writes first, such that they complete in order.
 
-    def flush(self) -> None:
-        """@inheritdoc IExtract"""
+        Args:
+            checkpoint (Optional[Dict[str, Any]]): item of the block height
+            collection to write once the transactions are written.
+        """
+
+        self._wait_for_writes()
 
-        if len(self._transactions) == 0:
+        if len(self._transactions) == 0 and checkpoint is None:
             return
 
-        self._db.put_items(
-            self._transactions, self._db_name, self._get_collection_name()
+        self._pending_write = get_io_loop().submit(
+            self._write(self._transactions, checkpoint)
         )
-
         self._transactions = []
 
+    async def _write(
+        self, transactions: List[Any], checkpoint: Optional[Dict[str, Any]]
+    ) -> None:
+        if len(transactions) > 0:
+            # * upserts, since the pages after the last backfill checkpoint are
+            # * extracted again after a crash
+            counts = await self._async_db.put_items_bulk(
+                transactions, self._db_name, self._get_collection_name()
+            )
+            logging.info(f"Wrote transactions: {counts}")
+
+        if checkpoint is not None:
+            await self._async_db.put_item(
+                checkpoint, self._db_name, self._get_block_height_collection_name()
+            )
+
+    def _wait_for_writes(self) -> None:
+        """
+        Blocks until the writes handed to the io loop are complete.
+
+        Raises:
+            Exception: whatever the writes raised.
+        """
+
+        if self._pending_write is None:
+            return
+
+        pending_write, self._pending_write = self._pending_write, None
+        pending_write.result()
+
+    @contextmanager
+    def _writes_completed(self) -> Iterator[None]:
+        """
+        Nothing that comes after, e.g. the block height, or the next run
+        reading the backfill checkpoint, can be ahead of the writes in flight,
+        even if the walk raises.
+        """
+
+        try:
+            yield
+        finally:
+            self._wait_for_writes()
+
+    # Interface Implementation
+
+    def flush(self) -> None:
+        """@inheritdoc IExtract"""
+
+        self._write_transactions()
+        self._wait_for_writes()
+
     def extract(self) -> None:
         """@inheritdoc IExtract"""
 
@@ -169,13 +461,38 @@ class Extract(IExtract):
         # if it doesn't have any transactions, download all
         # - we utilise a separate collection to track what raw transactions have
         # been extracted
-        self._extract_txn_history_since(self._block_height)
+        try:
+            self._extract_txn_history_since(self._block_height)
+        except RetriesExhaustedError as e:
+            # * neither the block height, nor the backfill checkpoint cover these
+            # * transactions, so they will be extracted again on the next run
+            logging.error(f"Extraction failed: {e}. Retrying on the next run.")
+            self._transactions = []
+            self._scheduler.update(False)
+
+        logging.info(f"Covalent stats: {self._covalent.get_stats()}")
+
+    def get_poll_delay(self) -> float:
+        """
+        Returns:
+            float: seconds to wait before the next extraction.
+        """
+        return self._scheduler.get_delay()
+
+    def __call__(self):
+        while True:
+            self.extract()
+            self.flush()
+
+            delay = self.get_poll_delay()
+            logging.info(f"Extractor sleeping for {delay:.1f}s...")
+            time.sleep(delay)
 
     def __setattr__(self, key, value):
         # https://towardsdatascience.com/how-to-create-read-only-and-deletion-proof-attributes-in-your-python-classes-b34cd1019c2d
 
         # re-setting the _address, _db_name, _db, _load is not allowed
-        forbid_reset_on = ["_config", "_address", "_db_name", "_db"]
+        forbid_reset_on = ["_config", "_address", "_db_name", "_db", "_async_db"]
         for k in forbid_reset_on:
             if key == k and hasattr(self, k):
                 raise AttributeError(
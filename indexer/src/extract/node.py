@@ -0,0 +1,287 @@
+"""
+IExtract implementation that pulls the logs straight from an Ethereum node
+"""
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from multiprocessing.synchronize import Event
+from typing import Any, List, Optional
+
+from config import Config
+from db import get_db
+from interfaces.idb import IDB
+from interfaces.iextract import IExtract
+
+from extract.covalent import Covalent
+from extract.jsonrpc import JsonRpc, JsonRpcError
+from extract.scheduler import PollScheduler
+from extract.session import PooledSession, RetriesExhaustedError
+
+# a block every ~12 seconds on mainnet
+MIN_POLL_INTERVAL = 12  # in seconds
+
+# logs are requested over block windows that adapt to the density of the logs:
+# the window halves when the node refuses to return that many logs at once, and
+# doubles while the windows come back with less than half of the target
+INITIAL_BLOCK_WINDOW = 2_000
+MAX_BLOCK_WINDOW = 100_000
+TARGET_LOGS_PER_WINDOW = 5_000
+
+# the node refuses a window that has too many logs, or spans too many blocks,
+# with the EIP-1474 "limit exceeded" code, or with one of these messages.
+# Every other error, e.g. auth or unknown method, is raised
+RANGE_ERROR_CODES = (-32005,)
+RANGE_ERROR_MESSAGES = (
+    "more than",
+    "too many",
+    "too large",
+    "block range",
+    "response size",
+)
+
+# blocks this close to the head are not extracted yet, in case they get reorged
+CONFIRMATIONS = 12
+
+
+class NodeExtract(IExtract):
+    """@inheritdoc IExtract"""
+
+    # pylint: disable=too-many-arguments,too-many-instance-attributes
+    def __init__(
+        self,
+        config: Config,
+        uri: Optional[str] = None,
+        topics: Optional[List[Any]] = None,
+        db: Optional[IDB] = None,
+        session: Optional[PooledSession] = None,
+        new_data: Optional[Event] = None,
+    ):
+        """
+        Args:
+            config (Config): holds the address for which to extract the logs.
+            uri (Optional[str]): JSON-RPC endpoint of the node. Defaults to
+            the ETH_RPC_URI environment variable.
+            topics (Optional[List[Any]]): `eth_getLogs` topic filters.
+            Defaults to all of the address' logs.
+            db (Optional[IDB]): where to write the transactions. Defaults to
+            the db of the DB_BACKEND.
+            session (Optional[PooledSession]): e.g. to share the connections
+            to the node. Defaults to a new session.
+            new_data (Optional[Event]): set whenever the block height moves
+            past new transactions, e.g. to wake up the transformer.
+        """
+
+        self._config = config
+        self._topics = topics
+
+        # block number up to which the extraction has happened
+        self._block_height: int = 0
+
+        self._block_window = INITIAL_BLOCK_WINDOW
+
+        self._rpc = JsonRpc(uri or os.environ["ETH_RPC_URI"], session)
+
+        self._db_name = "ethereum-indexer"
+
+        self._db = get_db() if db is None else db
+
+        self._transactions = []
+
+        self._scheduler = PollScheduler(min_interval=MIN_POLL_INTERVAL)
+        self._new_data = new_data
+        # number of transactions written during the current extraction
+        self._extracted = 0
+
+    def _get_collection_name(self) -> str:
+        return f"{self._config.get_address()}-{self._config.get_network_id()}"
+
+    def _get_block_height_collection_name(self) -> str:
+        return (
+            f"{self._config.get_address()}-{self._config.get_network_id()}-block-height"
+        )
+
+    def _determine_block_height(self) -> None:
+        block_height_item = self._db.get_item(
+            1, self._db_name, self._get_block_height_collection_name()
+        )
+
+        if block_height_item is None:
+            return
+
+        self._block_height = block_height_item["block_height"]
+
+    def _update_block_height(self, new_block_height: int) -> None:
+        # _id: 1, because we are only ever storing single block_height value per address
+        item = {"_id": 1, "block_height": new_block_height}
+        self._db.put_item(
+            item=item,
+            database_name=self._db_name,
+            collection_name=self._get_block_height_collection_name(),
+        )
+
+    @staticmethod
+    def _to_log_event(log: Any, timestamp: int) -> Any:
+        """
+        Shapes the log like the covalent log events, which is what the
+        transformers consume. Nothing is decoded.
+        """
+
+        return {
+            "block_signed_at": datetime.fromtimestamp(timestamp, timezone.utc).strftime(
+                "%Y-%m-%dT%H:%M:%SZ"
+            ),
+            "block_height": int(log["blockNumber"], 16),
+            "tx_offset": int(log["transactionIndex"], 16),
+            "log_offset": int(log["logIndex"], 16),
+            "tx_hash": log["transactionHash"],
+            "raw_log_topics": log["topics"],
+            "sender_address": log["address"].lower(),
+            "raw_log_data": log["data"],
+            "decoded": None,
+        }
+
+    @staticmethod
+    def _is_range_error(error: JsonRpcError) -> bool:
+        """
+        Returns:
+            bool: True if the node refused the window for its size, in which
+            case a smaller one can succeed.
+        """
+
+        if error.code in RANGE_ERROR_CODES:
+            return True
+
+        message = str(error.message or "").lower()
+        return any(reason in message for reason in RANGE_ERROR_MESSAGES)
+
+    def _request_logs(self, from_block: int, to_block: int) -> Optional[List[Any]]:
+        """
+        Raises:
+            JsonRpcError: if the node refused the window for any other reason
+            than its size, or refused a single block.
+
+        Returns:
+            Optional[List[Any]]: the logs, or None if the node refused the range
+            and the block window was shrunk.
+        """
+
+        try:
+            logs = self._rpc.get_logs(
+                self._config.get_address(), from_block, to_block, self._topics
+            )
+        except JsonRpcError as e:
+            if to_block == from_block or not self._is_range_error(e):
+                raise
+
+            self._block_window = max(self._block_window // 2, 1)
+            logging.info(f"Node refused the range ({e}). Window: {self._block_window}")
+            return None
+
+        if len(logs) < TARGET_LOGS_PER_WINDOW // 2:
+            self._block_window = min(self._block_window * 2, MAX_BLOCK_WINDOW)
+
+        return [log for log in logs if not log.get("removed", False)]
+
+    def _extract_logs_since(self, block_height: int) -> None:
+        """
+        Extracts the logs after `block_height`, one block window at a time. Each
+        window is written to the db together with the new block height.
+        """
+
+        from_block = max(block_height + 1, self._config.get_deploy_block())
+        head = self._rpc.get_block_number() - CONFIRMATIONS
+
+        logging.info(
+            f"Extracting {self._config.get_address()} logs from block: {from_block}"
+            f" to block: {head}"
+        )
+
+        while from_block <= head:
+            to_block = min(from_block + self._block_window - 1, head)
+
+            logs = self._request_logs(from_block, to_block)
+            if logs is None:
+                continue
+
+            block_numbers = sorted({int(log["blockNumber"], 16) for log in logs})
+            timestamps = self._rpc.get_block_timestamps(block_numbers)
+
+            log_events = [
+                self._to_log_event(log, timestamps[int(log["blockNumber"], 16)])
+                for log in logs
+            ]
+            self._transactions = Covalent.group_log_events(log_events)
+
+            # * the block height must never be ahead of the written transactions
+            has_transactions = len(self._transactions) > 0
+            self.flush()
+            self._update_block_height(to_block)
+
+            # * the transformer reads up to the block height, so only now can it
+            # * read the new transactions
+            if has_transactions and self._new_data is not None:
+                self._new_data.set()
+
+            from_block = to_block + 1
+
+    # Interface Implementation
+
+    def flush(self) -> None:
+        """@inheritdoc IExtract"""
+
+        # * upserts, since a window that was interrupted before its block height
+        # * was updated is extracted again
+        self._db.put_items_bulk(
+            self._transactions, self._db_name, self._get_collection_name()
+        )
+
+        self._extracted += len(self._transactions)
+
+        self._transactions = []
+
+    def extract(self) -> None:
+        """@inheritdoc IExtract"""
+
+        self._determine_block_height()
+        self._extracted = 0
+
+        try:
+            self._extract_logs_since(self._block_height)
+        # * e.g. the node refused the logs of a single block, which can not be
+        # * shrunk any further
+        except (RetriesExhaustedError, JsonRpcError) as e:
+            logging.error(f"Extraction failed: {e}. Retrying on the next run.")
+
+        self._scheduler.update(self._extracted > 0)
+
+        logging.info(f"Node stats: {self._rpc.get_stats()}")
+
+    def get_poll_delay(self) -> float:
+        """
+        Returns:
+            float: seconds to wait before the next extraction.
+        """
+        return self._scheduler.get_delay()
+
+    def __call__(self):
+        while True:
+            self.extract()
+            self.flush()
+
+            delay = self.get_poll_delay()
+            logging.info(f"Extractor sleeping for {delay:.1f}s...")
+            time.sleep(delay)
+
+    def __setattr__(self, key, value):
+        # https://towardsdatascience.com/how-to-create-read-only-and-deletion-proof-attributes-in-your-python-classes-b34cd1019c2d
+
+        forbid_reset_on = ["_config", "_db_name", "_db", "_rpc"]
+        for k in forbid_reset_on:
+            if key == k and hasattr(self, k):
+                raise AttributeError(
+                    "The value of the address attribute has already been set,"
+                    " and can not be re-set."
+                )
+
+        self.__dict__[key] = value
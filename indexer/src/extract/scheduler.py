@@ -0,0 +1,92 @@
+"""
+Adaptive poll scheduler
+"""
+from datetime import datetime, timezone
+from typing import Optional
+
+MIN_POLL_INTERVAL = 15  # in seconds
+MAX_POLL_INTERVAL = 600  # in seconds
+# the poll interval is multiplied by this after every poll without new data
+IDLE_BACKOFF = 2
+# providers need a moment to actually serve the data of an update
+UPDATE_MARGIN = 2  # in seconds
+
+
+class PollScheduler:
+    """
+    Decides how long to wait until the next poll.
+
+    Without new data the interval grows by `IDLE_BACKOFF` per poll, up to
+    `max_interval`, and it resets to `min_interval` as soon as there is new data.
+
+    When the provider tells when it refreshes its data next (Covalent's
+    `updated_at` and `next_update_at`), polls are aligned to land right after
+    one of its updates instead: the next one while there is new data, and later
+    ones as the interval grows, since polling before an update is pointless.
+    """
+
+    def __init__(
+        self,
+        min_interval: float = MIN_POLL_INTERVAL,
+        max_interval: float = MAX_POLL_INTERVAL,
+        backoff: float = IDLE_BACKOFF,
+    ):
+        self._min_interval = min_interval
+        self._max_interval = max_interval
+        self._backoff = backoff
+
+        self._interval = min_interval
+        self._updated_at: Optional[datetime] = None
+        self._next_update_at: Optional[datetime] = None
+
+    def update(
+        self,
+        new_data: bool,
+        updated_at: Optional[datetime] = None,
+        next_update_at: Optional[datetime] = None,
+    ) -> None:
+        """
+        Records the outcome of a poll.
+
+        Args:
+            new_data (bool): True if the poll found new data.
+            updated_at (Optional[datetime]): when the provider last refreshed.
+            next_update_at (Optional[datetime]): when the provider refreshes next.
+        """
+
+        if new_data:
+            self._interval = self._min_interval
+        else:
+            self._interval = min(self._interval * self._backoff, self._max_interval)
+
+        self._updated_at = updated_at
+        self._next_update_at = next_update_at
+
+    def get_delay(self, now: Optional[datetime] = None) -> float:
+        """
+        Args:
+            now (Optional[datetime]): defaults to the current time.
+
+        Returns:
+            float: seconds to wait before the next poll.
+        """
+
+        if self._next_update_at is None:
+            return self._interval
+
+        now = datetime.now(timezone.utc) if now is None else now
+        delay = (self._next_update_at - now).total_seconds() + UPDATE_MARGIN
+
+        period = None
+        if self._updated_at is not None:
+            period = (self._next_update_at - self._updated_at).total_seconds()
+
+        if period is not None and period > 0:
+            # * skip the provider's updates that come sooner than the idle
+            # * backoff allows
+            while delay < self._interval - self._min_interval or delay <= 0:
+                delay += period
+        else:
+            delay = max(delay, self._interval)
+
+        return min(max(delay, 0), self._max_interval)
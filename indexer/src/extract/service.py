@@ -0,0 +1,142 @@
+"""
+Extractor service that keeps many addresses up to date from a single process
+"""
+import heapq
+import logging
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from multiprocessing.synchronize import Event
+from typing import Dict, List, Optional
+
+from config import Config
+from db import get_db
+from interfaces.iextract import IExtract
+from io_loop import get_async_db
+
+from extract.covalent import Covalent
+from extract.main import MAX_PAGES_IN_FLIGHT, Extract
+from extract.node import NodeExtract
+from extract.scheduler import MAX_POLL_INTERVAL
+from extract.session import PooledSession
+
+# number of targets that are extracted at the same time
+SERVICE_WORKERS = 4
+
+
+class ExtractService:
+    """
+    Extracts a list of (address, network_id) targets on a shared pool of worker
+    threads, one db client, one asyncio db client and one HTTP connection pool.
+
+    Each target keeps its own `PollScheduler` and its own checkpoint in the
+    `<address>-<network>-block-height` collection, exactly like a standalone
+    extractor. The service only decides which target is polled next: whichever
+    is due first, as soon as a worker is free.
+    """
+
+    def __init__(
+        self,
+        configs: List[Config],
+        workers: int = SERVICE_WORKERS,
+        new_data: Optional[List[Optional[Event]]] = None,
+    ):
+        """
+        Args:
+            configs (List[Config]): the targets to extract.
+            workers (int): number of targets that are extracted at the same time.
+            new_data (Optional[List[Optional[Event]]]): per target, set whenever
+            its block height moves past new transactions.
+        """
+
+        self._configs = configs
+        self._workers = max(workers, 1)
+
+        self._db = get_db()
+        self._async_db = get_async_db()
+        # * every covalent extraction keeps up to MAX_PAGES_IN_FLIGHT requests
+        # * in flight
+        self._session = PooledSession(pool_size=self._workers * MAX_PAGES_IN_FLIGHT)
+
+        new_data = new_data or [None] * len(configs)
+        self._extracts: List[IExtract] = [
+            self._make_extract(config, event)
+            for config, event in zip(configs, new_data)
+        ]
+
+    def _make_extract(self, config: Config, new_data: Optional[Event]) -> IExtract:
+        """
+        Extracts from the Ethereum node at ETH_RPC_URI if it is set, and from
+        Covalent otherwise.
+        """
+
+        if os.getenv("ETH_RPC_URI"):
+            return NodeExtract(
+                config, db=self._db, session=self._session, new_data=new_data
+            )
+
+        return Extract(
+            config,
+            db=self._db,
+            covalent=Covalent(config.get_network_id(), self._session),
+            new_data=new_data,
+            async_db=self._async_db,
+        )
+
+    @staticmethod
+    def _poll(extract: IExtract) -> float:
+        """
+        Runs a single extraction of a target.
+
+        Returns:
+            float: seconds until the target is due again.
+        """
+
+        extract.extract()
+        extract.flush()
+        return extract.get_poll_delay()
+
+    def _get_delay(self, future: Future, ix: int) -> float:
+        try:
+            return future.result()
+        except Exception:  # pylint: disable=broad-except
+            # * a failing target must not take the others down with it
+            logging.exception(
+                f"Extraction of {self._configs[ix].get_address()} failed."
+            )
+            return MAX_POLL_INTERVAL
+
+    def __call__(self):
+        # (due time, target index). All of the targets are due right away
+        due = [(0.0, ix) for ix in range(len(self._extracts))]
+        running: Dict[Future, int] = {}
+
+        with ThreadPoolExecutor(max_workers=self._workers) as executor:
+            while True:
+                for future in [future for future in running if future.done()]:
+                    ix = running.pop(future)
+                    delay = self._get_delay(future, ix)
+                    logging.info(
+                        f"Polling {self._configs[ix].get_address()} again"
+                        f" in {delay:.1f}s..."
+                    )
+                    heapq.heappush(due, (time.monotonic() + delay, ix))
+
+                now = time.monotonic()
+                if due and due[0][0] <= now and len(running) < self._workers:
+                    _, ix = heapq.heappop(due)
+                    running[executor.submit(self._poll, self._extracts[ix])] = ix
+                    continue
+
+                # * sleep until a poll completes, or the next target is due and
+                # * there is a worker to poll it
+                timeout = None
+                if due and len(running) < self._workers:
+                    timeout = max(due[0][0] - now, 0)
+
+                if running:
+                    wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+                elif timeout is not None:
+                    time.sleep(timeout)
+                else:
+                    return
@@ -0,0 +1,243 @@
+"""
+Pooled HTTP session with bounded, jittered exponential backoff
+"""
+import logging
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from extract.governor import RateGovernor
+
+# (connect, read) timeouts of a single request, in seconds
+REQUEST_TIMEOUT = (5, 30)
+# number of keep-alive connections held per host. Should be at least the
+# number of threads that share the session
+POOL_SIZE = 16
+# number of retries after the first attempt, before giving up on a request
+MAX_RETRIES = 8
+BACKOFF_BASE = 0.5  # in seconds
+BACKOFF_CAP = 60  # in seconds
+
+
+class RetriesExhaustedError(Exception):
+    """Raised when a request still fails after its retry budget is spent"""
+
+
+class PooledSession:
+    """
+    Thin wrapper around `requests.Session` that reuses connections across
+    requests (and threads), retries failed requests with full-jitter exponential
+    backoff, and keeps request statistics for monitoring.
+    """
+
+    # pylint: disable=too-many-arguments
+    def __init__(
+        self,
+        pool_size: int = POOL_SIZE,
+        timeout: Tuple[float, float] = REQUEST_TIMEOUT,
+        max_retries: int = MAX_RETRIES,
+        backoff_base: float = BACKOFF_BASE,
+        backoff_cap: float = BACKOFF_CAP,
+    ):
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+
+        self._timeout = timeout
+        self._max_retries = max_retries
+        self._backoff_base = backoff_base
+        self._backoff_cap = backoff_cap
+
+        self._lock = threading.Lock()
+        self._stats = {
+            "requests": 0,
+            "retries": 0,
+            "failures": 0,
+            "latency_total": 0.0,
+            "latency_max": 0.0,
+        }
+
+    def _backoff(self, attempt: int) -> float:
+        """
+        Full jitter: sleep a random amount of time between zero and the
+        exponentially growing, capped, backoff.
+
+        Args:
+            attempt (int): zero based index of the retry.
+
+        Returns:
+            float: seconds to sleep before the retry.
+        """
+        return random.uniform(
+            0, min(self._backoff_cap, self._backoff_base * 2**attempt)
+        )
+
+    def _record(self, key: str, latency: Optional[float] = None) -> None:
+        with self._lock:
+            self._stats[key] += 1
+            if latency is not None:
+                self._stats["latency_total"] += latency
+                self._stats["latency_max"] = max(self._stats["latency_max"], latency)
+
+    def get(
+        self,
+        url: str,
+        should_retry: Optional[Callable[[requests.Response], Optional[str]]] = None,
+        governor: Optional[RateGovernor] = None,
+    ) -> requests.Response:
+        """
+        GET request that is retried on connection errors, timeouts, non-200
+        responses and whenever `should_retry` gives a reason to.
+
+        Args:
+            url (str): the uri to request. It is never logged, since it may
+            hold API keys.
+            should_retry (Optional[Callable[[requests.Response], Optional[str]]]):
+            inspects a 200 response, and returns the reason to retry it, or None
+            if the response is good.
+            governor (Optional[RateGovernor]): if given, every attempt waits for
+            a token and is made with the key that the governor hands out, as the
+            `key` query param. Rate limited keys are reported back to it.
+
+        Raises:
+            RetriesExhaustedError: if the request did not succeed within
+            the retry budget.
+
+        Returns:
+            requests.Response: the successful response.
+        """
+        return self._request("GET", url, should_retry, governor)
+
+    def post(
+        self,
+        url: str,
+        json: Any,
+        should_retry: Optional[Callable[[requests.Response], Optional[str]]] = None,
+    ) -> requests.Response:
+        """
+        POST request with a json body. Retried like `get`.
+
+        Args:
+            url (str): the uri to request. It is never logged.
+            json (Any): json serializable body.
+            should_retry (Optional[Callable[[requests.Response], Optional[str]]]):
+            see `get`.
+
+        Raises:
+            RetriesExhaustedError: if the request did not succeed within
+            the retry budget.
+
+        Returns:
+            requests.Response: the successful response.
+        """
+        return self._request("POST", url, should_retry, None, json=json)
+
+    @staticmethod
+    def _get_retry_after(response: requests.Response) -> Optional[float]:
+        """
+        Returns:
+            Optional[float]: seconds that the `Retry-After` header asks to wait,
+            if there is one.
+        """
+
+        retry_after = response.headers.get("Retry-After")
+        if retry_after is None:
+            return None
+
+        try:
+            return max(float(retry_after), 0.0)
+        except ValueError:
+            pass
+
+        try:
+            return max(parsedate_to_datetime(retry_after).timestamp() - time.time(), 0)
+        except (TypeError, ValueError):
+            return None
+
+    # pylint: disable=too-many-branches
+    def _request(
+        self,
+        method: str,
+        url: str,
+        should_retry: Optional[Callable[[requests.Response], Optional[str]]],
+        governor: Optional[RateGovernor],
+        **kwargs,
+    ) -> requests.Response:
+        reason = None
+        # seconds that the server asked to wait before the next attempt
+        retry_after = None
+        # True if the governor was told about the rate limited key
+        penalized = False
+
+        for attempt in range(self._max_retries + 1):
+
+            if attempt > 0:
+                self._record("retries")
+                # * the governor already holds the rate limited key back, and
+                # * hands out another one if there is one
+                if not penalized:
+                    time.sleep(max(self._backoff(attempt - 1), retry_after or 0))
+
+            key = None
+            if governor is not None:
+                key = governor.acquire()
+                kwargs["params"] = {"key": key}
+
+            retry_after = None
+            penalized = False
+            start = time.monotonic()
+            try:
+                response = self._session.request(
+                    method, url, timeout=self._timeout, **kwargs
+                )
+            except requests.RequestException as e:
+                reason = f"{type(e).__name__}"
+            else:
+                reason = None
+                if response.status_code != 200:
+                    reason = f"status code {response.status_code}"
+                    if response.status_code in (429, 503):
+                        retry_after = self._get_retry_after(response)
+                    if response.status_code == 429 and governor is not None:
+                        governor.penalize(key, retry_after)
+                        penalized = True
+                elif should_retry is not None:
+                    reason = should_retry(response)
+            finally:
+                self._record("requests", time.monotonic() - start)
+
+            if reason is None:
+                return response
+
+            logging.warning(
+                f"Request failed: {reason}."
+                f" Attempt {attempt + 1} of {self._max_retries + 1}."
+            )
+
+        self._record("failures")
+        raise RetriesExhaustedError(
+            f"Request failed after {self._max_retries + 1} attempts: {reason}."
+        )
+
+    def get_stats(self) -> Dict[str, float]:
+        """
+        Request statistics since the session was created.
+
+        Returns:
+            Dict[str, float]: number of requests (every attempt counts),
+            retries and failures (requests that exhausted the retry budget),
+            as well as the average and maximum latency in seconds.
+        """
+        with self._lock:
+            stats = dict(self._stats)
+
+        stats["latency_avg"] = (
+            stats["latency_total"] / stats["requests"] if stats["requests"] else 0.0
+        )
+        return stats
@@ -0,0 +1,95 @@
+"""
+We use formal interfaces to enforce **modularity** first and foremost, and then structure
+onto all of the code that is to be written.
+
+The asyncio counterpart of `IDB`, for the round trips that the extractor and the
+transformer overlap with their other work. Only the operations that they overlap
+are here, everything else goes through `IDB`.
+"""
+import abc
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+# pylint: disable=missing-class-docstring
+class IAsyncDB(metaclass=abc.ABCMeta):
+    @classmethod
+    def __subclasshook__(cls, subclass):
+        return (
+            hasattr(subclass, "put_item")
+            and callable(subclass.put_item)
+            and hasattr(subclass, "put_items_bulk")
+            and callable(subclass.put_items_bulk)
+            and hasattr(subclass, "get_item")
+            and callable(subclass.get_item)
+            and hasattr(subclass, "iter_batches")
+            and callable(subclass.iter_batches)
+            or NotImplemented
+        )
+
+    @abc.abstractmethod
+    async def put_item(
+        self, item: Any, database_name: str, collection_name: str
+    ) -> None:
+        """
+        @inheritdoc IDB.put_item
+        """
+        raise NotImplementedError
+
+    # pylint: disable=too-many-arguments
+    @abc.abstractmethod
+    async def put_items_bulk(
+        self,
+        items: List[Any],
+        database_name: str,
+        collection_name: str,
+        batch_size: int = 1000,
+        write_concern: Optional[Dict] = None,
+        overwrite: bool = False,
+    ) -> Dict[str, int]:
+        """
+        @inheritdoc IDB.put_items_bulk
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def get_item(
+        self,
+        identifier: str,
+        database_name: str,
+        collection_name: str,
+        projection: Optional[List[str]] = None,
+    ) -> Any:
+        """
+        @inheritdoc IDB.get_item
+        """
+        raise NotImplementedError
+
+    # pylint: disable=too-many-arguments
+    @abc.abstractmethod
+    async def iter_batches(
+        self,
+        database_name: str,
+        collection_name: str,
+        options: Optional[Dict] = None,
+        batch_size: int = 1000,
+        projection: Optional[List[str]] = None,
+    ) -> AsyncIterator[List[Any]]:
+        """
+        Like `IDB.iter_items`, but yields the items a batch of up to
+        `batch_size` at a time, one round trip per batch. Lets the caller
+        request the next batch while it is still working on the previous one.
+
+        Args:
+            database_name (str): name of the database.
+            collection_name (str): name of the collection.
+            options (Optional[Dict]): "query_clause", "sort".
+            batch_size (int): number of items per batch.
+            projection (Optional[List[str]]): the fields to return, besides
+            `_id`. Defaults to all of them.
+
+        Raises:
+            NotImplementedError: if this function is not implemented.
+
+        Returns:
+            AsyncIterator[List[Any]]: the batches of items, in order.
+        """
+        raise NotImplementedError
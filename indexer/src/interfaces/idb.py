@@ -6,7 +6,9 @@ Think of this as mathematical axioms, with which you then build proofs which you
 together to build new proofs.
 """
 import abc
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from interfaces.iwatch import IWatch
 
 # todo: some of the items below can raise. Write docs for it
 
@@ -53,25 +55,164 @@ class IDB(metaclass=abc.ABCMeta):
         for item in items:
             self.put_item(item, database_name, collection_name)
 
+    # pylint: disable=too-many-arguments,unused-argument
+    def put_items_bulk(
+        self,
+        items: List[Any],
+        database_name: str,
+        collection_name: str,
+        batch_size: int = 1000,
+        write_concern: Optional[Dict] = None,
+        overwrite: bool = False,
+    ) -> Dict[str, int]:
+        """
+        Idempotent bulk write. Items are upserted by their `_id` in batches of
+        `batch_size`, and the order of the writes is not guaranteed, such that
+        one item that is already there does not abort the rest of the batch.
+        Users are free to override to make use of in-built db bulk write API.
+
+        Args:
+            items (List[Any]): items with an `_id`.
+            database_name (str): name of the database.
+            collection_name (str): name of the collection.
+            batch_size (int): number of items per round trip.
+            write_concern (Optional[Dict]): e.g. `{"w": "majority", "j": True}`.
+            Defaults to the db's write concern.
+            overwrite (bool): replace the items that are already there. By
+            default, they are left untouched.
+
+        Returns:
+            Dict[str, int]: number of `inserted` items, and of `duplicates`:
+            the items that were already there, replaced or not.
+        """
+
+        counts = {"inserted": 0, "duplicates": 0}
+
+        for item in items:
+            exists = self.get_item(item["_id"], database_name, collection_name)
+
+            if exists is None or overwrite:
+                self.put_item(item, database_name, collection_name)
+
+            counts["duplicates" if exists is not None else "inserted"] += 1
+
+        return counts
+
+    # pylint: disable=unused-argument
+    def put_items_atomic(
+        self,
+        writes: List[Tuple[str, str, List[Any]]],
+        write_concern: Optional[Dict] = None,
+    ) -> bool:
+        """
+        Overwrites the items of many collections as one: either all of them
+        are written, or none of them is. Users are free to override, if the db
+        has transactions.
+
+        Args:
+            writes (List[Tuple[str, str, List[Any]]]): the database name, the
+            collection name, and the items with an `_id` to write to it.
+            write_concern (Optional[Dict]): e.g. `{"j": True}`, of the whole
+            write. Defaults to the db's write concern.
+
+        Returns:
+            bool: False if the db can not write atomically, in which case
+            nothing was written.
+        """
+
+        return False
+
+    def drop_collection(self, database_name: str, collection_name: str) -> None:
+        """
+        Deletes the collection with all of its items. Dropping a collection
+        that does not exist does nothing.
+
+        Args:
+            database_name (str): name of the database.
+            collection_name (str): name of the collection.
+
+        Raises:
+            NotImplementedError: if this function is not implemented.
+        """
+        raise NotImplementedError
+
     @abc.abstractmethod
     def get_item(
-        self, identifier: str, database_name: str, collection_name: str
+        self,
+        identifier: str,
+        database_name: str,
+        collection_name: str,
+        projection: Optional[List[str]] = None,
     ) -> Any:
-        """_summary_
+        """
+        Point lookup by `_id`. Should cost the same regardless of the size of
+        the collection.
 
         Args:
-            identifier (str): _description_
-            database_name (str): _description_
-            collection_name (str): _description_
+            identifier (str): `_id` of the item.
+            database_name (str): name of the database.
+            collection_name (str): name of the collection.
+            projection (Optional[List[str]]): fields to fetch, `_id` is always
+            included. Defaults to all of them.
 
         Raises:
-            NotImplementedError: _description_
+            NotImplementedError: if this function is not implemented.
 
         Returns:
-            Any: _description_
+            Any: the item, or None if there is no such item.
         """
         raise NotImplementedError
 
+    def ensure_indexes(
+        self, database_name: str, collection_name: str, indexes: List[Dict]
+    ) -> None:
+        """
+        Creates the indexes that do not exist yet. Dbs without secondary
+        indexes do nothing.
+
+        Args:
+            database_name (str): name of the database.
+            collection_name (str): name of the collection.
+            indexes (List[Dict]): each index has its `keys`, a list of
+            (field, direction) pairs, and optionally the db's index options,
+            e.g. `unique`.
+        """
+
+    def get_index_stats(
+        self, database_name: str, collection_name: str
+    ) -> List[Dict[str, Any]]:
+        """
+        Usage of the indexes of a collection, e.g. to spot the queries that
+        miss them.
+
+        Args:
+            database_name (str): name of the database.
+            collection_name (str): name of the collection.
+
+        Returns:
+            List[Dict[str, Any]]: the `name` of each index and the number of
+            `accesses` since the db started tracking them.
+        """
+        return []
+
+    def watch_item(
+        self, identifier: Any, database_name: str, collection_name: str
+    ) -> Optional[IWatch]:
+        """
+        Subscribes to the writes of an item, such that they can be waited for
+        instead of polled for.
+
+        Args:
+            identifier (Any): `_id` of the item.
+            database_name (str): name of the database.
+            collection_name (str): name of the collection.
+
+        Returns:
+            Optional[IWatch]: the subscription, or None if the db can not notify
+            about writes.
+        """
+        return None
+
     # todo: concrete type for options
     @abc.abstractmethod
     def get_all_items(
@@ -92,8 +233,44 @@ class IDB(metaclass=abc.ABCMeta):
         """
         raise NotImplementedError
 
+    # pylint: disable=too-many-arguments
+    def iter_items(
+        self,
+        database_name: str,
+        collection_name: str,
+        options: Optional[Dict] = None,
+        batch_size: int = 1000,
+        projection: Optional[List[str]] = None,
+    ) -> Iterator[Any]:
+        """
+        Streaming variant of `get_all_items`: yields the items one at a time,
+        fetching `batch_size` of them per round trip, such that memory does not
+        grow with the size of the result. Users are free to override to make use
+        of in-built db cursors.
+
+        Args:
+            database_name (str): name of the database.
+            collection_name (str): name of the collection.
+            options (Optional[Dict]): as in `get_all_items`.
+            batch_size (int): number of items per round trip.
+            projection (Optional[List[str]]): fields to fetch, `_id` is always
+            included. Defaults to all of them.
+
+        Yields:
+            Any: the items.
+        """
+
+        for item in self.get_all_items(database_name, collection_name, options):
+            if projection is not None:
+                item = {k: v for k, v in item.items() if k == "_id" or k in projection}
+            yield item
+
     def get_any_item(
-        self, database_name: str, collection_name: str, options: Optional[Dict] = None
+        self,
+        database_name: str,
+        collection_name: str,
+        options: Optional[Dict] = None,
+        projection: Optional[List[str]] = None,
     ) -> Any:
         """
         Gets any item from a collection.
@@ -106,26 +283,42 @@ class IDB(metaclass=abc.ABCMeta):
             database_name (str): _description_
             collection_name (str): _description_
             options (Optional[Dict], optional): _description_. Defaults to None.
+            projection (Optional[List[str]]): fields to fetch. Defaults to all.
 
         Returns:
-            Any: _description_
+            Any: the item, or None if the collection is empty.
         """
         all_items = self.get_all_items(database_name, collection_name, options)
-        return all_items[0]
+        if len(all_items) == 0:
+            return None
+        if projection is None:
+            return all_items[0]
+        return {k: v for k, v in all_items[0].items() if k == "_id" or k in projection}
 
     def get_items(
-        self, ids: List[str], database_name: str, collection_name: str
+        self,
+        ids: List[Any],
+        database_name: str,
+        collection_name: str,
+        projection: Optional[List[str]] = None,
     ) -> List[Any]:
         """
         Users are free to override to make use of in-built db batching API.
-        @param ids:
-        @param database_name:
-        @param collection_name:
+
+        Args:
+            ids (List[Any]): `_id`s of the items.
+            database_name (str): name of the database.
+            collection_name (str): name of the collection.
+            projection (Optional[List[str]]): fields to fetch. Defaults to all.
+
+        Returns:
+            List[Any]: the items, in the order of the `ids`. None for the ids
+            that have no item.
         """
         out: List[Any] = []
 
         for identifier in ids:
-            item = self.get_item(identifier, database_name, collection_name)
+            item = self.get_item(identifier, database_name, collection_name, projection)
             out.append(item)
 
         return out
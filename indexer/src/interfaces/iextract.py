@@ -51,6 +51,16 @@ class IExtract(metaclass=abc.ABCMeta):
         """
         raise NotImplementedError
 
+    def get_poll_delay(self) -> float:
+        """
+        How long to wait after an extraction before the next one. Lets a
+        scheduler that extracts many addresses do the waiting.
+
+        Returns:
+            float: seconds to wait before the next extraction.
+        """
+        return 0
+
     def __call__(self):
         """
         It is the responsibility of the implementer to wait in between
@@ -0,0 +1,73 @@
+"""
+We use formal interfaces to enforce **modularity** first and foremost, and then structure
+onto all of the code that is to be written.
+
+A transformer sits in `transformers/<name>/main.py` as the `Transformer` class,
+and is instantiated by the transform host as
+
+`Transformer(address, network_id, db, collection_name=collection_name)`
+
+where `db` is what the transformer must read its state from and write it to,
+and `collection_name` is the collection that it must keep its state in. The
+first transformer of a config keeps `<address>-<network>-state`, the others
+have theirs named after the transformer, see `transform.hosted`.
+"""
+import abc
+from typing import Any, List
+
+
+class ITransformer(metaclass=abc.ABCMeta):
+    """
+    Turns the raw transactions of an address into state. The transform host
+    feeds it the raw transactions in block order, and asks it to flush its
+    in-memory state before every checkpoint.
+    """
+
+    @classmethod
+    def __subclasshook__(cls, subclass):
+        return (
+            hasattr(subclass, "entrypoint")
+            and callable(subclass.entrypoint)
+            and hasattr(subclass, "flush")
+            and callable(subclass.flush)
+            or NotImplemented
+        )
+
+    @abc.abstractmethod
+    def entrypoint(self, txn: Any) -> None:
+        """
+        Main entrypoint for transforming the raw data. Responsible
+        for routing the events into the correct handlers.
+
+        Args:
+            txn (Any): the raw transaction.
+
+        Raises:
+            NotImplementedError: If this function is not
+            implemented.
+        """
+        raise NotImplementedError
+
+    def prefetch(self, txns: List[Any]) -> None:
+        """
+        Called with every batch of raw transactions, before their
+        `entrypoint` calls. Lets the transformer look up the state that the
+        whole batch needs in one round trip, instead of one per event, and
+        decode its events at once, see `EventDispatcher.prepare`.
+
+        Args:
+            txns (List[Any]): the raw transactions of the batch, in order.
+        """
+
+    @abc.abstractmethod
+    def flush(self) -> None:
+        """
+        Hands the in-memory state to the db that the transformer was given. The
+        host buffers these writes, and commits them together with its
+        checkpoint.
+
+        Raises:
+            NotImplementedError: If this function is not
+            implemented.
+        """
+        raise NotImplementedError
@@ -0,0 +1,49 @@
+"""
+We use formal interfaces to enforce **modularity** first and foremost, and then structure
+onto all of the code that is to be written.
+"""
+import abc
+
+
+class IWatch(metaclass=abc.ABCMeta):
+    """
+    Subscription to the writes of an item in the db, e.g. through a change
+    stream. Writes that happen while nobody is waiting are not lost, the next
+    `wait` returns right away.
+    """
+
+    @classmethod
+    def __subclasshook__(cls, subclass):
+        return (
+            hasattr(subclass, "wait")
+            and callable(subclass.wait)
+            and hasattr(subclass, "close")
+            and callable(subclass.close)
+            or NotImplemented
+        )
+
+    @abc.abstractmethod
+    def wait(self, timeout: float) -> bool:
+        """
+        Blocks until the item is written, or the timeout passes.
+
+        Args:
+            timeout (float): in seconds.
+
+        Raises:
+            NotImplementedError: if this function is not implemented.
+
+        Returns:
+            bool: True if the item was written.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def close(self) -> None:
+        """
+        Ends the subscription.
+
+        Raises:
+            NotImplementedError: if this function is not implemented.
+        """
+        raise NotImplementedError
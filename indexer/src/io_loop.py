@@ -0,0 +1,132 @@
+"""
+Event loop in a background thread, that the blocking pipelines hand their db
+round trips to
+"""
+import asyncio
+import os
+import threading
+from concurrent.futures import Future
+from typing import Any, AsyncIterator, Coroutine, Iterator, Optional, TypeVar
+
+from db import get_db
+from interfaces.iasyncdb import IAsyncDB
+
+T = TypeVar("T")
+
+# returned in place of raising StopAsyncIteration across the thread boundary
+_DONE = object()
+
+_io_loop: Optional["IOLoop"] = None
+_io_loop_lock = threading.Lock()
+
+
+async def _next(iterator: AsyncIterator[T]) -> Any:
+    try:
+        return await iterator.__anext__()
+    except StopAsyncIteration:
+        return _DONE
+
+
+async def _close(iterator: AsyncIterator[T], pending: Future) -> None:
+    # * an async generator can not be closed while it is fetching
+    try:
+        await asyncio.wrap_future(pending)
+    except Exception:  # pylint: disable=broad-except
+        pass
+
+    aclose = getattr(iterator, "aclose", None)
+    if aclose is not None:
+        await aclose()
+
+
+class IOLoop:
+    """
+    Runs an asyncio event loop in a daemon thread. The extractor and the
+    transformer are blocking code. They submit their db round trips here, carry
+    on with their work, and only collect the results once they need them.
+    """
+
+    def __init__(self):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._loop.run_forever, name="io-loop", daemon=True
+        )
+        self._thread.start()
+
+    def submit(self, coroutine: Coroutine[Any, Any, T]) -> "Future[T]":
+        """
+        Schedules the coroutine on the loop.
+
+        Args:
+            coroutine (Coroutine[Any, Any, T]): e.g. a call of an `IAsyncDB`.
+
+        Returns:
+            Future[T]: resolves to the result of the coroutine.
+        """
+
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop)
+
+    def iterate(self, iterator: AsyncIterator[T]) -> Iterator[T]:
+        """
+        Iterates an async iterator from blocking code. The next element is
+        always requested before the current one is handed over, such that it is
+        fetched while the caller works on the current one.
+
+        Args:
+            iterator (AsyncIterator[T]): e.g. `IAsyncDB.iter_batches`.
+
+        Yields:
+            T: the elements of the iterator, in order.
+        """
+
+        pending = self.submit(_next(iterator))
+
+        try:
+            while True:
+                item = pending.result()
+                if item is _DONE:
+                    return
+
+                pending = self.submit(_next(iterator))
+                yield item
+        finally:
+            # * not waited for, the caller may be on its way out with an error
+            self.submit(_close(iterator, pending))
+
+
+def get_io_loop() -> IOLoop:
+    """
+    Returns:
+        IOLoop: the loop of this process, started on first use. Every client
+        of an `IAsyncDB` is bound to it.
+    """
+
+    # pylint: disable=global-statement
+    global _io_loop
+
+    with _io_loop_lock:
+        if _io_loop is None:
+            _io_loop = IOLoop()
+
+    return _io_loop
+
+
+def get_async_db() -> IAsyncDB:
+    """
+    Asyncio counterpart of `get_db`: motor for "mongo", and the blocking db in
+    a thread pool for the backends without an asyncio driver. Its calls must
+    all be made from the `IOLoop` of `get_io_loop`.
+
+    Returns:
+        IAsyncDB: the backend.
+    """
+
+    # pylint: disable=import-outside-toplevel
+    if os.getenv("DB_BACKEND", "mongo") == "mongo":
+        from async_db import AsyncDB
+
+        return AsyncDB()
+
+    from threaded_db import ThreadedDB
+
+    return ThreadedDB(get_db())
@@ -4,63 +4,90 @@ Entrypoint for indexer.
 """
 
 import logging
+import os
 import sys
-from multiprocessing import Process
+from multiprocessing import Event, Process
+from typing import List
 
 from config import Config
-from extract.main import Extract
+from extract.backfill import ShardedBackfill
+from extract.service import ExtractService
 from transform.main import Transform
 
+# number of worker processes that backfill the history of an address that has
+# not been extracted before, and whose config has a deploy block. 0 leaves the
+# backfill to the extractor
+BACKFILL_WORKERS = 4
 
-def extract_and_load(address: str) -> None:
+
+def extract_and_load(configs: List[Config], new_data: List[Event]) -> None:
     """
-    Initiate and start extractor process.
+    Initiate and start the extractor process. A single extractor service keeps
+    all of the addresses up to date. Extracts from the Ethereum node at
+    ETH_RPC_URI if it is set, and from Covalent otherwise.
 
     Args:
-        address (str): Target wallet address for extractor
+        configs (List[Config]): Target addresses for extractor
+        new_data (List[Event]): per address, set by the extractor when it writes
+        new transactions
     """
 
-    extract = Extract(address)
+    extract = ExtractService(configs, new_data=new_data)
     extract()
 
 
-def transform_and_load(to_transform: str) -> None:
+def transform_and_load(to_transform: str, new_data: Event) -> None:
     """
     Initiate and start transformer process.
 
     Args:
         to_transform (str): Transformer sub-directory name to be instantiated
+        new_data (Event): wakes the transformer up when there are new transactions
     """
 
-    transform = Transform(to_transform)
+    transform = Transform(to_transform, new_data)
     transform()
 
 
 def main():
-    """Starts the whole ETL pipeline. Creates two separate processes.
-    One for extraction, and one for transforming.
+    """Starts the whole ETL pipeline. Creates one process that extracts all of
+    the addresses, and one transforming process per address.
     """
 
-    config = Config.rkl_club_auction_kovan()
+    configs = [Config.rkl_club_auction_kovan()]
 
     logging.basicConfig(
-        filename=config.get_log_filename(),
+        filename=configs[0].get_log_filename(),
         level=logging.INFO,
         format="%(relativeCreated)6d %(process)d %(message)s",
     )
 
+    # * the transformer reads the raw transactions in block order, so it can only
+    # * start once the shards, that are written out of order, are all complete
+    if BACKFILL_WORKERS > 0 and not os.getenv("ETH_RPC_URI"):
+        for config in configs:
+            backfill = ShardedBackfill(config, BACKFILL_WORKERS)
+            if backfill.is_required():
+                backfill()
+
     # todo: graceful keyboard interrupt
-    extractor = Process(target=extract_and_load, args=[config])
-    transformer = Process(target=transform_and_load, args=[config])
+    new_data = [Event() for _ in configs]
+    extractor = Process(target=extract_and_load, args=[configs, new_data])
+    transformers = [
+        Process(target=transform_and_load, args=[config, event])
+        for config, event in zip(configs, new_data)
+    ]
 
     extractor.start()
     logging.info("Extractor started.")
 
-    transformer.start()
-    logging.info("Transformer started.")
+    for transformer in transformers:
+        transformer.start()
+    logging.info("Transformers started.")
 
     extractor.join()
-    transformer.join()
+    for transformer in transformers:
+        transformer.join()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,522 @@
+"""
+IDB Implementation on an embedded SQLite database, for single node deployments
+"""
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import date
+from decimal import Decimal
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+
+from interfaces.idb import IDB
+from interfaces.iwatch import IWatch
+
+SQLITE_PATH = "ethereum-indexer.sqlite"
+# milliseconds to wait for another process' write lock before giving up
+BUSY_TIMEOUT = 30_000
+# number of `_id`s in a single `IN` query, under SQLite's variable limit
+MAX_IDS_PER_QUERY = 500
+
+# mongo comparison operators that the queries support
+OPERATORS = {"$gt": ">", "$gte": ">=", "$lt": "<", "$lte": "<=", "$ne": "!="}
+
+FIELD_PATTERN = re.compile(r"^[A-Za-z0-9_]+(\.[A-Za-z0-9_]+)*$")
+
+# seconds between the checks for writes of other connections
+WATCH_INTERVAL = 0.05
+
+
+def encode_value(value: Any) -> Any:
+    """
+    The `default` of the json encoding of the documents. The state may hold
+    values that json does not have, which are stored, and read back, as their
+    closest json value. The server encodes the `_id`s the same way.
+
+    Args:
+        value (Any): a value that json can not encode.
+
+    Raises:
+        TypeError: if there is no json value for it.
+
+    Returns:
+        Any: datetimes and dates as their ISO 8601 string, sets as lists,
+        decimals as their string, bytes as their 0x prefixed hex string and
+        numpy values, e.g. of the decoded event columns, as python values.
+    """
+
+    # * datetime is a date, too
+    if isinstance(value, date):
+        return value.isoformat()
+
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+
+    if isinstance(value, Decimal):
+        return str(value)
+
+    if isinstance(value, bytes):
+        return "0x" + value.hex()
+
+    if isinstance(value, (np.generic, np.ndarray)):
+        return value.tolist()
+
+    raise TypeError(f"{type(value).__name__} can not be stored in sqlite.")
+
+
+def dumps(value: Any) -> str:
+    """
+    Returns:
+        str: the json of the document or `_id`. See `encode_value`.
+    """
+
+    return json.dumps(value, default=encode_value)
+
+
+class SqliteWatch(IWatch):
+    """
+    @inheritdoc IWatch
+
+    SQLite can not notify about writes, but `PRAGMA data_version` of a
+    connection changes whenever another connection commits. Checking it costs
+    no I/O, so it is checked every WATCH_INTERVAL. Only then is the item read,
+    and the waiter is woken up if it is not the same as before: commits that
+    do not write the item, e.g. the transformer's own, are not reported.
+    """
+
+    def __init__(self, path: str, table: str, encoded_id: str):
+        """
+        Args:
+            path (str): the database file.
+            table (str): the quoted table of the item.
+            encoded_id (str): the `_id` of the item, as it is stored.
+        """
+
+        # * a connection of its own, that never writes
+        self._connection = sqlite3.connect(path, isolation_level=None)
+        self._table = table
+        self._encoded_id = encoded_id
+        self._data_version = self._get_data_version()
+        self._doc = self._get_doc()
+
+    def _get_data_version(self) -> int:
+        return self._connection.execute("PRAGMA data_version").fetchone()[0]
+
+    def _get_doc(self) -> Optional[str]:
+        row = self._connection.execute(
+            f"SELECT doc FROM {self._table} WHERE _id = ?", (self._encoded_id,)
+        ).fetchone()
+
+        return None if row is None else row[0]
+
+    def wait(self, timeout: float) -> bool:
+        deadline = time.monotonic() + timeout
+
+        while True:
+            data_version = self._get_data_version()
+            if data_version != self._data_version:
+                self._data_version = data_version
+
+                doc = self._get_doc()
+                if doc != self._doc:
+                    self._doc = doc
+                    return True
+
+            if time.monotonic() >= deadline:
+                return False
+
+            time.sleep(WATCH_INTERVAL)
+
+    def close(self) -> None:
+        self._connection.close()
+
+
+class SqliteDB(IDB):
+    """
+    @inheritdoc IDB
+
+    Every collection is a table of json documents keyed by their `_id`. The
+    file is in WAL mode, so the extractor, the transformer and the server can
+    share it on one host: readers never block the writer.
+
+    Queries support the subset of the mongo query language that the indexer
+    uses: equality, `$gt`, `$gte`, `$lt`, `$lte`, `$ne` and `$in` on (nested)
+    fields. Indexes are expression indexes on the same fields.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Args:
+            path (Optional[str]): the database file. Defaults to the SQLITE_PATH
+            environment variable, or SQLITE_PATH.
+        """
+
+        self._path = path or os.getenv("SQLITE_PATH", SQLITE_PATH)
+        # * connections can not be shared between threads
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._tables = set()
+
+    def _get_connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+
+        if connection is None:
+            # * autocommit, transactions are explicit
+            connection = sqlite3.connect(
+                self._path, timeout=BUSY_TIMEOUT / 1000, isolation_level=None
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            # * durable at checkpoints, and never corrupt. FULL per write if asked
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+
+        return connection
+
+    def _get_table(self, database_name: str, collection_name: str) -> str:
+        name = f"{database_name}.{collection_name}"
+        table = '"' + name.replace('"', '""') + '"'
+
+        with self._lock:
+            if name not in self._tables:
+                self._get_connection().execute(
+                    f"CREATE TABLE IF NOT EXISTS {table}"
+                    " (_id TEXT PRIMARY KEY, doc TEXT NOT NULL)"
+                )
+                self._tables.add(name)
+
+        return table
+
+    @staticmethod
+    def _encode_id(identifier: Any) -> str:
+        # * keeps the type, such that 1 and "1" are different ids, like in mongo
+        return dumps(identifier)
+
+    @staticmethod
+    def _field(field: str) -> str:
+        if not FIELD_PATTERN.match(field):
+            raise ValueError(f"Unsupported field name: {field}")
+
+        return f"json_extract(doc, '$.{field}')"
+
+    def _translate_query(self, query: Dict) -> Tuple[str, List[Any]]:
+        """
+        Returns:
+            Tuple[str, List[Any]]: the WHERE clause and its parameters.
+        """
+
+        clauses = []
+        params: List[Any] = []
+
+        for field, condition in query.items():
+            column = self._field(field)
+
+            if not isinstance(condition, dict):
+                clauses.append(f"{column} = ?")
+                params.append(condition)
+                continue
+
+            for operator, value in condition.items():
+                if operator == "$in":
+                    clauses.append(f"{column} IN ({', '.join('?' * len(value))})")
+                    params.extend(value)
+                elif operator in OPERATORS:
+                    clauses.append(f"{column} {OPERATORS[operator]} ?")
+                    params.append(value)
+                else:
+                    raise ValueError(f"Unsupported query operator: {operator}")
+
+        return " AND ".join(clauses) or "1", params
+
+    @staticmethod
+    def _project(item: Any, projection: Optional[List[str]]) -> Any:
+        if projection is None:
+            return item
+
+        return {k: v for k, v in item.items() if k == "_id" or k in projection}
+
+    def put_item(self, item: Any, database_name: str, collection_name: str) -> None:
+        table = self._get_table(database_name, collection_name)
+        self._get_connection().execute(
+            f"INSERT OR REPLACE INTO {table} (_id, doc) VALUES (?, ?)",
+            (self._encode_id(item["_id"]), dumps(item)),
+        )
+
+    def put_items(
+        self, items: List[Any], database_name: str, collection_name: str
+    ) -> None:
+        if len(items) == 0:
+            return
+
+        table = self._get_table(database_name, collection_name)
+        connection = self._get_connection()
+
+        # * like mongo's insert_many, raises on a duplicate `_id`
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.executemany(
+                f"INSERT INTO {table} (_id, doc) VALUES (?, ?)",
+                [(self._encode_id(item["_id"]), dumps(item)) for item in items],
+            )
+
+    def _get_existing_ids(self, table: str, encoded_ids: List[str]) -> Set[str]:
+        connection = self._get_connection()
+        existing = set()
+
+        for start in range(0, len(encoded_ids), MAX_IDS_PER_QUERY):
+            batch = encoded_ids[start : start + MAX_IDS_PER_QUERY]
+            existing.update(
+                row[0]
+                for row in connection.execute(
+                    f"SELECT _id FROM {table}"
+                    f" WHERE _id IN ({', '.join('?' * len(batch))})",
+                    batch,
+                )
+            )
+
+        return existing
+
+    # pylint: disable=too-many-arguments,too-many-locals
+    def put_items_bulk(
+        self,
+        items: List[Any],
+        database_name: str,
+        collection_name: str,
+        batch_size: int = 1000,
+        write_concern: Optional[Dict] = None,
+        overwrite: bool = False,
+    ) -> Dict[str, int]:
+        table = self._get_table(database_name, collection_name)
+        connection = self._get_connection()
+
+        journaled = write_concern is not None and write_concern.get("j", False)
+        if journaled:
+            connection.execute("PRAGMA synchronous=FULL")
+
+        counts = {"inserted": 0, "duplicates": 0}
+        conflict = "REPLACE" if overwrite else "IGNORE"
+
+        try:
+            for start in range(0, len(items), batch_size):
+                batch = items[start : start + batch_size]
+                rows = [(self._encode_id(item["_id"]), dumps(item)) for item in batch]
+
+                with connection:
+                    connection.execute("BEGIN IMMEDIATE")
+
+                    existing = self._get_existing_ids(table, [row[0] for row in rows])
+
+                    connection.executemany(
+                        f"INSERT OR {conflict} INTO {table} (_id, doc) VALUES (?, ?)",
+                        rows,
+                    )
+
+                # * an `_id` can repeat within the batch, too
+                inserted = len({row[0] for row in rows} - existing)
+                counts["inserted"] += inserted
+                counts["duplicates"] += len(rows) - inserted
+        finally:
+            if journaled:
+                connection.execute("PRAGMA synchronous=NORMAL")
+
+        return counts
+
+    def put_items_atomic(
+        self,
+        writes: List[Tuple[str, str, List[Any]]],
+        write_concern: Optional[Dict] = None,
+    ) -> bool:
+        tables = [
+            (self._get_table(database_name, collection_name), items)
+            for database_name, collection_name, items in writes
+        ]
+        connection = self._get_connection()
+
+        journaled = write_concern is not None and write_concern.get("j", False)
+        if journaled:
+            connection.execute("PRAGMA synchronous=FULL")
+
+        try:
+            # * a single sqlite transaction spans all of the tables
+            with connection:
+                connection.execute("BEGIN IMMEDIATE")
+                for table, items in tables:
+                    connection.executemany(
+                        f"INSERT OR REPLACE INTO {table} (_id, doc) VALUES (?, ?)",
+                        [(self._encode_id(item["_id"]), dumps(item)) for item in items],
+                    )
+        finally:
+            if journaled:
+                connection.execute("PRAGMA synchronous=NORMAL")
+
+        return True
+
+    def drop_collection(self, database_name: str, collection_name: str) -> None:
+        table = self._get_table(database_name, collection_name)
+
+        # * emptied rather than dropped, tables are only created once per instance
+        self._get_connection().execute(f"DELETE FROM {table}")
+
+    def get_item(
+        self,
+        identifier: str,
+        database_name: str,
+        collection_name: str,
+        projection: Optional[List[str]] = None,
+    ) -> Any:
+        table = self._get_table(database_name, collection_name)
+        row = (
+            self._get_connection()
+            .execute(
+                f"SELECT doc FROM {table} WHERE _id = ?", (self._encode_id(identifier),)
+            )
+            .fetchone()
+        )
+
+        if row is None:
+            return None
+
+        return self._project(json.loads(row[0]), projection)
+
+    def get_items(
+        self,
+        ids: List[Any],
+        database_name: str,
+        collection_name: str,
+        projection: Optional[List[str]] = None,
+    ) -> List[Any]:
+        table = self._get_table(database_name, collection_name)
+        connection = self._get_connection()
+        found: Dict[str, Any] = {}
+
+        encoded = [self._encode_id(identifier) for identifier in ids]
+        for start in range(0, len(encoded), MAX_IDS_PER_QUERY):
+            batch = encoded[start : start + MAX_IDS_PER_QUERY]
+            for encoded_id, doc in connection.execute(
+                f"SELECT _id, doc FROM {table}"
+                f" WHERE _id IN ({', '.join('?' * len(batch))})",
+                batch,
+            ):
+                found[encoded_id] = self._project(json.loads(doc), projection)
+
+        return [found.get(encoded_id) for encoded_id in encoded]
+
+    def ensure_indexes(
+        self, database_name: str, collection_name: str, indexes: List[Dict]
+    ) -> None:
+        table = self._get_table(database_name, collection_name)
+        connection = self._get_connection()
+
+        for index in indexes:
+            keys = [
+                f"{self._field(field)} {'DESC' if direction == -1 else 'ASC'}"
+                for field, direction in index["keys"]
+            ]
+            name = index.get(
+                "name",
+                "_".join(f"{field}_{direction}" for field, direction in index["keys"]),
+            )
+            unique = "UNIQUE " if index.get("unique", False) else ""
+
+            connection.execute(
+                f"CREATE {unique}INDEX IF NOT EXISTS"
+                f' "{database_name}.{collection_name}.{name}"'
+                f" ON {table} ({', '.join(keys)})"
+            )
+
+    def get_index_stats(
+        self, database_name: str, collection_name: str
+    ) -> List[Dict[str, Any]]:
+        # * sqlite does not track index usage
+        self._get_table(database_name, collection_name)
+        return [
+            {"name": row[0], "accesses": None}
+            for row in self._get_connection().execute(
+                "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = ?",
+                (f"{database_name}.{collection_name}",),
+            )
+        ]
+
+    def watch_item(
+        self, identifier: Any, database_name: str, collection_name: str
+    ) -> Optional[IWatch]:
+        return SqliteWatch(
+            self._path,
+            self._get_table(database_name, collection_name),
+            self._encode_id(identifier),
+        )
+
+    def _select(
+        self, database_name: str, collection_name: str, options: Optional[Dict]
+    ) -> Tuple[str, List[Any]]:
+        """
+        Returns:
+            Tuple[str, List[Any]]: the SELECT statement for the options of
+            `get_all_items`, and its parameters.
+        """
+
+        table = self._get_table(database_name, collection_name)
+        options = options or {}
+
+        where, params = self._translate_query(options.get("query_clause", {}))
+        statement = f"SELECT doc FROM {table} WHERE {where}"
+
+        if "sort" in options:
+            direction = "DESC" if options["sort"]["direction"] == -1 else "ASC"
+            statement += (
+                f" ORDER BY {self._field(options['sort']['sort_by'])} {direction}"
+            )
+
+        return statement, params
+
+    # todo: concrete type for options
+    def get_all_items(
+        self, database_name: str, collection_name: str, options: Optional[Dict] = None
+    ) -> List[Any]:
+        statement, params = self._select(database_name, collection_name, options)
+
+        return [
+            json.loads(row[0])
+            for row in self._get_connection().execute(statement, params)
+        ]
+
+    # pylint: disable=too-many-arguments
+    def iter_items(
+        self,
+        database_name: str,
+        collection_name: str,
+        options: Optional[Dict] = None,
+        batch_size: int = 1000,
+        projection: Optional[List[str]] = None,
+    ) -> Iterator[Any]:
+        statement, params = self._select(database_name, collection_name, options)
+        cursor = self._get_connection().execute(statement, params)
+
+        try:
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if len(rows) == 0:
+                    return
+
+                for row in rows:
+                    yield self._project(json.loads(row[0]), projection)
+        finally:
+            cursor.close()
+
+    def get_any_item(
+        self,
+        database_name: str,
+        collection_name: str,
+        options: Optional[Dict] = None,
+        projection: Optional[List[str]] = None,
+    ) -> Any:
+        statement, params = self._select(database_name, collection_name, options)
+        row = self._get_connection().execute(f"{statement} LIMIT 1", params).fetchone()
+
+        if row is None:
+            return None
+
+        return self._project(json.loads(row[0]), projection)
@@ -0,0 +1,94 @@
+"""
+IAsyncDB Implementation on top of any blocking IDB
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from interfaces.iasyncdb import IAsyncDB
+from interfaces.idb import IDB
+
+
+class ThreadedDB(IAsyncDB):
+    """
+    @inheritdoc IAsyncDB
+
+    Runs the calls of a blocking `IDB` in the default executor, for the
+    backends that have no asyncio driver, e.g. SQLite, or the in-memory db of
+    the benchmarks.
+    """
+
+    def __init__(self, db: IDB):
+        """
+        Args:
+            db (IDB): the blocking db that does the work.
+        """
+
+        self._db = db
+
+    async def put_item(
+        self, item: Any, database_name: str, collection_name: str
+    ) -> None:
+        await asyncio.to_thread(self._db.put_item, item, database_name, collection_name)
+
+    # pylint: disable=too-many-arguments
+    async def put_items_bulk(
+        self,
+        items: List[Any],
+        database_name: str,
+        collection_name: str,
+        batch_size: int = 1000,
+        write_concern: Optional[Dict] = None,
+        overwrite: bool = False,
+    ) -> Dict[str, int]:
+        return await asyncio.to_thread(
+            self._db.put_items_bulk,
+            items,
+            database_name,
+            collection_name,
+            batch_size,
+            write_concern,
+            overwrite,
+        )
+
+    async def get_item(
+        self,
+        identifier: str,
+        database_name: str,
+        collection_name: str,
+        projection: Optional[List[str]] = None,
+    ) -> Any:
+        return await asyncio.to_thread(
+            self._db.get_item, identifier, database_name, collection_name, projection
+        )
+
+    # pylint: disable=too-many-arguments
+    async def iter_batches(
+        self,
+        database_name: str,
+        collection_name: str,
+        options: Optional[Dict] = None,
+        batch_size: int = 1000,
+        projection: Optional[List[str]] = None,
+    ) -> AsyncIterator[List[Any]]:
+        items = self._db.iter_items(
+            database_name, collection_name, options, batch_size, projection
+        )
+        loop = asyncio.get_running_loop()
+
+        # * cursors can be tied to the thread that opened them, e.g. sqlite's,
+        # * so every batch is read on the same thread
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            try:
+                while True:
+                    batch = await loop.run_in_executor(
+                        executor, lambda: list(islice(items, batch_size))
+                    )
+                    if len(batch) == 0:
+                        return
+                    yield batch
+            finally:
+                close = getattr(items, "close", None)
+                if close is not None:
+                    await loop.run_in_executor(executor, close)
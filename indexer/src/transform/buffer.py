@@ -0,0 +1,454 @@
+"""
+Write-behind buffer between the transformers and the db
+"""
+import json
+import logging
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from interfaces.idb import IDB
+from interfaces.iwatch import IWatch
+
+# number of distinct pending items that triggers a flush
+BUFFER_MAX_ITEMS = 10_000
+# seconds after which pending items are flushed, however few they are
+BUFFER_FLUSH_INTERVAL = 30
+
+# the checkpoint must be on disk before the transformer moves on
+CHECKPOINT_WRITE_CONCERN = {"j": True}
+# field of the checkpoint that holds the writes it covers, while they are being
+# written, on dbs without transactions
+REDO_LOG_FIELD = "pending_writes"
+# field of the checkpoint that holds the number of redo log chunks, when the
+# redo log is too large to be a part of the checkpoint
+REDO_LOG_CHUNKS_FIELD = "pending_write_chunks"
+# size of the items in the checkpoint, or in a chunk of the redo log, as json.
+# Well under mongo's 16MB document limit, since BSON can be larger than json
+REDO_LOG_MAX_BYTES = 8 << 20  # 8 MiB
+
+
+class WriteBehindBuffer(IDB):
+    """
+    @inheritdoc IDB
+
+    Holds the writes of the transformers in memory, and coalesces the writes
+    to the same `_id` into one, keeping the latest. They reach the db together
+    with a checkpoint when `flush` is called, which the transformer host does
+    once `is_due`, or when it has caught up.
+
+    Reads by `_id` go through the buffer first, so the transformers see their
+    own pending writes. Items handed to `put_item` belong to the buffer from
+    then on, and reads hand the very same objects back, without copying them.
+    Queries can not be answered from the buffer, so they raise while the
+    collection has pending writes: the writes only ever reach the db together
+    with their checkpoint.
+    """
+
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(
+        self,
+        db: IDB,
+        max_items: int = BUFFER_MAX_ITEMS,
+        flush_interval: float = BUFFER_FLUSH_INTERVAL,
+        redo_log_max_bytes: int = REDO_LOG_MAX_BYTES,
+    ):
+        """
+        Args:
+            db (IDB): where the writes end up.
+            max_items (int): number of distinct pending items that makes the
+            buffer due.
+            flush_interval (float): seconds since the last flush that make the
+            buffer due.
+            redo_log_max_bytes (int): size of the items, as json, beyond which
+            the redo log is split into chunks, see `flush`.
+        """
+
+        self._db = db
+        self._max_items = max_items
+        self._flush_interval = flush_interval
+        self._redo_log_max_bytes = redo_log_max_bytes
+
+        # (database name, collection name) -> _id -> item
+        self._pending: Dict[Tuple[str, str], Dict[Any, Any]] = {}
+        self._pending_count = 0
+        self._last_flush = time.monotonic()
+
+        # number of writes that were coalesced into another
+        self._coalesced = 0
+
+    def put_item(self, item: Any, database_name: str, collection_name: str) -> None:
+        pending = self._pending.setdefault((database_name, collection_name), {})
+
+        if item["_id"] in pending:
+            self._coalesced += 1
+        else:
+            self._pending_count += 1
+
+        pending[item["_id"]] = item
+
+    def put_items(
+        self, items: List[Any], database_name: str, collection_name: str
+    ) -> None:
+        for item in items:
+            self.put_item(item, database_name, collection_name)
+
+    def get_item(
+        self,
+        identifier: str,
+        database_name: str,
+        collection_name: str,
+        projection: Optional[List[str]] = None,
+    ) -> Any:
+        pending = self._pending.get((database_name, collection_name), {})
+
+        if identifier in pending:
+            item = pending[identifier]
+            if projection is None:
+                return item
+            return {k: v for k, v in item.items() if k == "_id" or k in projection}
+
+        return self._db.get_item(identifier, database_name, collection_name, projection)
+
+    def get_items(
+        self,
+        ids: List[Any],
+        database_name: str,
+        collection_name: str,
+        projection: Optional[List[str]] = None,
+    ) -> List[Any]:
+        pending = self._pending.get((database_name, collection_name), {})
+        missing = [identifier for identifier in ids if identifier not in pending]
+
+        found = dict(
+            zip(
+                missing,
+                self._db.get_items(missing, database_name, collection_name, projection)
+                if missing
+                else [],
+            )
+        )
+
+        return [
+            self.get_item(identifier, database_name, collection_name, projection)
+            if identifier in pending
+            else found[identifier]
+            for identifier in ids
+        ]
+
+    # todo: concrete type for options
+    def get_all_items(
+        self, database_name: str, collection_name: str, options: Optional[Dict] = None
+    ) -> List[Any]:
+        self._ensure_flushed(database_name, collection_name)
+        return self._db.get_all_items(database_name, collection_name, options)
+
+    # pylint: disable=too-many-arguments
+    def iter_items(
+        self,
+        database_name: str,
+        collection_name: str,
+        options: Optional[Dict] = None,
+        batch_size: int = 1000,
+        projection: Optional[List[str]] = None,
+    ) -> Iterator[Any]:
+        self._ensure_flushed(database_name, collection_name)
+        return self._db.iter_items(
+            database_name, collection_name, options, batch_size, projection
+        )
+
+    def get_any_item(
+        self,
+        database_name: str,
+        collection_name: str,
+        options: Optional[Dict] = None,
+        projection: Optional[List[str]] = None,
+    ) -> Any:
+        self._ensure_flushed(database_name, collection_name)
+        return self._db.get_any_item(
+            database_name, collection_name, options, projection
+        )
+
+    def ensure_indexes(
+        self, database_name: str, collection_name: str, indexes: List[Dict]
+    ) -> None:
+        self._db.ensure_indexes(database_name, collection_name, indexes)
+
+    def get_index_stats(
+        self, database_name: str, collection_name: str
+    ) -> List[Dict[str, Any]]:
+        return self._db.get_index_stats(database_name, collection_name)
+
+    def watch_item(
+        self, identifier: Any, database_name: str, collection_name: str
+    ) -> Optional[IWatch]:
+        return self._db.watch_item(identifier, database_name, collection_name)
+
+    def drop_collection(self, database_name: str, collection_name: str) -> None:
+        # * the pending writes would bring the items back
+        pending = self._pending.pop((database_name, collection_name), None)
+        if pending:
+            self._pending_count -= len(pending)
+
+        self._db.drop_collection(database_name, collection_name)
+
+    def _ensure_flushed(self, database_name: str, collection_name: str) -> None:
+        """
+        Raises:
+            RuntimeError: if the collection has pending writes. Writing them
+            ahead of their checkpoint would leave the db with state that no
+            block height covers, if we crashed before the next `flush`.
+        """
+
+        if self._pending.get((database_name, collection_name)):
+            raise RuntimeError(
+                f"{collection_name} has pending writes, flush them with a"
+                " checkpoint before querying it."
+            )
+
+    def is_due(self) -> bool:
+        """
+        Returns:
+            bool: True if there are enough pending items, or they have been
+            pending for long enough, to flush them.
+        """
+
+        if self._pending_count == 0:
+            return False
+
+        return (
+            self._pending_count >= self._max_items
+            or time.monotonic() - self._last_flush >= self._flush_interval
+        )
+
+    def _take_pending(self) -> List[Tuple[str, str, List[Any]]]:
+        writes = [
+            (database_name, collection_name, list(pending.values()))
+            for (database_name, collection_name), pending in self._pending.items()
+        ]
+
+        self._pending = {}
+        self._pending_count = 0
+
+        return writes
+
+    def _apply(self, writes: List[Tuple[str, str, List[Any]]]) -> None:
+        for database_name, collection_name, items in writes:
+            self._db.put_items_bulk(
+                items, database_name, collection_name, overwrite=True
+            )
+
+    def flush(
+        self,
+        checkpoint: Optional[Any] = None,
+        database_name: Optional[str] = None,
+        collection_name: Optional[str] = None,
+    ) -> None:
+        """
+        Writes the pending items together with the checkpoint, if there is
+        one: all of them, or none of them, so that the checkpoint always
+        matches the writes that it covers.
+
+        That is a single transaction if the db has them. Otherwise, the
+        checkpoint carries the pending items as a redo log. It is a single
+        item, so it is written atomically, and `recover` replays the items
+        from it if we crash before they are all written. A redo log of more
+        than `redo_log_max_bytes` would not fit into a single item, so it is
+        written in chunks first, as items of their own next to the
+        checkpoint, and the checkpoint only carries their number.
+
+        Args:
+            checkpoint (Optional[Any]): e.g. the block height up to which the
+            pending writes are complete.
+            database_name (Optional[str]): database of the checkpoint.
+            collection_name (Optional[str]): collection of the checkpoint.
+        """
+
+        count, coalesced = self._pending_count, self._coalesced
+        writes = self._take_pending()
+
+        if checkpoint is None:
+            self._apply(writes)
+        elif not self._db.put_items_atomic(
+            writes + [(database_name, collection_name, [checkpoint])],
+            write_concern=CHECKPOINT_WRITE_CONCERN,
+        ):
+            logged = self._write_redo_log(
+                writes, checkpoint, database_name, collection_name
+            )
+            self._db.put_items_bulk(
+                [logged],
+                database_name,
+                collection_name,
+                write_concern=CHECKPOINT_WRITE_CONCERN,
+                overwrite=True,
+            )
+
+            self._apply(writes)
+
+            # * replaying the items is harmless, so clearing the redo log
+            # * need not be journaled
+            self._db.put_items_bulk(
+                [checkpoint], database_name, collection_name, overwrite=True
+            )
+            self._clear_redo_log_chunks(
+                logged, checkpoint["_id"], database_name, collection_name
+            )
+
+        if count > 0:
+            logging.info(
+                f"Flushed {count} items, {coalesced} writes were coalesced into them"
+            )
+
+        self._coalesced = 0
+        self._last_flush = time.monotonic()
+
+    def _chunk_writes(
+        self, writes: List[Tuple[str, str, List[Any]]]
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Returns:
+            List[List[Dict[str, Any]]]: the writes as redo logs, each of which
+            holds at most `redo_log_max_bytes` of items, as json.
+        """
+
+        chunks: List[List[Dict[str, Any]]] = [[]]
+        size = 0
+
+        for database_name, collection_name, items in writes:
+            write = None
+
+            for item in items:
+                item_size = len(json.dumps(item, default=str))
+
+                if size > 0 and size + item_size > self._redo_log_max_bytes:
+                    chunks.append([])
+                    size = 0
+                    write = None
+
+                if write is None:
+                    write = {
+                        "database_name": database_name,
+                        "collection_name": collection_name,
+                        "items": [],
+                    }
+                    chunks[-1].append(write)
+
+                write["items"].append(item)
+                size += item_size
+
+        return chunks
+
+    def _write_redo_log(
+        self,
+        writes: List[Tuple[str, str, List[Any]]],
+        checkpoint: Any,
+        database_name: str,
+        collection_name: str,
+    ) -> Any:
+        """
+        Writes the chunks of the redo log, if there is more than one.
+
+        Returns:
+            Any: the checkpoint, with the redo log, or with the number of its
+            chunks, to be written once the chunks are.
+        """
+
+        chunks = self._chunk_writes(writes)
+
+        if len(chunks) == 1:
+            return {**checkpoint, REDO_LOG_FIELD: chunks[0]}
+
+        # * the chunks are not used until the checkpoint counts them, so those
+        # * of an interrupted flush are overwritten by the next one
+        self._db.put_items_bulk(
+            [
+                {
+                    "_id": self._get_redo_log_chunk_id(checkpoint["_id"], ix),
+                    REDO_LOG_FIELD: chunk,
+                }
+                for ix, chunk in enumerate(chunks)
+            ],
+            database_name,
+            collection_name,
+            write_concern=CHECKPOINT_WRITE_CONCERN,
+            overwrite=True,
+        )
+
+        return {**checkpoint, REDO_LOG_CHUNKS_FIELD: len(chunks)}
+
+    @staticmethod
+    def _get_redo_log_chunk_id(identifier: Any, ix: int) -> str:
+        return f"{identifier}-{REDO_LOG_FIELD}-{ix}"
+
+    def _clear_redo_log_chunks(
+        self, logged: Any, identifier: Any, database_name: str, collection_name: str
+    ) -> None:
+        """
+        Empties the chunks that the checkpoint, as it was logged, counts, once
+        they are applied, so that they do not keep a copy of the items.
+        """
+
+        self._db.put_items_bulk(
+            [
+                {"_id": self._get_redo_log_chunk_id(identifier, ix), REDO_LOG_FIELD: []}
+                for ix in range(logged.get(REDO_LOG_CHUNKS_FIELD, 0))
+            ],
+            database_name,
+            collection_name,
+            overwrite=True,
+        )
+
+    def recover(
+        self, identifier: Any, database_name: str, collection_name: str
+    ) -> Optional[Any]:
+        """
+        Completes the last `flush`, if we crashed before it wrote all of the
+        items of its redo log.
+
+        Args:
+            identifier (Any): `_id` of the checkpoint.
+            database_name (str): database of the checkpoint.
+            collection_name (str): collection of the checkpoint.
+
+        Returns:
+            Optional[Any]: the checkpoint, without its redo log. None if there
+            is no checkpoint yet.
+        """
+
+        checkpoint = self._db.get_item(identifier, database_name, collection_name)
+
+        if checkpoint is None:
+            return checkpoint
+
+        logged = dict(checkpoint)
+
+        if REDO_LOG_FIELD in checkpoint:
+            redo_log = checkpoint.pop(REDO_LOG_FIELD)
+        elif REDO_LOG_CHUNKS_FIELD in checkpoint:
+            chunks = self._db.get_items(
+                [
+                    self._get_redo_log_chunk_id(identifier, ix)
+                    for ix in range(checkpoint.pop(REDO_LOG_CHUNKS_FIELD))
+                ],
+                database_name,
+                collection_name,
+            )
+            redo_log = [write for chunk in chunks for write in chunk[REDO_LOG_FIELD]]
+        else:
+            return checkpoint
+
+        logging.info(f"Replaying the redo log of checkpoint: {checkpoint}")
+
+        self._apply(
+            [
+                (write["database_name"], write["collection_name"], write["items"])
+                for write in redo_log
+            ]
+        )
+        self._db.put_items_bulk(
+            [checkpoint], database_name, collection_name, overwrite=True
+        )
+        self._clear_redo_log_chunks(logged, identifier, database_name, collection_name)
+
+        return checkpoint
@@ -1,6 +1,7 @@
 from typing import Dict, List
 
 from extract.covalent import Covalent as Covalent_
+from transform.decode import decode_topic
 
 
 class Covalent(Covalent_):
@@ -31,13 +32,7 @@ class Covalent(Covalent_):
                 decoded.append(decoded_param["value"])
             else:
                 raw_param = raw_log_topics[ix + 1]
-
-                if decoded_param["type"] == "uint256":
-                    decoded.append(int(raw_param, 16))
-                # todo: Other types
-                else:
-                    raise NotImplementedError(
-                        f'Undecoded covalent param: {decoded_param["type"]}'
-                    )
+                # * strings, bytes, arrays and tuples are their hash
+                decoded.append(decode_topic(decoded_param["type"], raw_param))
 
         return decoded
@@ -0,0 +1,353 @@
+"""
+Decodes the topics and the data of raw log events, one at a time, or a whole
+batch of one event signature at once
+"""
+import keyword
+import re
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+from eth_abi.decoding import ContextFramesBytesIO
+from eth_abi.registry import registry
+from eth_utils import keccak
+
+# e.g. "PlaceBid(address indexed bidder, uint256 indexed price)"
+SIGNATURE_PATTERN = re.compile(r"^\s*(\w+)\s*\((.*)\)\s*$")
+# the types that take up exactly one word, and are decoded column-wise
+WORD_TYPE_PATTERN = re.compile(r"^(address|bool|u?int(\d*)|bytes(\d+))$")
+
+WORD_SIZE = 32
+ADDRESS_SIZE = 20
+# the low bytes of a word that fit into a 64 bit integer
+INT64_SIZE = 8
+
+# byte -> its two hex digits
+HEX_DIGITS = np.array([f"{byte:02x}" for byte in range(256)], dtype="<U2")
+
+
+def parse_signature(signature: str) -> Tuple[str, List[Tuple[str, bool, str]]]:
+    """
+    Args:
+        signature (str): event signature as in solidity, with the parameter
+        names, e.g. "Transfer(address indexed from, address indexed to,
+        uint256 value)".
+
+    Raises:
+        ValueError: if the signature can not be parsed.
+
+    Returns:
+        Tuple[str, List[Tuple[str, bool, str]]]: the event name, and the type,
+        whether it is indexed, and the name of every parameter.
+    """
+
+    match = SIGNATURE_PATTERN.match(signature)
+    if match is None:
+        raise ValueError(f"Invalid event signature: {signature}")
+
+    name, params = match.groups()
+    parsed = []
+
+    for ix, param in enumerate(p for p in params.split(",") if p.strip()):
+        words = param.split()
+        indexed = "indexed" in words[1:]
+        names = [word for word in words[1:] if word != "indexed"]
+
+        if len(names) > 1:
+            raise ValueError(f"Invalid event parameter: {param}")
+
+        # * unnamed parameters are positional in solidity, `arg0`, `arg1`, ...
+        arg_name = names[0] if names else f"arg{ix}"
+        # * e.g. `from`, which can not be a keyword argument
+        if keyword.iskeyword(arg_name):
+            arg_name += "_"
+
+        parsed.append((words[0], indexed, arg_name))
+
+    return name, parsed
+
+
+def get_topic(name: str, params: List[Tuple[str, bool, str]]) -> str:
+    """
+    Returns:
+        str: topic0 of the event, the keccak hash of its canonical signature.
+    """
+
+    canonical = f"{name}({','.join(param[0] for param in params)})"
+    return "0x" + keccak(text=canonical).hex()
+
+
+def get_topic_type(param_type: str) -> str:
+    """
+    Returns:
+        str: the type of an indexed parameter in the topics. Strings, bytes,
+        arrays and tuples are hashed into a bytes32 topic, the rest is as is.
+    """
+
+    if (
+        param_type in ("string", "bytes")
+        or param_type.endswith("]")
+        or param_type.startswith("(")
+    ):
+        return "bytes32"
+
+    return param_type
+
+
+def strip_hex_prefix(value: str) -> str:
+    """
+    Returns:
+        str: the hexstring without its 0x prefix, if it has one.
+    """
+
+    return value[2:] if value.startswith("0x") else value
+
+
+def decode_hex(value: str) -> bytes:
+    """
+    Returns:
+        bytes: of the 0x prefixed hexstring.
+    """
+
+    return bytes.fromhex(strip_hex_prefix(value))
+
+
+def decode_topic(param_type: str, topic: str) -> Any:
+    """
+    Args:
+        param_type (str): the solidity type of the indexed parameter.
+        topic (str): the 0x prefixed topic.
+
+    Returns:
+        Any: the value of the parameter, or its hash for the types that are
+        hashed into the topic.
+    """
+
+    decoder = registry.get_decoder(get_topic_type(param_type))
+    return decoder(ContextFramesBytesIO(decode_hex(topic)))
+
+
+def is_word_type(param_type: str) -> bool:
+    """
+    Returns:
+        bool: whether the type is encoded as exactly one word, which is what
+        `decode_words` decodes.
+    """
+
+    match = WORD_TYPE_PATTERN.match(param_type)
+    if match is None:
+        return False
+
+    size = match.group(3)
+    return size is None or 1 <= int(size) <= WORD_SIZE
+
+
+def to_word_matrix(values: List[str], words: int = 1) -> np.ndarray:
+    """
+    Args:
+        values (List[str]): 0x prefixed hexstrings of `words` words each.
+        words (int): the number of words per value.
+
+    Raises:
+        ValueError: if a value is not `words` words long.
+
+    Returns:
+        np.ndarray: uint8 matrix of shape (len(values), words * 32), with a
+        row per value. All of the values are converted with a single call.
+    """
+
+    # * "0x" can only be a prefix, as "x" is not a hex digit
+    raw = bytes.fromhex("".join(values).replace("0x", ""))
+    return np.frombuffer(raw, dtype=np.uint8).reshape(len(values), words * WORD_SIZE)
+
+
+def _to_objects(values: List[Any]) -> np.ndarray:
+    # * element by element, numpy would turn a list of tuples into a matrix
+    column = np.empty(len(values), dtype=object)
+    for ix, value in enumerate(values):
+        column[ix] = value
+
+    return column
+
+
+def _decode_addresses(matrix: np.ndarray) -> np.ndarray:
+    digits = HEX_DIGITS[matrix[:, WORD_SIZE - ADDRESS_SIZE :]]
+    prefix = np.full((len(matrix), 1), "0x", dtype="<U2")
+
+    # * a row of 21 two digit strings is laid out like one 42 character string
+    return (
+        np.concatenate([prefix, digits], axis=1)
+        .view(f"<U{2 + 2 * ADDRESS_SIZE}")
+        .reshape(-1)
+    )
+
+
+def _decode_uints(matrix: np.ndarray) -> np.ndarray:
+    if not matrix[:, : WORD_SIZE - INT64_SIZE].any():
+        low = np.ascontiguousarray(matrix[:, WORD_SIZE - INT64_SIZE :])
+        return low.view(">u8").reshape(-1).astype(np.uint64)
+
+    # * e.g. token ids and wei amounts, that do not fit into 64 bits
+    return _to_objects([int.from_bytes(row.tobytes(), "big") for row in matrix])
+
+
+def _decode_ints(matrix: np.ndarray) -> np.ndarray:
+    low = (
+        np.ascontiguousarray(matrix[:, WORD_SIZE - INT64_SIZE :])
+        .view(">i8")
+        .reshape(-1)
+    )
+    # * the high bytes of a 64 bit integer are its sign extension
+    sign = np.where(low < 0, 0xFF, 0).astype(np.uint8)
+
+    if (matrix[:, : WORD_SIZE - INT64_SIZE] == sign[:, None]).all():
+        return low.astype(np.int64)
+
+    return _to_objects(
+        [int.from_bytes(row.tobytes(), "big", signed=True) for row in matrix]
+    )
+
+
+def decode_words(param_type: str, matrix: np.ndarray) -> np.ndarray:
+    """
+    Decodes a column of words, without a python call per word where the type
+    has a numpy dtype.
+
+    Args:
+        param_type (str): a type for which `is_word_type` holds.
+        matrix (np.ndarray): uint8 matrix with a word per row.
+
+    Raises:
+        ValueError: if the type is not a one word type, or, like `eth_abi`, if
+        a bool word is neither 0 nor 1.
+
+    Returns:
+        np.ndarray: `<U42` lower cased addresses, `bool`, `uint64` and `int64`
+        integers, or `V<size>` bytes. Integers that do not fit into 64 bits
+        make the column an `object` array of python ints.
+    """
+
+    if not is_word_type(param_type):
+        raise ValueError(f"Not a one word type: {param_type}")
+
+    if param_type == "address":
+        return _decode_addresses(matrix)
+
+    if param_type == "bool":
+        if matrix[:, : WORD_SIZE - 1].any() or (matrix[:, WORD_SIZE - 1] > 1).any():
+            raise ValueError("A bool must be either 0 or 1.")
+
+        return matrix[:, WORD_SIZE - 1] == 1
+
+    if param_type.startswith("uint"):
+        return _decode_uints(matrix)
+
+    if param_type.startswith("int"):
+        return _decode_ints(matrix)
+
+    size = int(param_type[len("bytes") :])
+    # * bytesN is left aligned in its word
+    return np.ascontiguousarray(matrix[:, :size]).view(f"V{size}").reshape(-1)
+
+
+class BatchDecoder:
+    """
+    Decodes a batch of log events of one event signature column by column.
+    Every topic and, if all of the parameters in the data are one word types,
+    every data column is converted from hex with a single call, and decoded
+    with numpy, instead of with `eth_abi` per event.
+
+    Data with dynamic types, e.g. strings or arrays, is decoded with `eth_abi`
+    per event, into `object` columns. Indexed strings, bytes, arrays and tuples
+    are only a hash in the topics, they are decoded as bytes32.
+    """
+
+    def __init__(self, signature: str):
+        """
+        Args:
+            signature (str): the event signature, with the parameter names,
+            which become the names of the columns.
+        """
+
+        _, params = parse_signature(signature)
+
+        self._names = [param[2] for param in params]
+        # (argument name, type) of the indexed parameters, in topic order
+        self._topic_params = [
+            (arg_name, get_topic_type(param_type))
+            for param_type, indexed, arg_name in params
+            if indexed
+        ]
+        self._data_params = [
+            (arg_name, param_type)
+            for param_type, indexed, arg_name in params
+            if not indexed
+        ]
+
+        # * with one word types only, the data is a fixed number of words
+        self._data_decoder = None
+        if not all(is_word_type(param_type) for _, param_type in self._data_params):
+            self._data_decoder = registry.get_decoder(
+                f"({','.join(param_type for _, param_type in self._data_params)})"
+            )
+
+    def accepts(self, event: Dict) -> bool:
+        """
+        Args:
+            event (Dict): a log event with the topic0 of the signature.
+
+        Returns:
+            bool: whether the event has as many topics as the signature has
+            indexed parameters, and, for data of one word types, exactly the
+            data that they take up. E.g. ERC20 and ERC721 transfers share the
+            topic0, but not the indexed parameters.
+        """
+
+        if len(event["raw_log_topics"]) != len(self._topic_params) + 1:
+            return False
+
+        if self._data_decoder is not None or not self._data_params:
+            return True
+
+        data = strip_hex_prefix(event["raw_log_data"] or "0x")
+        return len(data) == 2 * WORD_SIZE * len(self._data_params)
+
+    def decode(self, events: List[Dict]) -> Dict[str, np.ndarray]:
+        """
+        Args:
+            events (List[Dict]): log events for which `accepts` holds.
+
+        Raises:
+            ValueError: if the topics or the data of an event are malformed.
+
+        Returns:
+            Dict[str, np.ndarray]: a column per parameter, in the order of the
+            signature, with a row per event. See `decode_words` for the dtypes.
+        """
+
+        columns = {}
+
+        for ix, (arg_name, param_type) in enumerate(self._topic_params):
+            matrix = to_word_matrix(
+                [event["raw_log_topics"][ix + 1] for event in events]
+            )
+            columns[arg_name] = decode_words(param_type, matrix)
+
+        if self._data_decoder is None and self._data_params:
+            matrix = to_word_matrix(
+                [event["raw_log_data"] for event in events], len(self._data_params)
+            )
+            for ix, (arg_name, param_type) in enumerate(self._data_params):
+                columns[arg_name] = decode_words(
+                    param_type, matrix[:, ix * WORD_SIZE : (ix + 1) * WORD_SIZE]
+                )
+        elif self._data_decoder is not None:
+            rows = [
+                self._data_decoder(
+                    ContextFramesBytesIO(decode_hex(event["raw_log_data"] or "0x"))
+                )
+                for event in events
+            ]
+            for ix, (arg_name, _) in enumerate(self._data_params):
+                columns[arg_name] = _to_objects([row[ix] for row in rows])
+
+        return {name: columns[name] for name in self._names}
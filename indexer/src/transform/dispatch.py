@@ -0,0 +1,232 @@
+"""
+Routes the log events of raw transactions to the handlers of a transformer
+"""
+import logging
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from eth_abi.decoding import ContextFramesBytesIO
+from eth_abi.exceptions import DecodingError
+from eth_abi.registry import registry
+
+from transform.decode import (
+    BatchDecoder,
+    decode_hex,
+    get_topic,
+    get_topic_type,
+    parse_signature,
+)
+
+# a handler is called with the raw transaction, and the decoded event
+# parameters as keyword arguments
+Handler = Callable[..., None]
+
+
+class Event(NamedTuple):
+    """An event that a handler is registered for, with its decoders built"""
+
+    name: str
+    handler: Handler
+    # (argument name, decoder) of the indexed parameters, in topic order
+    topic_decoders: List[Tuple[str, Any]]
+    # argument names of the parameters in the data, and their tuple decoder
+    data_names: List[str]
+    data_decoder: Optional[Any]
+    # decodes all of the events of a batch at once, see `prepare`
+    batch_decoder: BatchDecoder
+
+
+class EventDispatcher:
+    """
+    Transformers register a handler per (contract address, event signature).
+    The topic and the `eth_abi` decoders of every event are built once, at
+    registration, so routing an event is a dictionary lookup on its address and
+    topic0, and the handler is called with the decoded parameters.
+
+    Indexed strings, bytes, arrays and tuples are only a hash in the topics.
+    They are handed over as the hash, in bytes.
+
+    `prepare` decodes a whole batch of transactions up front, column-wise per
+    event, after which routing its events does not decode anything anymore.
+    """
+
+    def __init__(self):
+        # (lower cased address, topic0) -> event
+        self._events: Dict[Tuple[str, str], Event] = {}
+        # id of a prepared log event -> the event, and its decoded parameters.
+        # None for a malformed event
+        self._prepared: Dict[int, Tuple[Dict, Optional[Dict[str, Any]]]] = {}
+
+    def register(self, address: str, signature: str, handler: Handler) -> None:
+        """
+        Args:
+            address (str): the contract that emits the event.
+            signature (str): the event signature, with the names of the
+            parameters, which become the keyword arguments of the handler.
+            handler (Handler): called as `handler(txn, **params)`.
+        """
+
+        name, params = parse_signature(signature)
+
+        topic_decoders = [
+            (arg_name, registry.get_decoder(get_topic_type(param_type)))
+            for param_type, indexed, arg_name in params
+            if indexed
+        ]
+
+        data_params = [param for param in params if not param[1]]
+        data_decoder = None
+        if data_params:
+            data_decoder = registry.get_decoder(
+                f"({','.join(param[0] for param in data_params)})"
+            )
+
+        self._events[(address.lower(), get_topic(name, params))] = Event(
+            name=name,
+            handler=handler,
+            topic_decoders=topic_decoders,
+            data_names=[param[2] for param in data_params],
+            data_decoder=data_decoder,
+            batch_decoder=BatchDecoder(signature),
+        )
+
+    @staticmethod
+    def _get_key(event: Dict) -> Optional[Tuple[str, str]]:
+        topics = event["raw_log_topics"]
+        if not topics:
+            return None
+
+        return event["sender_address"], topics[0]
+
+    def _match(self, event: Dict) -> Optional[Event]:
+        key = self._get_key(event)
+        if key is None:
+            return None
+
+        return self._events.get(key)
+
+    @staticmethod
+    def _decode(registered: Event, event: Dict) -> Optional[Dict[str, Any]]:
+        topics = event["raw_log_topics"]
+
+        # * e.g. ERC20 and ERC721 transfers share the topic, but not the
+        # * indexed parameters
+        if len(topics) != len(registered.topic_decoders) + 1:
+            logging.warning(
+                f"Unexpected topics of {registered.name}, skipping: {topics}"
+            )
+            return None
+
+        try:
+            args = {
+                arg_name: decoder(ContextFramesBytesIO(decode_hex(topic)))
+                for (arg_name, decoder), topic in zip(
+                    registered.topic_decoders, topics[1:]
+                )
+            }
+
+            if registered.data_decoder is not None:
+                values = registered.data_decoder(
+                    ContextFramesBytesIO(decode_hex(event["raw_log_data"] or "0x"))
+                )
+                args.update(zip(registered.data_names, values))
+        except (DecodingError, ValueError) as e:
+            logging.warning(f"Malformed {registered.name}, skipping: {e}")
+            return None
+
+        return args
+
+    def _get_args(self, registered: Event, event: Dict) -> Optional[Dict[str, Any]]:
+        prepared = self._prepared.get(id(event))
+        # * the event is held on to, so its id can not have been reused
+        if prepared is not None and prepared[0] is event:
+            return prepared[1]
+
+        return self._decode(registered, event)
+
+    def _prepare_events(self, registered: Event, events: List[Dict]) -> None:
+        columns = registered.batch_decoder.decode(events)
+        names = list(columns)
+        # * `tolist` hands over python scalars, that the dbs can store
+        rows = zip(*(columns[name].tolist() for name in names))
+
+        for event, row in zip(events, rows):
+            self._prepared[id(event)] = (event, dict(zip(names, row)))
+
+    def prepare(self, txns: List[Any]) -> None:
+        """
+        Decodes the log events of a batch of transactions that have a handler,
+        with a `BatchDecoder` call per event, and keeps the parameters until
+        the next batch. Events that can not be decoded column-wise are left to
+        be decoded one at a time. Malformed events are skipped, like the ones
+        that `dispatch` decodes itself.
+
+        Args:
+            txns (List[Any]): the raw transactions of the batch.
+        """
+
+        batches: Dict[Tuple[str, str], List[Dict]] = {}
+
+        for txn in txns:
+            for event in txn["log_events"]:
+                key = self._get_key(event)
+                if key not in self._events:
+                    continue
+
+                if self._events[key].batch_decoder.accepts(event):
+                    batches.setdefault(key, []).append(event)
+
+        self._prepared = {}
+
+        for key, events in batches.items():
+            registered = self._events[key]
+
+            try:
+                self._prepare_events(registered, events)
+            except (DecodingError, ValueError):
+                # * a single malformed event fails its whole batch, so the
+                # * events are decoded one by one to find it
+                for event in events:
+                    try:
+                        self._prepare_events(registered, [event])
+                    except (DecodingError, ValueError) as e:
+                        logging.warning(f"Malformed {registered.name}, skipping: {e}")
+                        self._prepared[id(event)] = (event, None)
+
+    def decode(self, event: Dict) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """
+        Args:
+            event (Dict): a log event of a raw transaction.
+
+        Returns:
+            Optional[Tuple[str, Dict[str, Any]]]: the name of the event and its
+            decoded parameters, None if no handler is registered for it.
+        """
+
+        registered = self._match(event)
+        if registered is None:
+            return None
+
+        args = self._get_args(registered, event)
+        if args is None:
+            return None
+
+        return registered.name, args
+
+    def dispatch(self, txn: Any) -> None:
+        """
+        Calls the handlers of the log events of the transaction, in the order
+        in which they were emitted.
+
+        Args:
+            txn (Any): the raw transaction.
+        """
+
+        # * ensures that events are supplied in the correct order
+        for event in sorted(txn["log_events"], key=lambda x: x["log_offset"]):
+            registered = self._match(event)
+            if registered is None:
+                continue
+
+            args = self._get_args(registered, event)
+            if args is not None:
+                registered.handler(txn, **args)
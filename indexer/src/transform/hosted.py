@@ -0,0 +1,289 @@
+"""
+A transformer, together with its own block height and buffer, hosted by
+`Transform`
+"""
+import importlib
+import logging
+from typing import Any, Dict, List, Optional
+
+from config import Config
+from interfaces.idb import IDB
+from interfaces.itransformer import ITransformer
+from transform.buffer import WriteBehindBuffer
+from transform.snapshot import SNAPSHOT_INTERVAL, get_snapshot_store
+
+
+def get_collection_prefix(config: Config, name: str) -> str:
+    """
+    Returns:
+        str: what the collections of the transformer are named after. The
+        first transformer of a config keeps the collections of a single
+        transformer setup, the others have theirs named after the transformer.
+    """
+
+    prefix = f"{config.get_address()}-{config.get_network_id()}"
+    return prefix if name == config.get_transformer_name() else f"{prefix}-{name}"
+
+
+def get_state_version(name: str) -> int:
+    """
+    Returns:
+        int: the `STATE_VERSION` of the transformer module, 0 if it has none.
+        Transformers bump it whenever the layout of their state items changes.
+    """
+
+    module = importlib.import_module(f"transformers.{name}.main")
+    return getattr(module, "STATE_VERSION", 0)
+
+
+class HostedTransformer:
+    """
+    `Transform` reads the raw transactions once, and hands them to every one of
+    its transformers. Each of them has its own state, block height and commits,
+    so a transformer that lags behind, e.g. one that was just added, catches up
+    on transactions that the others skip.
+
+    The first transformer of a config keeps the collections of a single
+    transformer setup, `<address>-<network>-state` and
+    `<address>-<network>-block-height-state`, so adding transformers does not
+    invalidate its state. The others have theirs named after the transformer,
+    `<address>-<network>-<name>-state`, and so on.
+
+    If SNAPSHOT_DIR is set, the state is snapshotted every SNAPSHOT_INTERVAL
+    blocks, right after a commit, see `transform.rebuild`.
+    """
+
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(self, config: Config, name: str, db: IDB):
+        """
+        Args:
+            config (Config): holds the address of the transformer.
+            name (str): the transformer sub-directory to instantiate.
+            db (IDB): that the state and the block height are committed to.
+        """
+
+        self._config = config
+        self._name = name
+        self._prefix = get_collection_prefix(self._config, self._name)
+        self._state_version = get_state_version(self._name)
+
+        # block number up to which the transformer has committed its state
+        self._block_height: int = 0
+        # number of commits of the block height so far
+        self._version: int = 0
+
+        # block number of the last transaction transformed since the last commit
+        self._latest_block: Optional[int] = None
+        # number of transactions transformed since the last commit
+        self._transformed: int = 0
+
+        self._db_name = "ethereum-indexer"
+
+        # * the transformer's writes are coalesced here, and committed together
+        # * with the block height
+        self._buffer = WriteBehindBuffer(db)
+
+        # * transformers may load their state when they are instantiated, so
+        # * the last commit must be complete by then
+        self.determine_block_height()
+
+        # * None if snapshots are not taken
+        self._snapshots = get_snapshot_store(self._prefix)
+        # block number of the last snapshot of the state
+        self._snapshot_block_height: int = 0
+        if self._snapshots is not None:
+            latest = self._snapshots.get_latest(self._state_version, self._block_height)
+            if latest is not None:
+                self._snapshot_block_height = latest.block_height
+
+        full_module_name = f"transformers.{self._name}.main"
+        transformer_module = importlib.import_module(full_module_name)
+
+        # this implies that every transformer will take the address it transforms
+        # and the name of its state collection as constructor arguments
+        self._transformer: ITransformer = transformer_module.Transformer(
+            self._config.get_address(),
+            self._config.get_network_id(),
+            self._buffer,
+            collection_name=self.get_state_collection_name(),
+        )
+
+    def get_state_collection_name(self) -> str:
+        """
+        Returns:
+            str: the collection that the transformer keeps its state in.
+        """
+
+        return f"{self._prefix}-state"
+
+    def get_block_height_collection_name(self) -> str:
+        """
+        Returns:
+            str: the collection of the block height that the state covers.
+        """
+
+        return f"{self._prefix}-block-height-state"
+
+    def get_block_height(self) -> int:
+        """
+        Returns:
+            int: block number up to which the state is committed.
+        """
+
+        return self._block_height
+
+    def get_indexes(self) -> Dict[str, List[Dict]]:
+        """
+        Returns:
+            Dict[str, List[Dict]]: the indexes that the transformer requests
+            for its state lookups, if it has a `get_indexes`.
+        """
+
+        if hasattr(self._transformer, "get_indexes"):
+            return self._transformer.get_indexes()
+
+        return {}
+
+    def determine_block_height(self) -> None:
+        """
+        This ensures we do not transform all the data all the time, but only
+        the new stuff. This is also helpful in case the binary raises and
+        we need to restart it.
+        """
+
+        # * completes the last commit, if we crashed in the middle of it
+        block_height_item = self._buffer.recover(
+            1, self._db_name, self.get_block_height_collection_name()
+        )
+        # If it is None, then we have already set it to 0 in the __init__
+        if block_height_item is None:
+            return
+
+        self._block_height = block_height_item["block_height"]
+        self._version = block_height_item.get("version", 0)
+
+    def prefetch(self, txns: List[Any]) -> None:
+        """
+        Hands the transformer the transactions of a batch that it has not
+        transformed yet, if there are any.
+        """
+
+        # * the batch is in block order
+        if len(txns) == 0 or txns[-1]["block_height"] <= self._block_height:
+            return
+
+        self._transformer.prefetch(
+            [txn for txn in txns if txn["block_height"] > self._block_height]
+        )
+
+    def transform(self, txn: Any, batch_size: int) -> None:
+        """
+        Hands the transaction to the transformer, unless its state already
+        covers it, and commits in between blocks once `batch_size` transactions
+        were transformed, or the buffer is due.
+
+        Args:
+            txn (Any): the raw transaction, in block order.
+            batch_size (int): number of raw transactions whose state is
+            committed at once.
+        """
+
+        if txn["block_height"] <= self._block_height:
+            return
+
+        # * the block height covers whole blocks, so the state can only be
+        # * committed in between them
+        if (
+            self._latest_block is not None
+            and txn["block_height"] != self._latest_block
+            and (self._transformed >= batch_size or self._buffer.is_due())
+        ):
+            self.commit()
+
+        self._transformer.entrypoint(txn)
+        self._transformed += 1
+        # transactions are supplied in ascending order
+        # so we should write the last transaction's block number
+        self._latest_block = txn["block_height"]
+
+    def commit(self) -> None:
+        """
+        Has the transformer flush its state into the buffer, and writes the
+        buffer out together with the new block height, atomically. The block
+        height is used as an indicator of how far we have in transforming the
+        raw transactions, so it must match the state that it covers: a restart
+        resumes right after it, without transforming anything twice.
+        """
+
+        if self._latest_block is None:
+            return
+
+        self._transformer.flush()
+
+        # _id: 1, because we are only ever storing single block_height value per address
+        self._buffer.flush(
+            {
+                "_id": 1,
+                "block_height": self._latest_block,
+                "version": self._version + 1,
+            },
+            self._db_name,
+            self.get_block_height_collection_name(),
+        )
+
+        self._block_height = self._latest_block
+        self._version += 1
+        self._latest_block = None
+        self._transformed = 0
+
+        if (
+            self._snapshots is not None
+            and self._block_height - self._snapshot_block_height >= SNAPSHOT_INTERVAL
+        ):
+            self._snapshot()
+
+    def _snapshot(self) -> None:
+        """
+        Snapshots the state as of the commit that was just made. The state is
+        only ever written by this transformer, so it is consistent.
+        """
+
+        try:
+            snapshot = self._snapshots.save(
+                self._buffer.iter_items(
+                    self._db_name, self.get_state_collection_name()
+                ),
+                self._block_height,
+                self._state_version,
+                self._version,
+            )
+        except Exception as e:  # pylint: disable=broad-except
+            # * the state is committed, only a faster rebuild is lost
+            logging.warning(f"Snapshot of {self._name} failed: {e}")
+            return
+
+        logging.info(f"Snapshot of {self._name} at: {snapshot.path}")
+        self._snapshot_block_height = self._block_height
+
+    def __setattr__(self, key, value):
+        # https://towardsdatascience.com/how-to-create-read-only-and-deletion-proof-attributes-in-your-python-classes-b34cd1019c2d
+
+        forbid_reset_on = [
+            "_config",
+            "_name",
+            "_prefix",
+            "_state_version",
+            "_snapshots",
+            "_db_name",
+            "_buffer",
+            "_transformer",
+        ]
+        for k in forbid_reset_on:
+            if key == k and hasattr(self, k):
+                raise AttributeError(
+                    "The value of the address attribute has already been set,"
+                    " and can not be re-set."
+                )
+
+        self.__dict__[key] = value
@@ -1,147 +1,257 @@
 """
 Transformer base class
 """
-import importlib
 import logging
 import time
+from multiprocessing.synchronize import Event
+from typing import Any, Dict, Iterator, List, Optional
 
 from config import Config
-from db import DB
+from db import get_db
 from interfaces.itransform import ITransform
+from interfaces.iwatch import IWatch
+from io_loop import get_async_db, get_io_loop
+from transform.hosted import HostedTransformer
 
+# with a watch or a `new_data` event, this is only the fallback in case a wake
+# up is missed
 SLEEP_TIMER = 10
 
+# the raw transactions are read after the block height checkpoint, in block order
+RAW_TRANSACTION_INDEXES = [{"keys": [("block_height", 1)]}]
+# the only fields of the raw transactions that the transformers consume
+RAW_TRANSACTION_PROJECTION = ["log_events", "block_height", "block_signed_at"]
+# number of raw transactions fetched per round trip
+READ_BATCH_SIZE = 500
+# number of raw transactions after which their state is committed together with
+# the block height, at the next block boundary
+TRANSFORM_BATCH_SIZE = 1000
+
 
 class Transform(ITransform):
-    """@inheritdoc ITransform"""
+    """
+    @inheritdoc ITransform
+
+    Hosts every transformer of the config. The raw transactions are read and
+    deserialized once, from the lowest block height of the transformers, and
+    handed to each transformer whose state does not cover them yet.
+    """
+
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(
+        self,
+        config: Config,
+        new_data: Optional[Event] = None,
+        batch_size: int = TRANSFORM_BATCH_SIZE,
+    ):
+        """
+        Args:
+            config (Config): holds the address and the names of the transformers.
+            new_data (Optional[Event]): set by the extractor whenever its block
+            height moves past new raw transactions. Wakes the transformer up
+            early, if the db can not be watched.
+            batch_size (int): number of raw transactions whose state is
+            committed at once. A restart resumes from the last commit.
+        """
+
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1.")
 
-    def __init__(self, config: Config):
         self._config = config
+        self._new_data = new_data
+        self._batch_size = batch_size
 
-        # * name of the module that will perform transforming
-        self._to_transform = self._config.get_transformer_name()
+        # * names of the modules that will perform transforming
+        self._to_transform = self._config.get_transformer_names()
 
         # todo: validate that the address in config is valid
         # todo: validate that the address is being scraped (i.e. is in the db)
         # todo: validate that the name of the events is lower cased event name
         # from the scraped transactions
 
-        # block number up to which the extraction has happened
-        self._block_height: int = 0
-
-        full_module_name = f"transformers.{self._to_transform}.main"
-        transformer_module = importlib.import_module(full_module_name)
-
-        # this implies that every transformer will take the address it transforms
-        # as a constructor argument
-        self._transformer = transformer_module.Transformer(
-            self._config.get_address(), self._config.get_network_id()
-        )
-
         self._db_name = "ethereum-indexer"
 
         # * to read the raw transactions from the database
-        self._db = DB()
+        self._db = get_db()
+        # * to read the next raw transactions while the current ones are
+        # * transformed and committed
+        self._async_db = get_async_db()
+
+        self._hosted = [
+            HostedTransformer(self._config, name, self._db)
+            for name in self._to_transform
+        ]
+
+        self._ensure_indexes()
+
+        # * the extractor moves its block height once the raw transactions up
+        # * to it are written, so that write is what we wait for. None if the
+        # * db can not watch, e.g. mongo without a replica set
+        self._watch: Optional[IWatch] = self._db.watch_item(
+            1, self._db_name, self._get_extracted_block_height_collection_name()
+        )
 
     def _get_raw_txn_collection_name(self) -> str:
         return f"{self._config.get_address()}-{self._config.get_network_id()}"
 
-    def _get_state_collection_name(self) -> str:
-        # !: will be more than one address later
-        return f"{self._config.get_address()}-{self._config.get_network_id()}-state"
-
-    def _get_block_height_collection_name(self) -> str:
-        return f"{self._config.get_address()}-{self._config.get_network_id()}-block-height-state"
+    def _get_extracted_block_height_collection_name(self) -> str:
+        return (
+            f"{self._config.get_address()}-{self._config.get_network_id()}-block-height"
+        )
 
-    def _determine_block_height(self) -> None:
+    def _get_indexes(self) -> Dict[str, List[Dict]]:
         """
-        This ensures we do not extract all the data all the time, but only
-        the new stuff. This is also helpful in case the binary raises and
-        we need to restart it.
+        Indexes per collection: the ones that the raw transaction reads need,
+        and the ones that the transformers request for their state lookups,
+        if they have a `get_indexes`. State is otherwise looked up by `_id`,
+        which is always indexed.
         """
 
-        block_height_item = self._db.get_any_item(
-            self._db_name, self._get_block_height_collection_name()
-        )
-        # If it is None, then we have already set it to 0 in the __init__
-        if block_height_item is None:
-            return
+        indexes = {self._get_raw_txn_collection_name(): RAW_TRANSACTION_INDEXES}
+
+        for hosted in self._hosted:
+            for collection_name, requested in hosted.get_indexes().items():
+                indexes[collection_name] = indexes.get(collection_name, []) + requested
+
+        return indexes
 
-        self._block_height = block_height_item["block_height"]
+    def _ensure_indexes(self) -> None:
+        for collection_name, indexes in self._get_indexes().items():
+            self._db.ensure_indexes(self._db_name, collection_name, indexes)
 
-    def _update_block_height(self, new_block_height: int) -> None:
+            logging.info(
+                f"Index usage of {collection_name}:"
+                f" {self._db.get_index_stats(self._db_name, collection_name)}"
+            )
+
+    def _get_block_height(self) -> int:
+        """
+        Returns:
+            int: block number up to which every transformer has committed its
+            state, so the one to read the raw transactions after.
         """
-        Block height is used as an indicator of how far we have in transforming
-        the raw transactions. This is useful because if we don't keep this information
-        we may transform the same transaction's logs twice.
 
-        Args:
-            new_block_height (int): we have now transformed raw transactions up to this
-            block number.
+        return min(hosted.get_block_height() for hosted in self._hosted)
+
+    def _get_extracted_block_height(self) -> Optional[int]:
+        """
+        The extractor writes the raw transactions out of block order, e.g.
+        newest page first, and only then moves its own block height. Reading
+        past it could skip transactions that are yet to be written.
+
+        Returns:
+            Optional[int]: block number up to which the extraction is complete,
+            None if no extraction has completed yet.
         """
 
-        collection_name = self._get_block_height_collection_name()
-        # _id: 1, because we are only ever storing single block_height value per address
-        item = {"_id": 1, "block_height": new_block_height}
-        self._db.put_item(item, self._db_name, collection_name)
+        block_height_item = self._db.get_item(
+            1, self._db_name, self._get_extracted_block_height_collection_name()
+        )
 
-    # todo: return type
-    def _read_raw_transactions_after_block(self):
+        if block_height_item is None:
+            return None
+
+        return block_height_item["block_height"]
+
+    def _read_raw_transactions_after_block(
+        self, extracted_block_height: int
+    ) -> Iterator[Any]:
         """
-        Pulls all transactions after block height, and sorts them in ascending order
+        Streams the transactions after the lowest block height of the
+        transformers, up to the extracted block height, in ascending order.
+        The next batch is always fetched while the caller is busy with the
+        current one.
         """
 
-        raw_transactions = self._db.get_all_items(
+        batches = self._async_db.iter_batches(
             self._db_name,
             self._get_raw_txn_collection_name(),
             {
-                "query_clause": {"block_height": {"$gt": self._block_height}},
+                "query_clause": {
+                    "block_height": {
+                        "$gt": self._get_block_height(),
+                        "$lte": extracted_block_height,
+                    }
+                },
                 "sort": {"sort_by": "block_height", "direction": 1},
             },
+            batch_size=READ_BATCH_SIZE,
+            projection=RAW_TRANSACTION_PROJECTION,
         )
 
-        return raw_transactions
+        return self._prefetch(get_io_loop().iterate(batches))
+
+    def _prefetch(self, batches: Iterator[List[Any]]) -> Iterator[Any]:
+        """
+        Hands every batch to the transformers before its transactions, such
+        that they can look up the state that they need at once.
+        """
+
+        for batch in batches:
+            for hosted in self._hosted:
+                hosted.prefetch(batch)
+            yield from batch
 
     def transform(self) -> None:
         """@inheritdoc ITransform"""
 
-        # 1. Retrieve the last block up to which we have transformed the txns
-        # 2. Read the raw transactions after that block
-        # 3. Pass in the right order these transactions into individual handlers
+        # 1. Retrieve the last block up to which each transformer has
+        # transformed the txns
+        # 2. Stream the raw transactions after the lowest of these blocks
+        # 3. Pass in the right order these transactions into the transformers
+        # that have not transformed them yet
         # 4. Handlers return transformed data which we store here in memory
-        # 5. Determine the newest block from these txns
-        # 6. Update the last block
+        # 5. Commit it together with the newest block of these txns
 
         # 1.
-        self._determine_block_height()
+        for hosted in self._hosted:
+            hosted.determine_block_height()
+
+        extracted_block_height = self._get_extracted_block_height()
+        if extracted_block_height is None:
+            return
 
         # 2.
-        raw_transactions = self._read_raw_transactions_after_block()
+        raw_transactions = self._read_raw_transactions_after_block(
+            extracted_block_height
+        )
 
-        # 3.
+        # 3. 4.
         for txn in raw_transactions:
-            # 4.
-            self._transformer.entrypoint(txn)
-
-        # 5.
-        if len(raw_transactions) == 0:
-            return
-        # transactions are supplied in ascending order
-        # so we should write the last transaction's block number
-        latest_block = raw_transactions[-1]["block_height"]
+            for hosted in self._hosted:
+                hosted.transform(txn, self._batch_size)
 
-        # 6.
-        self._update_block_height(latest_block)
+        # 5. caught up, so everything is committed
+        for hosted in self._hosted:
+            hosted.commit()
 
     def flush(self) -> None:
         """@inheritdoc ITransform"""
 
-        # this way the responsibility of maintaining complex state and
-        # writing it to db is with the transformer
-        self._transformer.flush()
-
+        # * the transformed state is committed by `transform`, together with the
+        # * block height, so all that is left is to wait for new data
         logging.info("Transformer sleeping...")
-        time.sleep(SLEEP_TIMER)
+
+        if self._watch is not None:
+            try:
+                if self._watch.wait(SLEEP_TIMER):
+                    logging.info("Transformer woken up by the extracted block height")
+                return
+            except Exception as e:  # pylint: disable=broad-except
+                logging.warning(f"Watch failed, falling back to polling: {e}")
+                self._watch.close()
+                self._watch = None
+
+        if self._new_data is None:
+            time.sleep(SLEEP_TIMER)
+            return
+
+        # * cleared before the next transform reads, so that data written
+        # * during that read sets it again and is not missed
+        if self._new_data.wait(SLEEP_TIMER):
+            logging.info("Transformer woken up by new raw transactions")
+        self._new_data.clear()
 
     def __setattr__(self, key, value):
         # https://towardsdatascience.com/how-to-create-read-only-and-deletion-proof-attributes-in-your-python-classes-b34cd1019c2d
@@ -149,9 +259,11 @@ class Transform(ITransform):
         forbid_reset_on = [
             "_to_transform",
             "_config",
+            "_batch_size",
             "_db_name",
             "_db",
-            "_transformer",
+            "_async_db",
+            "_hosted",
         ]
         for k in forbid_reset_on:
             if key == k and hasattr(self, k):
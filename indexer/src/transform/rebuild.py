@@ -0,0 +1,121 @@
+"""
+Rebuilds the state of a transformer, e.g. after a bug in it is fixed, from its
+newest compatible snapshot. The transform process of the config must not run
+while it does. Afterwards, it transforms the blocks after the snapshot again.
+
+    python -m transform.rebuild --config rkl_club_auction_kovan \
+        --before-block 29000000
+"""
+import argparse
+import logging
+from itertools import islice
+from typing import Optional
+
+from config import Config
+from db import get_db
+from interfaces.idb import IDB
+from transform.hosted import get_collection_prefix, get_state_version
+from transform.snapshot import get_snapshot_store
+
+# number of state items written per round trip
+RESTORE_BATCH_SIZE = 1000
+
+
+def rebuild(
+    config: Config,
+    name: str,
+    before_block: Optional[int] = None,
+    db: Optional[IDB] = None,
+) -> int:
+    """
+    Replaces the state and the block height of the transformer with the ones
+    of its newest snapshot of the same `STATE_VERSION`, at or before
+    `before_block`. The block height keeps the version that it had when the
+    snapshot was taken. Without such a snapshot the state is dropped, and is
+    transformed again from the first block. The snapshots after the restored
+    one are of the state that is rebuilt, so they are deleted.
+
+    An interrupted rebuild leaves no block height behind, and is run again.
+
+    Args:
+        config (Config): holds the address of the transformer.
+        name (str): the transformer to rebuild.
+        before_block (Optional[int]): e.g. the block before the bug first
+        changed the state. Defaults to the newest snapshot.
+        db (Optional[IDB]): defaults to `get_db()`.
+
+    Returns:
+        int: block height that the transformer resumes from.
+    """
+
+    db = get_db() if db is None else db
+    db_name = "ethereum-indexer"
+
+    prefix = get_collection_prefix(config, name)
+    state_collection_name = f"{prefix}-state"
+    block_height_collection_name = f"{prefix}-block-height-state"
+
+    snapshots = get_snapshot_store(prefix)
+    snapshot = None
+    if snapshots is not None:
+        snapshot = snapshots.get_latest(get_state_version(name), before_block)
+
+    # * the block height goes first, and comes back last: without it, the state
+    # * is not trusted by anything
+    db.drop_collection(db_name, block_height_collection_name)
+    db.drop_collection(db_name, state_collection_name)
+
+    if snapshot is None:
+        if snapshots is not None:
+            snapshots.discard_after(0)
+        logging.info(f"No snapshot of {name}, transforming from the first block")
+        return 0
+
+    items = snapshots.load(snapshot)
+    while True:
+        batch = list(islice(items, RESTORE_BATCH_SIZE))
+        if len(batch) == 0:
+            break
+        db.put_items_bulk(batch, db_name, state_collection_name, overwrite=True)
+
+    db.put_item(
+        {
+            "_id": 1,
+            "block_height": snapshot.block_height,
+            "version": snapshot.version,
+        },
+        db_name,
+        block_height_collection_name,
+    )
+    snapshots.discard_after(snapshot.block_height)
+
+    logging.info(f"Restored {name} from {snapshot.path}")
+    return snapshot.block_height
+
+
+def main():
+    """Parses the arguments and rebuilds the transformer"""
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n", maxsplit=1)[0])
+    parser.add_argument(
+        "--config", required=True, help="a Config preset, e.g. rkl_club_auction_kovan"
+    )
+    parser.add_argument(
+        "--transformer", help="one of the config's, defaults to its first one"
+    )
+    parser.add_argument("--before-block", type=int)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    config = getattr(Config, args.config)()
+    name = args.transformer or config.get_transformer_name()
+    if name not in config.get_transformer_names():
+        parser.error(f"{name} is not a transformer of {args.config}")
+
+    block_height = rebuild(config, name, args.before_block)
+    logging.info(f"{name} resumes after block {block_height}")
+
+
+if __name__ == "__main__":
+    main()
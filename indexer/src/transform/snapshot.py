@@ -0,0 +1,229 @@
+"""
+Compressed snapshots of the state of a transformer, on the local filesystem
+"""
+import gzip
+import json
+import os
+import re
+from decimal import Decimal
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional
+
+import numpy as np
+from bson import json_util
+
+# number of blocks between two snapshots of a transformer's state
+SNAPSHOT_INTERVAL = 100_000
+# number of the newest snapshots that are kept per transformer
+SNAPSHOT_RETENTION = 3
+
+SNAPSHOT_SUFFIX = ".jsonl.gz"
+
+
+def encode_value(value: Any) -> Any:
+    """
+    The `default` of the json encoding of the state items. The values of mongo,
+    e.g. datetimes, ObjectIds, Decimal128s and bytes, are encoded as extended
+    json, which `SnapshotStore.load` decodes back into them. Other values that
+    json does not have are encoded as their closest json value.
+
+    Args:
+        value (Any): a value that json can not encode.
+
+    Raises:
+        TypeError: if there is no json value for it.
+
+    Returns:
+        Any: sets as lists, decimals as their string and numpy values as python
+        values. Extended json for the others.
+    """
+
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+
+    if isinstance(value, Decimal):
+        return str(value)
+
+    if isinstance(value, (np.generic, np.ndarray)):
+        return value.tolist()
+
+    return json_util.default(value)
+
+
+class Snapshot(NamedTuple):
+    """A snapshot file, and what it was taken of"""
+
+    path: str
+    # block number up to which the state in the snapshot is transformed
+    block_height: int
+    # `STATE_VERSION` of the transformer that took it
+    state_version: int
+    # version of the block height checkpoint, i.e. the number of its commits
+    version: int
+
+
+class SnapshotStore:
+    """
+    Keeps the snapshots of one transformer in a directory, as gzipped json
+    lines, one line per state item. They are named
+    `<prefix>-<block height>-v<state version>-c<version>.jsonl.gz`, after the
+    collection prefix of the transformer, and the version of its block height
+    checkpoint.
+
+    A snapshot is written to a temporary file and renamed once it is complete,
+    so an interrupted snapshot is never picked up.
+    """
+
+    def __init__(
+        self, directory: str, prefix: str, retention: int = SNAPSHOT_RETENTION
+    ):
+        """
+        Args:
+            directory (str): where the snapshots are kept. Created if needed.
+            prefix (str): the collection prefix of the transformer, e.g.
+            `<address>-<network>`.
+            retention (int): number of the newest snapshots that are kept.
+        """
+
+        if retention < 1:
+            raise ValueError("retention must be at least 1.")
+
+        self._directory = directory
+        self._prefix = prefix
+        self._retention = retention
+        self._pattern = re.compile(
+            rf"^{re.escape(prefix)}-(\d+)-v(\d+)-c(\d+){re.escape(SNAPSHOT_SUFFIX)}$"
+        )
+
+        os.makedirs(self._directory, exist_ok=True)
+
+    def get_snapshots(self) -> List[Snapshot]:
+        """
+        Returns:
+            List[Snapshot]: all of the snapshots of the transformer, oldest
+            first.
+        """
+
+        snapshots = []
+
+        for filename in os.listdir(self._directory):
+            match = self._pattern.match(filename)
+            if match is not None:
+                snapshots.append(
+                    Snapshot(
+                        path=os.path.join(self._directory, filename),
+                        block_height=int(match.group(1)),
+                        state_version=int(match.group(2)),
+                        version=int(match.group(3)),
+                    )
+                )
+
+        return sorted(snapshots, key=lambda snapshot: snapshot.block_height)
+
+    def get_latest(
+        self, state_version: int, max_block_height: Optional[int] = None
+    ) -> Optional[Snapshot]:
+        """
+        Args:
+            state_version (int): the `STATE_VERSION` of the transformer. The
+            state of other versions has a different layout.
+            max_block_height (Optional[int]): e.g. the block before a bug
+            first changed the state. Defaults to any block.
+
+        Returns:
+            Optional[Snapshot]: the newest compatible snapshot, None if there
+            is none.
+        """
+
+        compatible = [
+            snapshot
+            for snapshot in self.get_snapshots()
+            if snapshot.state_version == state_version
+            and (max_block_height is None or snapshot.block_height <= max_block_height)
+        ]
+
+        return compatible[-1] if compatible else None
+
+    def save(
+        self,
+        items: Iterable[Dict[str, Any]],
+        block_height: int,
+        state_version: int,
+        version: int,
+    ) -> Snapshot:
+        """
+        Writes a snapshot, and prunes the snapshots beyond the retention.
+
+        Args:
+            items (Iterable[Dict[str, Any]]): all of the state items.
+            block_height (int): up to which the state is transformed.
+            state_version (int): the `STATE_VERSION` of the transformer.
+            version (int): of the block height checkpoint, restored with it.
+
+        Returns:
+            Snapshot: the snapshot written.
+        """
+
+        path = os.path.join(
+            self._directory,
+            f"{self._prefix}-{block_height}-v{state_version}-c{version}"
+            f"{SNAPSHOT_SUFFIX}",
+        )
+        temporary_path = f"{path}.tmp"
+
+        with gzip.open(temporary_path, "wt", encoding="utf-8") as file:
+            for item in items:
+                file.write(json.dumps(item, default=encode_value) + "\n")
+
+        os.replace(temporary_path, path)
+
+        self._prune()
+
+        return Snapshot(
+            path=path,
+            block_height=block_height,
+            state_version=state_version,
+            version=version,
+        )
+
+    @staticmethod
+    def load(snapshot: Snapshot) -> Iterator[Dict[str, Any]]:
+        """
+        Yields:
+            Dict[str, Any]: the state items of the snapshot.
+        """
+
+        with gzip.open(snapshot.path, "rt", encoding="utf-8") as file:
+            for line in file:
+                yield json.loads(line, object_hook=json_util.object_hook)
+
+    def discard_after(self, block_height: int) -> None:
+        """
+        Deletes the snapshots of blocks after `block_height`, e.g. the ones
+        taken of a state that is being rebuilt.
+        """
+
+        for snapshot in self.get_snapshots():
+            if snapshot.block_height > block_height:
+                os.remove(snapshot.path)
+
+    def _prune(self) -> None:
+        for snapshot in self.get_snapshots()[: -self._retention]:
+            os.remove(snapshot.path)
+
+
+def get_snapshot_store(prefix: str) -> Optional[SnapshotStore]:
+    """
+    Args:
+        prefix (str): the collection prefix of the transformer.
+
+    Returns:
+        Optional[SnapshotStore]: the snapshots in the directory of the
+        SNAPSHOT_DIR environment variable. None if it is not set, in which case
+        no snapshots are taken.
+    """
+
+    directory = os.getenv("SNAPSHOT_DIR")
+    if not directory:
+        return None
+
+    return SnapshotStore(directory, prefix)
@@ -2,30 +2,64 @@
 An indexer transformer for RKL Kong Holders
 """
 import logging
+from typing import Any, Dict, List, Optional, Set
 
-from db import DB
-from transform.covalent import Covalent
+from db import get_db
+from interfaces.idb import IDB
+from interfaces.itransformer import ITransformer
+from transform.dispatch import EventDispatcher
 
+# * all of the parameters of an ERC721 transfer are indexed
+TRANSFER_EVENT = (
+    "Transfer(address indexed from, address indexed to, uint256 indexed value)"
+)
+# mints are transfers from the zero address
+ZERO_ADDRESS = "0x0000000000000000000000000000000000000000"
 
-# todo: needs to inherit an interface that implements flush
-# todo: every instance should also take the address it transforms
-# todo: as a constructor argument
-class Transformer:
-    """RKL Kong Holder Transformer Implementation"""
+# layout of the state items, snapshots of other versions are not restored
+STATE_VERSION = 1
 
-    def __init__(self, address: str, network_id: int):
+
+class Transformer(ITransformer):
+    """
+    RKL Kong Holder Transformer Implementation
+
+    The state is one item per holder, `{"_id": address, "kongs": [ids]}`. It
+    is loaded into memory once, and `flush` only writes the holders whose
+    kongs changed since the last flush.
+    """
+
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(
+        self,
+        address: str,
+        network_id: int,
+        db: Optional[IDB] = None,
+        collection_name: Optional[str] = None,
+    ):
 
         self._address = address
         self._network_id = network_id
 
-        self._transformed = {"_id": 1}
+        # holder address -> ids of the kongs it holds
+        self._transformed: Dict[str, List[int]] = {}
+        # holders whose kongs changed since the last flush
+        self._changed: Set[str] = set()
 
         self._db_name = "ethereum-indexer"
-        self._collection_name = f"{self._address}-{self._network_id}-state"
+        self._collection_name = (
+            f"{self._address}-{self._network_id}-state"
+            if collection_name is None
+            else collection_name
+        )
+
+        self._db = get_db() if db is None else db
 
-        self._flush_state = False
+        self._dispatcher = EventDispatcher()
+        self._dispatcher.register(self._address, TRANSFER_EVENT, self._on_transfer)
 
-        self._db = DB()
+        self._load_state()
 
     # todo: type that returns transformed transaction
     # todo: documentation
@@ -36,84 +70,81 @@ class Transformer:
             txn (_type_): _description_
         """
 
-        # 1. check if there is state in the db
-        # 2. if there is state in the db, update memory with it
-        self.update_memory_state()
-
         # routes and performs any additional logic
         logging.info(f'Handling transaction at: {txn["block_height"]} block')
 
-        log_events = txn["log_events"]
-        # * ensures that events are supplied in the correct order
-        log_events = sorted(log_events, key=lambda x: x["log_offset"])
-
-        for event in log_events:
+        self._dispatcher.dispatch(txn)
 
-            # * means the event was emitted by a contract that is
-            # * not of interest
-            if event["sender_address"] != self._address.lower():
-                continue
-
-            # todo: this is not good.
-            # todo: if this were to happen in an event that pertains to
-            # todo: our address, it would corrupt the state
-            if event["decoded"] is None:
-                logging.warning(f"No name for event: {event}")
-                continue
+    def prefetch(self, txns: List[Any]) -> None:
+        """
+        Decodes the transfers of the batch at once.
+        """
 
-            if event["decoded"]["name"] == "Transfer":
-                decoded_params = Covalent.decode(event)
-                if event["decoded"]["name"] == "Transfer":
-                    from_, _to, value = (
-                        decoded_params[0],
-                        decoded_params[1],
-                        decoded_params[2],
-                    )
-                    self._on_transfer(from_, _to, value)
+        self._dispatcher.prepare(txns)
 
-            logging.info(event)
+    def _load_state(self) -> None:
+        """
+        Reads all of the holders into memory. The transform host completes its
+        last commit before it instantiates the transformer, so this is the
+        state as of the transform block height.
+
+        The state used to be a single item with _id: 1, that maps every holder
+        to its kongs. It is converted into an item per holder, which the next
+        flush writes, and is itself left without kongs. That happens in the
+        commit of the next block height, so an interrupted conversion is done
+        again from the start.
+        """
 
-        self._flush_state = True
+        for item in self._db.iter_items(self._db_name, self._collection_name):
+            if "kongs" in item:
+                if len(item["kongs"]) > 0:
+                    self._transformed[item["_id"]] = item["kongs"]
+                continue
 
-    # todo: should be part of the interface
-    # todo: acts as the means to sync with db state
-    def update_memory_state(self) -> None:
-        """_summary_"""
+            logging.info(f"Converting the state item {item['_id']} into holders")
 
-        state = self._db.get_any_item(self._db_name, self._collection_name)
+            for holder, kongs in item.items():
+                if holder != "_id" and len(kongs) > 0:
+                    self._transformed[holder] = list(kongs)
+                    self._changed.add(holder)
 
-        if state is None:
-            return
+            self._changed.add(item["_id"])
 
-        self._transformed = state
+        logging.info(f"Loaded {len(self._transformed)} kong holders")
 
-    # todo: should be part of the interface
     def flush(self) -> None:
-        """_summary_"""
+        """
+        Writes the holders whose kongs changed. Each one is a small item, so
+        the writes are in proportion to the transfers, not to the holders.
+        """
+
+        for holder in self._changed:
+            # * a copy, the buffer owns the items that it is handed
+            kongs = list(self._transformed.get(holder, []))
+            self._db.put_item(
+                {"_id": holder, "kongs": kongs}, self._db_name, self._collection_name
+            )
 
-        if self._flush_state:
-            # * write to the db
-            self._db.put_item(self._transformed, self._db_name, self._collection_name)
-            self._flush_state = False
+        self._changed = set()
 
-    def _on_transfer(self, from_, to_, value_) -> None:
+    def _on_transfer(self, _txn, from_: str, to: str, value: int) -> None:
         # Transfer(indexed address from, indexed address to, uint256 value)
 
-        # todo: make this a constant somewhere
-        if from_ != "0x0000000000000000000000000000000000000000":
+        if from_ != ZERO_ADDRESS:
             prev = self._transformed[from_]
-            prev.remove(value_)
+            prev.remove(value)
 
+            # * its item stays, with no kongs, so that the db sees the change
             if len(prev) == 0:
                 del self._transformed[from_]
-            else:
-                self._transformed[from_] = prev
 
-        if to_ in self._transformed:
-            self._transformed[to_].append(value_)
-        else:
-            self._transformed[to_] = [value_]
+            self._changed.add(from_)
+
+        kongs = self._transformed.setdefault(to, [])
+        if value not in kongs:
+            kongs.append(value)
+
+        self._changed.add(to)
 
 
 # todo: do not save empty lists
-# todo: block height state is incorrect
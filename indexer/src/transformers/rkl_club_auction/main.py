@@ -3,60 +3,64 @@ An indexer transformer for RKL Club Auctions
 """
 from datetime import datetime
 import logging
+from typing import Any, Dict, List, Optional, Set
 
-from eth_abi import decode_single
-from db import DB
+from db import get_db
+from interfaces.idb import IDB
+from interfaces.itransformer import ITransformer
+from transform.dispatch import EventDispatcher
 
 # ! this code is taken from: https://github.com/rumble-kong-league/club-nft-auction
 # ! they should be exactly the same
 
-PLACE_BID_EVENT = "0xe694ab314354b7ccad603c48b44dce6ade8b6a57cbebaa8842edd9a2fb2856f8"
+PLACE_BID_EVENT = "PlaceBid(address indexed bidder, uint256 indexed price)"
 
+# layout of the state items, snapshots of other versions are not restored
+STATE_VERSION = 1
 
-# todo: needs to inherit an interface that implements flush
-# todo: every instance should also take the address it transforms
-# todo: as a constructor argument
-class Transformer:
-    """RKL Club Auction Transformer Implementation"""
 
-    def __init__(self, address: str, network_id: int):
+class Transformer(ITransformer):
+    """
+    RKL Club Auction Transformer Implementation
+
+    The state is one item per bidder, `{"_id": bidder, "bids": [...]}`. The
+    bidders are kept in memory once they are looked up, and `prefetch` looks
+    up all of the new bidders of a batch in one query.
+    """
+
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(
+        self,
+        address: str,
+        network_id: int,
+        db: Optional[IDB] = None,
+        collection_name: Optional[str] = None,
+    ):
 
         self._address = address
         self._network_id = network_id
 
-        self._transformed = []
+        # bidder -> its item, for every bidder looked up so far
+        self._transformed: Dict[str, Dict[str, Any]] = {}
+        # bidders that placed bids since the last flush
+        self._changed: Set[str] = set()
 
         self._db_name = "ethereum-indexer"
         # todo: will run into problems when you have same addresses across networks
         # todo: should be named taking into account network id
-        self._collection_name = f"{self._address}-{self._network_id}-state"
+        self._collection_name = (
+            f"{self._address}-{self._network_id}-state"
+            if collection_name is None
+            else collection_name
+        )
 
-        self._flush_state = False
-
-        self._db = DB()
-
-    # todo: this should be in utils somewhere
-    @staticmethod
-    def hexstring_to_bytes(hexstring: str) -> bytes:
-        """
-        Casts the hexstring to bytes.
-
-        Args:
-            hexstring (str): hexstring to conver to bytes
-
-        Raises:
-            ValueError: if hexstring does not start with 0x
-
-        Returns:
-            bytes: bytes value of the hexstring
-        """
-        if not hexstring.startswith("0x"):
-            raise ValueError("Not a hexstring")
+        self._db = get_db() if db is None else db
 
-        return bytes.fromhex(hexstring[2:])
+        self._dispatcher = EventDispatcher()
+        self._dispatcher.register(self._address, PLACE_BID_EVENT, self._on_place_bid)
 
     # todo: txn dataclass
-    # todo: documentation
     def entrypoint(self, txn):
         """
         Main entrypoint for transforming the raw data. Responsible
@@ -66,81 +70,70 @@ class Transformer:
             txn (_type_): _description_
         """
 
-        # logging.info(txn)
-
         # routes and performs any additional logic
         logging.info(f'Handling transaction at: {txn["block_height"]} block')
 
-        log_events = txn["log_events"]
-        # * ensures that events are supplied in the correct order
-        log_events = sorted(log_events, key=lambda x: x["log_offset"])
+        self._dispatcher.dispatch(txn)
 
-        for event in log_events:
+    def prefetch(self, txns: List[Any]) -> None:
+        """
+        Decodes the events of the batch, and looks up the bidders that are not
+        in memory yet, with a single query.
+        """
 
-            # * means the event was emitted by a contract that is
-            # * not of interest
-            if event["sender_address"] != self._address.lower():
-                continue
+        self._dispatcher.prepare(txns)
 
-            if event["raw_log_topics"][0] != PLACE_BID_EVENT:
-                continue
+        bidders = set()
+        for txn in txns:
+            for event in txn["log_events"]:
+                # * PlaceBid is the only event with a handler
+                decoded = self._dispatcher.decode(event)
+                if decoded is not None:
+                    bidders.add(decoded[1]["bidder"].lower())
 
-            bidder = decode_single(
-                "address", self.hexstring_to_bytes(event["raw_log_topics"][1])
-            )
-            # * since the price is always ether, diving by 1e18 here
-            price = decode_single(
-                "uint256", self.hexstring_to_bytes(event["raw_log_topics"][2])
-            )
-            price /= 1e18
+        missing = [bidder for bidder in bidders if bidder not in self._transformed]
 
-            timestamp = int(
-                datetime.strptime(
-                    txn["block_signed_at"], "%Y-%m-%dT%H:%M:%SZ"
-                ).timestamp()
-            )
-            self._on_place_bid(bidder, price, timestamp)
+        if len(missing) == 0:
+            return
 
-            logging.info(event)
+        items = self._db.get_items(missing, self._db_name, self._collection_name)
+        for bidder, item in zip(missing, items):
+            self._transformed[bidder] = item or {"_id": bidder, "bids": []}
 
-        self._flush_state = True
+    def _get_bidder(self, bidder: str) -> Dict[str, Any]:
+        if bidder not in self._transformed:
+            # * not prefetched, e.g. when the transformer is used on its own
+            item = self._db.get_item(bidder, self._db_name, self._collection_name)
+            self._transformed[bidder] = item or {"_id": bidder, "bids": []}
 
-    def _on_place_bid(self, bidder: str, price: float, timestamp: int) -> None:
+        return self._transformed[bidder]
+
+    def _on_place_bid(self, txn: Any, bidder: str, price: int) -> None:
         # PlaceBid(address indexed bidder, uint256 indexed price)
 
-        item = self._db.get_item(bidder.lower(), self._db_name, self._collection_name)
-
-        if item is None:
-            # * could be that the item is in self._transformed
-            pop_ix = None
-            for ix, t in enumerate(self._transformed):
-                if t["_id"] == bidder.lower():
-                    pop_ix = ix
-                    break
-
-            if pop_ix is not None:
-                item = self._transformed.pop(pop_ix)
-                item["bids"].append({"amount": price, "timestamp": timestamp})
-                self._transformed.append(item)
-            else:
-                self._transformed.append(
-                    {
-                        "_id": bidder.lower(),
-                        "bids": [{"amount": price, "timestamp": timestamp}],
-                    }
-                )
-        else:
-            item["bids"].append({"amount": price, "timestamp": timestamp})
-            self._transformed.append(item)
-
-    # todo: should be part of the interface
+        bidder = bidder.lower()
+        timestamp = int(
+            datetime.strptime(txn["block_signed_at"], "%Y-%m-%dT%H:%M:%SZ").timestamp()
+        )
+
+        # * since the price is always ether, diving by 1e18 here
+        self._get_bidder(bidder)["bids"].append(
+            {"amount": price / 1e18, "timestamp": timestamp}
+        )
+        self._changed.add(bidder)
+
     def flush(self) -> None:
         """
-        Write the transformed state to the db.
+        Write the bidders that placed bids since the last flush to the db.
         """
 
-        if self._flush_state:
-            for item in self._transformed:
-                self._db.put_item(item, self._db_name, self._collection_name)
-            self._transformed = []
-            self._flush_state = False
+        for bidder in self._changed:
+            item = self._transformed[bidder]
+            # * a copy, the buffer owns the items that it is handed
+            self._db.put_item(
+                {"_id": bidder, "bids": list(item["bids"])},
+                self._db_name,
+                self._collection_name,
+            )
+
+        self._changed = set()
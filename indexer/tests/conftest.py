@@ -0,0 +1,65 @@
+"""
+Fixtures that stand in for the services the extractors talk to
+"""
+import threading
+from typing import Callable, Iterator, List
+
+import pytest
+
+from benchmarks.covalent_server import CovalentServer, synthetic_transactions
+from benchmarks.node_server import NodeServer
+from extract.governor import RateGovernor
+
+ADDRESS = "0x" + "ab" * 20
+# the first block of the synthetic transactions
+START_BLOCK = 12_000_000
+
+
+@pytest.fixture
+def covalent_server(monkeypatch) -> Iterator[CovalentServer]:
+    """The covalent stand-in, on a free port, that the clients are pointed at"""
+
+    # * three transactions per block, i.e. blocks 12_000_000 - 12_000_009
+    server = CovalentServer(0, synthetic_transactions(30, ADDRESS, START_BLOCK))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    monkeypatch.setenv("COVALENT_API_URI", server.get_uri())
+
+    yield server
+
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def make_node_server() -> Iterator[Callable[..., NodeServer]]:
+    """
+    Starts JSON-RPC stand-ins, on free ports, over the same transactions as the
+    covalent one. Keyword arguments are passed on to `NodeServer`.
+    """
+
+    servers: List[NodeServer] = []
+
+    def make(**kwargs) -> NodeServer:
+        server = NodeServer(
+            0, synthetic_transactions(30, ADDRESS, START_BLOCK), **kwargs
+        )
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield make
+
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def governor(tmp_path) -> RateGovernor:
+    """A governor that does not throttle, with a state file of its own"""
+
+    return RateGovernor(
+        ["test"], rate=1000.0, burst=1000.0, state_path=str(tmp_path / "governor.json")
+    )
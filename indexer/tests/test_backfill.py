@@ -0,0 +1,221 @@
+"""
+The sharded backfill plans aligned shards, resumes them from their checkpoints,
+and sets the block height once they are all complete
+"""
+from typing import List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from benchmarks.memory_db import MemoryDB
+from config import Config
+from extract import backfill
+from extract.backfill import (
+    BLOCKS_PER_REQUEST,
+    PLAN_ID,
+    ShardedBackfill,
+    get_shard_checkpoint_id,
+    plan_shards,
+)
+from extract.cache import ResponseCache
+from extract.covalent import CONFIRMATIONS, Covalent
+
+DB_NAME = "ethereum-indexer"
+# the address and first block of the stand-in's transactions
+ADDRESS = "0x" + "ab" * 20
+START_BLOCK = 12_000_000
+TRANSACTIONS = f"{ADDRESS}-1"
+CHECKPOINTS = f"{ADDRESS}-1-block-height"
+
+
+def _make_backfill(
+    db: MemoryDB,
+    governor,
+    deploy_block: int = START_BLOCK,
+    cache: Optional[ResponseCache] = None,
+):
+    config = Config(
+        ADDRESS, "test.log", "example_rumble_kong_league", 1, deploy_block=deploy_block
+    )
+    return ShardedBackfill(
+        config, db=db, covalent=Covalent(1, cache=cache, governor=governor)
+    )
+
+
+def _get_requested_windows(paths: List[str]) -> List[Tuple[int, int]]:
+    """
+    Returns:
+        List[Tuple[int, int]]: the block ranges of the log events requests.
+    """
+
+    windows = []
+    for path in paths:
+        query = parse_qs(urlparse(path).query)
+        if "starting-block" in query:
+            windows.append(
+                (int(query["starting-block"][0]), int(query["ending-block"][0]))
+            )
+
+    return windows
+
+
+def test_shards_are_aligned_to_the_request_windows():
+    """Only the first shard starts, and only the last one ends, mid-window"""
+
+    starting_block = BLOCKS_PER_REQUEST + 50_000
+    ending_block = 10 * BLOCKS_PER_REQUEST + 49_999
+
+    # * 10 windows, in shards of 3 windows
+    shards = plan_shards(starting_block, ending_block, 4)
+
+    assert shards == [
+        (starting_block, 4 * BLOCKS_PER_REQUEST - 1),
+        (4 * BLOCKS_PER_REQUEST, 7 * BLOCKS_PER_REQUEST - 1),
+        (7 * BLOCKS_PER_REQUEST, 10 * BLOCKS_PER_REQUEST - 1),
+        (10 * BLOCKS_PER_REQUEST, ending_block),
+    ]
+
+    for (_, end), (start, _) in zip(shards, shards[1:]):
+        assert start == end + 1
+        assert start % BLOCKS_PER_REQUEST == 0
+
+
+def test_last_shard_is_partial():
+    """There are fewer shards than asked for when there are fewer windows"""
+
+    assert plan_shards(0, BLOCKS_PER_REQUEST + 5, 8) == [
+        (0, BLOCKS_PER_REQUEST - 1),
+        (BLOCKS_PER_REQUEST, BLOCKS_PER_REQUEST + 5),
+    ]
+    assert plan_shards(7, 9, 4) == [(7, 9)]
+    assert not plan_shards(10, 9, 4)
+
+
+def test_shard_resumes_from_its_checkpoint(covalent_server, governor, monkeypatch):
+    """The windows up to the checkpoint are not requested again"""
+
+    # * windows of 4 blocks, over the 10 blocks of transactions
+    monkeypatch.setattr(backfill, "BLOCKS_PER_REQUEST", 4)
+
+    db = MemoryDB()
+    checkpoint_id = get_shard_checkpoint_id(START_BLOCK, START_BLOCK + 9)
+    db.put_item(
+        {"_id": checkpoint_id, "block_height": START_BLOCK + 3}, DB_NAME, CHECKPOINTS
+    )
+
+    _make_backfill(db, governor).extract_shard(START_BLOCK, START_BLOCK + 9)
+
+    assert _get_requested_windows(covalent_server.requests) == [
+        (START_BLOCK + 4, START_BLOCK + 7),
+        (START_BLOCK + 8, START_BLOCK + 9),
+    ]
+    assert sorted(
+        {txn["block_height"] for txn in db.get_all_items(DB_NAME, TRANSACTIONS)}
+    ) == list(range(START_BLOCK + 4, START_BLOCK + 10))
+    assert (
+        db.get_item(checkpoint_id, DB_NAME, CHECKPOINTS)["block_height"]
+        == START_BLOCK + 9
+    )
+
+
+def test_merge_sets_the_block_height(governor):
+    """The block height is only set once every shard is complete"""
+
+    db = MemoryDB()
+    sharded_backfill = _make_backfill(db, governor)
+    plan = {"_id": PLAN_ID, "head": 250, "shards": [(0, 99), (100, 250)]}
+
+    db.put_item(
+        {"_id": get_shard_checkpoint_id(0, 99), "block_height": 99},
+        DB_NAME,
+        CHECKPOINTS,
+    )
+    db.put_item(
+        {"_id": get_shard_checkpoint_id(100, 250), "block_height": 199},
+        DB_NAME,
+        CHECKPOINTS,
+    )
+
+    # pylint: disable=protected-access
+    with pytest.raises(RuntimeError):
+        sharded_backfill._merge(plan)
+    assert db.get_item(1, DB_NAME, CHECKPOINTS) is None
+
+    db.put_item(
+        {"_id": get_shard_checkpoint_id(100, 250), "block_height": 250},
+        DB_NAME,
+        CHECKPOINTS,
+    )
+    sharded_backfill._merge(plan)
+
+    assert db.get_item(1, DB_NAME, CHECKPOINTS) == {"_id": 1, "block_height": 250}
+
+
+def test_backfill_extracts_up_to_the_confirmed_head(covalent_server, governor):
+    """A single worker extracts the shards in process"""
+
+    covalent_server.head = START_BLOCK + 5 + CONFIRMATIONS
+    db = MemoryDB()
+    sharded_backfill = _make_backfill(db, governor)
+
+    assert sharded_backfill.is_required()
+    sharded_backfill()
+
+    # * the extractor picks up the blocks after the confirmed head
+    assert {
+        txn["block_height"] for txn in db.get_all_items(DB_NAME, TRANSACTIONS)
+    } == set(range(START_BLOCK, START_BLOCK + 6))
+    assert db.get_item(1, DB_NAME, CHECKPOINTS)["block_height"] == START_BLOCK + 5
+    assert not sharded_backfill.is_required()
+
+
+def test_reindex_is_served_from_the_cache(covalent_server, governor, tmp_path):
+    """A second backfill into an empty db only asks for the latest block"""
+
+    covalent_server.head = START_BLOCK + 9 + CONFIRMATIONS
+    cache = ResponseCache(str(tmp_path / "cache"))
+
+    first = MemoryDB()
+    _make_backfill(first, governor, cache=cache)()
+    assert _get_requested_windows(covalent_server.requests) == [
+        (START_BLOCK, START_BLOCK + 9)
+    ]
+
+    covalent_server.requests.clear()
+    second = MemoryDB()
+    _make_backfill(second, governor, cache=cache)()
+
+    assert len(covalent_server.requests) == 1
+    assert "block_v2/latest" in covalent_server.requests[0]
+    assert second.get_all_items(DB_NAME, TRANSACTIONS) == first.get_all_items(
+        DB_NAME, TRANSACTIONS
+    )
+
+
+def test_unconfirmed_windows_are_not_cached(covalent_server, governor, tmp_path):
+    """The blocks near the head can still be reorged"""
+
+    covalent = Covalent(
+        1, cache=ResponseCache(str(tmp_path / "cache")), governor=governor
+    )
+    ending_block = START_BLOCK + 9
+
+    for _ in range(2):
+        covalent.request_log_events(
+            ADDRESS, START_BLOCK, ending_block, 0, ending_block + CONFIRMATIONS - 1
+        )
+    assert len(covalent_server.requests) == 2
+
+    for _ in range(2):
+        covalent.request_log_events(
+            ADDRESS, START_BLOCK, ending_block, 0, ending_block + CONFIRMATIONS
+        )
+    assert len(covalent_server.requests) == 3
+
+
+def test_backfill_needs_a_deploy_block(governor):
+    """From block 0, the extractor's walk over the history is cheaper"""
+
+    assert not _make_backfill(MemoryDB(), governor, deploy_block=0).is_required()
+    assert Config.example_rumble_kong_league().get_deploy_block() > 0
+    assert Config.rkl_club_auction_kovan().get_deploy_block() > 0
@@ -0,0 +1,131 @@
+"""
+The write-behind buffer commits its writes together with the checkpoint, and
+completes a commit that was interrupted
+"""
+from typing import Any, Dict, List, Optional, Tuple
+
+import pytest
+
+from benchmarks.memory_db import MemoryDB
+from transform.buffer import REDO_LOG_CHUNKS_FIELD, REDO_LOG_FIELD, WriteBehindBuffer
+
+DB_NAME = "ethereum-indexer"
+STATE = "state"
+CHECKPOINT = "block-height-state"
+
+
+class CrashedError(Exception):
+    """Stands in for the process dying"""
+
+
+class NoTransactionsDB(MemoryDB):
+    """A db without transactions, e.g. a standalone mongod"""
+
+    def put_items_atomic(
+        self,
+        writes: List[Tuple[str, str, List[Any]]],
+        write_concern: Optional[Dict] = None,
+    ) -> bool:
+        return False
+
+
+class CrashingDB(NoTransactionsDB):
+    """Crashes on the first write of the state, i.e. right after the redo log"""
+
+    # pylint: disable=too-many-arguments
+    def put_items_bulk(
+        self,
+        items: List[Any],
+        database_name: str,
+        collection_name: str,
+        batch_size: int = 1000,
+        write_concern: Optional[Dict] = None,
+        overwrite: bool = False,
+    ) -> Dict[str, int]:
+        if collection_name == STATE:
+            raise CrashedError()
+
+        return super().put_items_bulk(
+            items, database_name, collection_name, batch_size, write_concern, overwrite
+        )
+
+
+def _crash_in_flush(redo_log_max_bytes: int) -> MemoryDB:
+    """
+    Returns:
+        MemoryDB: the db as the crash left it, with the second commit logged,
+        but not applied.
+    """
+
+    db = NoTransactionsDB()
+    buffer = WriteBehindBuffer(db, redo_log_max_bytes=redo_log_max_bytes)
+
+    buffer.put_item({"_id": "a", "kongs": [1]}, DB_NAME, STATE)
+    buffer.flush({"_id": 1, "block_height": 1}, DB_NAME, CHECKPOINT)
+
+    db.__class__ = CrashingDB
+    for holder in ("a", "b", "c"):
+        buffer.put_item({"_id": holder, "kongs": [2, 3]}, DB_NAME, STATE)
+
+    with pytest.raises(CrashedError):
+        buffer.flush({"_id": 1, "block_height": 2}, DB_NAME, CHECKPOINT)
+
+    db.__class__ = NoTransactionsDB
+    return db
+
+
+@pytest.mark.parametrize("redo_log_max_bytes", [1 << 20, 1])
+def test_recover_applies_the_redo_log_of_an_interrupted_flush(redo_log_max_bytes):
+    """With the redo log in the checkpoint, and in a chunk per item"""
+
+    db = _crash_in_flush(redo_log_max_bytes)
+
+    logged = db.get_item(1, DB_NAME, CHECKPOINT)
+    assert logged["block_height"] == 2
+    assert db.get_item("a", DB_NAME, STATE) == {"_id": "a", "kongs": [1]}
+
+    if redo_log_max_bytes == 1:
+        assert logged[REDO_LOG_CHUNKS_FIELD] == 3
+
+    checkpoint = WriteBehindBuffer(db).recover(1, DB_NAME, CHECKPOINT)
+
+    assert checkpoint == {"_id": 1, "block_height": 2}
+    assert db.get_item(1, DB_NAME, CHECKPOINT) == checkpoint
+    assert sorted(
+        (item["_id"], item["kongs"]) for item in db.get_all_items(DB_NAME, STATE)
+    ) == [("a", [2, 3]), ("b", [2, 3]), ("c", [2, 3])]
+
+    # * the applied chunks do not keep a copy of the items
+    for item in db.get_all_items(DB_NAME, CHECKPOINT):
+        if item["_id"] != 1:
+            assert item[REDO_LOG_FIELD] == []
+
+
+def test_recover_leaves_a_complete_checkpoint_as_it_is():
+    """There is nothing to replay after a flush that was not interrupted"""
+
+    db = NoTransactionsDB()
+    buffer = WriteBehindBuffer(db)
+
+    assert buffer.recover(1, DB_NAME, CHECKPOINT) is None
+
+    buffer.put_item({"_id": "a", "kongs": [1]}, DB_NAME, STATE)
+    buffer.flush({"_id": 1, "block_height": 1}, DB_NAME, CHECKPOINT)
+
+    assert buffer.recover(1, DB_NAME, CHECKPOINT) == {"_id": 1, "block_height": 1}
+
+
+def test_queries_raise_while_writes_are_pending():
+    """Pending writes only reach the db together with their checkpoint"""
+
+    db = NoTransactionsDB()
+    buffer = WriteBehindBuffer(db)
+
+    buffer.put_item({"_id": "a", "kongs": [1]}, DB_NAME, STATE)
+
+    with pytest.raises(RuntimeError):
+        buffer.get_all_items(DB_NAME, STATE)
+    assert db.get_item("a", DB_NAME, STATE) is None
+
+    buffer.flush({"_id": 1, "block_height": 1}, DB_NAME, CHECKPOINT)
+    assert buffer.get_all_items(DB_NAME, STATE) == [{"_id": "a", "kongs": [1]}]
@@ -0,0 +1,208 @@
+"""
+The column-wise batch decoding of log events matches `eth_abi`, event by event
+"""
+from typing import Any, Dict, List
+
+import pytest
+from eth_abi import decode_abi, decode_single, encode_abi, encode_single
+from eth_abi.exceptions import DecodingError
+
+from transform.decode import (
+    BatchDecoder,
+    get_topic,
+    parse_signature,
+    strip_hex_prefix,
+)
+
+UINT64_MAX = 2**64 - 1
+INT64_MIN = -(2**63)
+
+
+def _encode_event(signature: str, values: List[Any]) -> Dict:
+    """
+    Returns:
+        Dict: a raw log event, as the extractors store it, that emits the
+        values for the parameters of the signature.
+    """
+
+    name, params = parse_signature(signature)
+
+    topics = [get_topic(name, params)]
+    data_types, data_values = [], []
+
+    for (param_type, indexed, _), value in zip(params, values):
+        if indexed:
+            topics.append("0x" + encode_single(param_type, value).hex())
+        else:
+            data_types.append(param_type)
+            data_values.append(value)
+
+    return {
+        "raw_log_topics": topics,
+        "raw_log_data": "0x" + encode_abi(data_types, data_values).hex()
+        if data_types
+        else None,
+    }
+
+
+def _decode_events(signature: str, rows: List[List[Any]]) -> Dict[str, List[Any]]:
+    decoder = BatchDecoder(signature)
+    events = [_encode_event(signature, row) for row in rows]
+
+    assert all(decoder.accepts(event) for event in events)
+
+    # * what the dispatcher hands over to the handlers
+    return {name: column.tolist() for name, column in decoder.decode(events).items()}
+
+
+def _expected(signature: str, rows: List[List[Any]]) -> Dict[str, List[Any]]:
+    """
+    Returns:
+        Dict[str, List[Any]]: the values that `eth_abi` decodes, one event and
+        one parameter at a time.
+    """
+
+    _, params = parse_signature(signature)
+    columns: Dict[str, List[Any]] = {arg_name: [] for _, _, arg_name in params}
+
+    for row in rows:
+        event = _encode_event(signature, row)
+        topics = iter(event["raw_log_topics"][1:])
+        data_types = [param_type for param_type, indexed, _ in params if not indexed]
+        data = iter(
+            decode_abi(
+                data_types,
+                bytes.fromhex(strip_hex_prefix(event["raw_log_data"] or "0x")),
+            )
+            if data_types
+            else []
+        )
+
+        for param_type, indexed, arg_name in params:
+            if indexed:
+                columns[arg_name].append(
+                    decode_single(param_type, bytes.fromhex(next(topics)[2:]))
+                )
+            else:
+                columns[arg_name].append(next(data))
+
+    return columns
+
+
+@pytest.mark.parametrize(
+    "signature, rows",
+    [
+        (
+            "Transfer(address indexed from, address indexed to, uint256 indexed value)",
+            [
+                ["0x" + "00" * 20, "0x" + "ab" * 20, 1],
+                ["0x" + "ab" * 20, "0x" + "0f" * 20, 10_000],
+            ],
+        ),
+        (
+            "Transfer(address indexed from, address indexed to, uint256 value)",
+            [
+                ["0x" + "01" * 20, "0x" + "02" * 20, UINT64_MAX],
+                ["0x" + "03" * 20, "0x" + "04" * 20, 10**24],
+                ["0x" + "05" * 20, "0x" + "06" * 20, 2**256 - 1],
+            ],
+        ),
+        (
+            "Moved(int256 indexed delta, int24 tick, int128 liquidity, bool up)",
+            [
+                [-1, -(2**23), INT64_MIN, True],
+                [INT64_MIN, 2**23 - 1, -(2**64), False],
+                [-(2**255), 0, 2**127 - 1, True],
+            ],
+        ),
+        (
+            "Tagged(bytes32 indexed id, bytes4 selector, bytes1 flag, uint8 kind)",
+            [
+                [b"\x01" * 32, b"\xde\xad\xbe\xef", b"\x00", 0],
+                [b"\xff" * 32, b"\x00\x00\x00\x01", b"\x80", 255],
+            ],
+        ),
+        (
+            "Listed(address indexed seller, string name, uint256[] ids, bytes memo)",
+            [
+                ["0x" + "aa" * 20, "kong", [1, 2**200], b""],
+                ["0x" + "bb" * 20, "", [], b"\x00\x01" * 40],
+            ],
+        ),
+    ],
+)
+def test_batch_decoding_matches_eth_abi(signature: str, rows: List[List[Any]]):
+    """Every type of column decodes to what `eth_abi` decodes"""
+
+    assert _decode_events(signature, rows) == _expected(signature, rows)
+
+
+def test_columns_fit_numpy_dtypes_until_they_overflow():
+    """Integers stay in 64 bit columns, unless one of them is wider"""
+
+    signature = "Paid(uint256 amount, int256 change)"
+
+    narrow = BatchDecoder(signature).decode(
+        [_encode_event(signature, [UINT64_MAX, INT64_MIN])]
+    )
+    assert narrow["amount"].dtype.name == "uint64"
+    assert narrow["change"].dtype.name == "int64"
+
+    # * a single wide value turns the whole column into python ints
+    wide = _decode_events(signature, [[1, -1], [UINT64_MAX + 1, INT64_MIN - 1]])
+    assert wide == {"amount": [1, UINT64_MAX + 1], "change": [-1, INT64_MIN - 1]}
+
+
+def test_indexed_dynamic_types_are_decoded_as_their_hash():
+    """The topic of an indexed string is the hash of the string"""
+
+    signature = "Named(string indexed name)"
+    topic = "0x" + "12" * 32
+    event = {
+        "raw_log_topics": [get_topic(*parse_signature(signature)), topic],
+        "raw_log_data": None,
+    }
+
+    assert BatchDecoder(signature).decode([event])["name"].tolist() == [
+        bytes.fromhex(topic[2:])
+    ]
+
+
+def test_accepts_only_events_of_the_same_layout():
+    """ERC20 and ERC721 transfers share their topic0"""
+
+    erc721 = BatchDecoder(
+        "Transfer(address indexed from, address indexed to, uint256 indexed value)"
+    )
+    erc20 = BatchDecoder(
+        "Transfer(address indexed from, address indexed to, uint256 value)"
+    )
+
+    event = _encode_event(
+        "Transfer(address indexed from, address indexed to, uint256 value)",
+        ["0x" + "01" * 20, "0x" + "02" * 20, 1],
+    )
+
+    # * same topic0, but the value is in the data
+    assert erc20.accepts(event)
+    assert not erc721.accepts(event)
+
+    event["raw_log_data"] += "00" * 32
+    assert not erc20.accepts(event)
+
+
+@pytest.mark.parametrize("word", ["00" * 31 + "02", "01" + "00" * 30 + "01"])
+def test_bool_is_either_zero_or_one(word: str):
+    """Any other word is malformed, like `eth_abi` has it"""
+
+    signature = "Voted(bool indexed up)"
+    event = {
+        "raw_log_topics": [get_topic(*parse_signature(signature)), "0x" + word],
+        "raw_log_data": None,
+    }
+
+    with pytest.raises(ValueError):
+        BatchDecoder(signature).decode([event])
+
+    with pytest.raises(DecodingError):
+        decode_single("bool", bytes.fromhex(word))
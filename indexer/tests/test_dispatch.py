@@ -0,0 +1,74 @@
+"""
+A malformed log event is skipped, without stopping the rest of its batch
+"""
+from typing import Any, Dict, List, Optional
+
+import pytest
+from eth_abi import encode_abi
+
+from transform.decode import get_topic, parse_signature
+from transform.dispatch import EventDispatcher
+
+ADDRESS = "0x" + "ab" * 20
+SIGNATURE = "Bid(address indexed bidder, uint256 amount, bool won)"
+BIDDER = "0x" + "01" * 20
+
+
+def _make_event(
+    log_offset: int,
+    topics: Optional[List[str]] = None,
+    data: Optional[str] = None,
+) -> Dict[str, Any]:
+    topic = get_topic(*parse_signature(SIGNATURE))
+    bidder = "0x" + "00" * 12 + BIDDER[2:]
+
+    return {
+        "log_offset": log_offset,
+        "sender_address": ADDRESS,
+        "raw_log_topics": [topic, bidder] if topics is None else [topic, *topics],
+        "raw_log_data": "0x" + encode_abi(["uint256", "bool"], [log_offset, True]).hex()
+        if data is None
+        else data,
+    }
+
+
+@pytest.mark.parametrize("prepared", [True, False])
+def test_malformed_events_are_skipped(prepared: bool):
+    """Batch decoded, or decoded one at a time by `dispatch`"""
+
+    bids = []
+    dispatcher = EventDispatcher()
+    dispatcher.register(
+        ADDRESS, SIGNATURE, lambda txn, **args: bids.append((txn["_id"], args))
+    )
+
+    txns = [
+        {"_id": "a", "log_events": [_make_event(0), _make_event(1)]},
+        {
+            "_id": "b",
+            "log_events": [
+                # * a bool of 2
+                _make_event(2, data="0x" + "00" * 63 + "02"),
+                # * a topic that is not a word
+                _make_event(3, topics=["0x01"]),
+                # * one topic too many, and one too few
+                _make_event(4, topics=["0x" + "00" * 32, "0x" + "00" * 32]),
+                _make_event(5, topics=[]),
+                # * data that is too short
+                _make_event(6, data="0x" + "00" * 32),
+                _make_event(7),
+            ],
+        },
+    ]
+
+    if prepared:
+        dispatcher.prepare(txns)
+
+    for txn in txns:
+        dispatcher.dispatch(txn)
+
+    assert bids == [
+        ("a", {"bidder": BIDDER, "amount": 0, "won": True}),
+        ("a", {"bidder": BIDDER, "amount": 1, "won": True}),
+        ("b", {"bidder": BIDDER, "amount": 7, "won": True}),
+    ]
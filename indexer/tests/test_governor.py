@@ -0,0 +1,67 @@
+"""
+The rate governors of all of the processes on the host share their token
+buckets through the state file
+"""
+import time
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from benchmarks.covalent_server import Faults
+from extract.covalent import Covalent
+from extract.governor import RateGovernor
+from extract.session import PooledSession, RetriesExhaustedError
+
+
+@pytest.mark.parametrize("rate, burst", [(0.0, 5.0), (-1.0, 5.0), (5.0, 0.5)])
+def test_rate_and_burst_are_validated(rate: float, burst: float):
+    """A bucket that never refills, or never holds a token, would block forever"""
+
+    with pytest.raises(ValueError):
+        RateGovernor(["a"], rate=rate, burst=burst)
+
+
+def test_governors_share_the_token_bucket(tmp_path):
+    """The tokens that one process takes are gone for the others"""
+
+    state_path = str(tmp_path / "governor.json")
+    first = RateGovernor(["a"], rate=10.0, burst=2.0, state_path=state_path)
+    second = RateGovernor(["a"], rate=10.0, burst=2.0, state_path=state_path)
+
+    assert first.acquire() == "a"
+    assert first.acquire() == "a"
+    assert first.get_stats()["throttled"] == 0
+
+    # * the bucket is empty, and refills a token every 0.1s
+    start = time.monotonic()
+    assert second.acquire() == "a"
+
+    assert time.monotonic() - start >= 0.05
+    assert second.get_stats()["throttled"] == 1
+
+
+def test_rate_limited_key_is_held_back_for_every_process(covalent_server, tmp_path):
+    """A 429 on one key sends every process to the other key until Retry-After"""
+
+    covalent_server.faults = Faults(rate_429=1.0)
+    state_path = str(tmp_path / "governor.json")
+    first = RateGovernor(["a", "b"], rate=100.0, burst=100.0, state_path=state_path)
+    second = RateGovernor(["a", "b"], rate=100.0, burst=100.0, state_path=state_path)
+
+    covalent = Covalent(
+        1,
+        session=PooledSession(max_retries=0, backoff_base=0.0),
+        cache=None,
+        governor=first,
+    )
+
+    with pytest.raises(RetriesExhaustedError):
+        covalent.request_latest_block_height()
+    assert first.get_stats()["rate_limited"] == 1
+
+    # * the stand-in asks for a second, and the bucket of the key is drained
+    rate_limited = parse_qs(urlparse(covalent_server.requests[0]).query)["key"][0]
+    other = "b" if rate_limited == "a" else "a"
+
+    assert {second.acquire() for _ in range(10)} == {other}
+    assert second.get_stats()["throttled"] == 0
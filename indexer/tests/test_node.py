@@ -0,0 +1,116 @@
+"""
+The node extractor adapts its block window to what the node returns at once,
+and stays clear of the blocks that can still be reorged
+"""
+from typing import List
+
+import pytest
+
+from benchmarks.memory_db import MemoryDB
+from config import Config
+from extract import node
+from extract.jsonrpc import JsonRpc, JsonRpcError
+from extract.node import CONFIRMATIONS, NodeExtract
+
+DB_NAME = "ethereum-indexer"
+# the address and first block of the stand-in's transactions
+ADDRESS = "0x" + "ab" * 20
+START_BLOCK = 12_000_000
+TRANSACTIONS = f"{ADDRESS}-1"
+CHECKPOINTS = f"{ADDRESS}-1-block-height"
+
+
+def _make_extract(server, db: MemoryDB) -> NodeExtract:
+    config = Config(
+        ADDRESS, "test.log", "example_rumble_kong_league", 1, deploy_block=START_BLOCK
+    )
+    return NodeExtract(config, uri=server.get_uri(), db=db)
+
+
+def _get_window_sizes(server) -> List[int]:
+    return [
+        int(params[0]["toBlock"], 16) - int(params[0]["fromBlock"], 16) + 1
+        for method, params in server.calls
+        if method == "eth_getLogs"
+    ]
+
+
+def test_window_halves_while_the_node_refuses_it(make_node_server, monkeypatch):
+    """Three logs per block, and the node returns at most five at once"""
+
+    monkeypatch.setattr(node, "INITIAL_BLOCK_WINDOW", 8)
+    server = make_node_server(head=START_BLOCK + 9 + CONFIRMATIONS, max_logs=5)
+    db = MemoryDB()
+
+    _make_extract(server, db).extract()
+
+    window_sizes = _get_window_sizes(server)
+    assert window_sizes[:4] == [8, 4, 2, 1]
+    # * a single block fits, two do not
+    assert max(window_sizes[4:]) == 2
+
+    assert len(db.get_all_items(DB_NAME, TRANSACTIONS)) == 30
+    assert db.get_item(1, DB_NAME, CHECKPOINTS)["block_height"] == START_BLOCK + 9
+
+
+def test_window_grows_while_the_logs_are_sparse(make_node_server, monkeypatch):
+    """The window doubles after every window with few logs"""
+
+    monkeypatch.setattr(node, "INITIAL_BLOCK_WINDOW", 1)
+    monkeypatch.setattr(node, "MAX_BLOCK_WINDOW", 16)
+    server = make_node_server(head=START_BLOCK + 99 + CONFIRMATIONS)
+
+    _make_extract(server, MemoryDB()).extract()
+
+    # * 100 blocks, the last window is what is left of them
+    assert _get_window_sizes(server) == [1, 2, 4, 8, 16, 16, 16, 16, 16, 5]
+
+
+def test_blocks_near_the_head_are_not_extracted(make_node_server):
+    """Only the blocks that are `CONFIRMATIONS` behind the head are extracted"""
+
+    server = make_node_server(head=START_BLOCK + 2 + CONFIRMATIONS)
+    db = MemoryDB()
+    extract = _make_extract(server, db)
+
+    extract.extract()
+
+    assert db.get_item(1, DB_NAME, CHECKPOINTS)["block_height"] == START_BLOCK + 2
+    assert {txn["block_height"] for txn in db.get_all_items(DB_NAME, TRANSACTIONS)} == {
+        START_BLOCK,
+        START_BLOCK + 1,
+        START_BLOCK + 2,
+    }
+
+    server.head = START_BLOCK + 9 + CONFIRMATIONS
+    extract.extract()
+
+    assert db.get_item(1, DB_NAME, CHECKPOINTS)["block_height"] == START_BLOCK + 9
+    assert len(db.get_all_items(DB_NAME, TRANSACTIONS)) == 30
+
+
+def test_other_errors_are_not_retried_with_a_smaller_window(make_node_server):
+    """e.g. a node that does not serve `eth_getLogs` at all"""
+
+    server = make_node_server(
+        head=START_BLOCK + 9 + CONFIRMATIONS,
+        error={"code": -32601, "message": "the method eth_getLogs does not exist"},
+    )
+    db = MemoryDB()
+
+    # * the extractor logs the error, and tries again on its next run
+    _make_extract(server, db).extract()
+
+    assert len(_get_window_sizes(server)) == 1
+    assert db.get_item(1, DB_NAME, CHECKPOINTS) is None
+
+
+def test_rejected_batch_raises_a_json_rpc_error(make_node_server):
+    """The node answers a batch that it rejects with a single error object"""
+
+    server = make_node_server(reject_batches=True)
+
+    with pytest.raises(JsonRpcError) as e:
+        JsonRpc(server.get_uri()).get_block_timestamps([START_BLOCK, START_BLOCK + 1])
+
+    assert e.value.code == -32600
@@ -0,0 +1,51 @@
+"""
+Requests to covalent are retried with backoff, within a bounded budget
+"""
+import pytest
+
+from benchmarks.covalent_server import Faults
+from extract.covalent import Covalent
+from extract.governor import RateGovernor
+from extract.session import PooledSession, RetriesExhaustedError
+
+
+def test_retries_give_up_after_max_retries(covalent_server, governor):
+    """A request that keeps failing is attempted `max_retries + 1` times"""
+
+    covalent_server.faults = Faults(rate_error=1.0)
+    session = PooledSession(max_retries=2, backoff_base=0.0)
+    covalent = Covalent(1, session=session, cache=None, governor=governor)
+
+    with pytest.raises(RetriesExhaustedError):
+        covalent.request_latest_block_height()
+
+    assert len(covalent_server.requests) == 3
+
+    stats = session.get_stats()
+    assert stats["requests"] == 3
+    assert stats["retries"] == 2
+    assert stats["failures"] == 1
+
+
+@pytest.mark.usefixtures("covalent_server")
+def test_retries_stop_at_the_first_success(governor):
+    """Only the failed attempts are retried"""
+
+    session = PooledSession(max_retries=2, backoff_base=0.0)
+    covalent = Covalent(1, session=session, cache=None, governor=governor)
+
+    assert covalent.request_latest_block_height() == 12_000_010
+    assert session.get_stats()["retries"] == 0
+
+
+def test_governor_needs_an_api_key(monkeypatch):
+    """A missing key is reported by the name of its environment variable"""
+
+    monkeypatch.delenv("COVALENT_API_KEYS", raising=False)
+    monkeypatch.delenv("COVALENT_API_KEY", raising=False)
+
+    with pytest.raises(ValueError, match="COVALENT_API_KEY"):
+        RateGovernor.from_environ()
+
+    monkeypatch.setenv("COVALENT_API_KEY", "a")
+    assert RateGovernor.from_environ().get_stats()["throttled"] == 0
@@ -0,0 +1,119 @@
+"""
+Snapshots keep the state of a transformer as it was committed, and a rebuild
+restores it together with its block height
+"""
+from datetime import datetime
+from decimal import Decimal
+from typing import List
+
+import numpy as np
+from bson import Decimal128, ObjectId
+
+from benchmarks.memory_db import MemoryDB
+from config import Config
+from transform.hosted import get_state_version
+from transform.rebuild import rebuild
+from transform.snapshot import SnapshotStore
+
+DB_NAME = "ethereum-indexer"
+ADDRESS = "0x" + "ab" * 20
+NAME = "example_rumble_kong_league"
+PREFIX = f"{ADDRESS}-1"
+STATE = f"{PREFIX}-state"
+CHECKPOINT = f"{PREFIX}-block-height-state"
+
+
+def _get_block_heights(store: SnapshotStore) -> List[int]:
+    return [snapshot.block_height for snapshot in store.get_snapshots()]
+
+
+def test_items_round_trip(tmp_path):
+    """Mongo's values come back as themselves, the others as their json value"""
+
+    store = SnapshotStore(str(tmp_path), PREFIX)
+    item = {
+        "_id": ObjectId("62a1e2b3c4d5e6f708192a3b"),
+        "signed_at": datetime(2022, 3, 1, 12, 30, 0, 123000),
+        "bid": Decimal128("1.50"),
+        "topic": b"\x01\x02",
+        "wei": 2**70,
+        "kongs": [1, 2],
+    }
+
+    snapshot = store.save(
+        [
+            item,
+            {"_id": "a", "kongs": {3}, "bid": Decimal("2.5"), "amount": np.uint64(7)},
+        ],
+        100,
+        1,
+        4,
+    )
+
+    assert list(store.load(snapshot)) == [
+        item,
+        {"_id": "a", "kongs": [3], "bid": "2.5", "amount": 7},
+    ]
+    assert (snapshot.block_height, snapshot.state_version, snapshot.version) == (
+        100,
+        1,
+        4,
+    )
+
+
+def test_only_the_newest_snapshots_are_kept(tmp_path):
+    """Three by default, of any state version"""
+
+    store = SnapshotStore(str(tmp_path), PREFIX)
+    # * another transformer's snapshots, in the same directory
+    other = SnapshotStore(str(tmp_path), f"{PREFIX}-rkl_club_auction")
+    other.save([], 50, 1, 1)
+
+    for version, block_height in enumerate([100, 200, 300, 400, 500], start=1):
+        store.save([{"_id": version}], block_height, 1 if version < 5 else 2, version)
+
+    assert _get_block_heights(store) == [300, 400, 500]
+    assert _get_block_heights(other) == [50]
+
+    assert store.get_latest(1).block_height == 400
+    assert store.get_latest(1, max_block_height=350).block_height == 300
+    assert store.get_latest(2, max_block_height=450) is None
+
+    store.discard_after(350)
+    assert _get_block_heights(store) == [300]
+    assert _get_block_heights(other) == [50]
+
+
+def test_rebuild_restores_the_state_and_its_block_height(tmp_path, monkeypatch):
+    """The snapshots after the restored one are of the state that is rebuilt"""
+
+    monkeypatch.setenv("SNAPSHOT_DIR", str(tmp_path))
+    store = SnapshotStore(str(tmp_path), PREFIX)
+    state_version = get_state_version(NAME)
+
+    store.save([{"_id": "a", "kongs": [1]}], 100, state_version, 3)
+    store.save([{"_id": "a", "kongs": [1, 2]}], 200, state_version, 6)
+
+    db = MemoryDB()
+    db.put_item({"_id": "a", "kongs": [1, 2, 3]}, DB_NAME, STATE)
+    db.put_item({"_id": "b", "kongs": [4]}, DB_NAME, STATE)
+    db.put_item({"_id": 1, "block_height": 300, "version": 9}, DB_NAME, CHECKPOINT)
+
+    config = Config(ADDRESS, "test.log", NAME, 1)
+
+    assert rebuild(config, NAME, before_block=150, db=db) == 100
+
+    assert db.get_all_items(DB_NAME, STATE) == [{"_id": "a", "kongs": [1]}]
+    assert db.get_item(1, DB_NAME, CHECKPOINT) == {
+        "_id": 1,
+        "block_height": 100,
+        "version": 3,
+    }
+    assert _get_block_heights(store) == [100]
+
+    # * without a snapshot, the state is transformed again from the first block
+    assert rebuild(config, NAME, before_block=50, db=db) == 0
+
+    assert not db.get_all_items(DB_NAME, STATE)
+    assert db.get_item(1, DB_NAME, CHECKPOINT) is None
+    assert not _get_block_heights(store)
@@ -0,0 +1,212 @@
+"""
+The SQLite backend behaves like the mongo one, for the subset of it that the
+indexer uses
+"""
+from datetime import datetime, timezone
+from decimal import Decimal
+
+import numpy as np
+import pytest
+
+from sqlite_db import SqliteDB
+
+DB_NAME = "ethereum-indexer"
+STATE = "state"
+CHECKPOINT = "block-height-state"
+
+
+@pytest.fixture(name="db")
+def fixture_db(tmp_path) -> SqliteDB:
+    """A db on a file of its own"""
+
+    return SqliteDB(str(tmp_path / "test.sqlite"))
+
+
+def _put_holders(db: SqliteDB) -> None:
+    db.put_items(
+        [
+            {"_id": "a", "kongs": 3, "meta": {"block": 10}},
+            {"_id": "b", "kongs": 1, "meta": {"block": 12}},
+            {"_id": "c", "kongs": 7, "meta": {"block": 11}},
+            {"_id": 1, "kongs": 0, "meta": {"block": 9}},
+        ],
+        DB_NAME,
+        STATE,
+    )
+
+
+def test_queries_translate_to_json_extract(db):
+    """Equality, comparisons and `$in`, on nested fields too"""
+
+    _put_holders(db)
+
+    def get_ids(options):
+        return [item["_id"] for item in db.get_all_items(DB_NAME, STATE, options)]
+
+    by_block = {"sort": {"sort_by": "meta.block", "direction": 1}}
+
+    assert get_ids({"query_clause": {"kongs": 3}}) == ["a"]
+    assert get_ids({"query_clause": {"meta.block": {"$gt": 10}}, **by_block}) == [
+        "c",
+        "b",
+    ]
+    assert get_ids(
+        {"query_clause": {"meta.block": {"$gte": 10, "$lt": 12}}, **by_block}
+    ) == ["a", "c"]
+    assert get_ids({"query_clause": {"_id": {"$in": ["a", "c"]}}, **by_block}) == [
+        "a",
+        "c",
+    ]
+    assert get_ids(
+        {
+            "query_clause": {"kongs": {"$ne": 0}},
+            "sort": {"sort_by": "kongs", "direction": -1},
+        }
+    ) == ["c", "a", "b"]
+
+    # * 1 and "1" are different ids, like in mongo
+    assert db.get_item(1, DB_NAME, STATE)["kongs"] == 0
+    assert db.get_item("1", DB_NAME, STATE) is None
+    assert db.get_items(["c", "x", 1], DB_NAME, STATE, projection=["kongs"]) == [
+        {"_id": "c", "kongs": 7},
+        None,
+        {"_id": 1, "kongs": 0},
+    ]
+
+    with pytest.raises(ValueError):
+        get_ids({"query_clause": {"kongs": {"$regex": "1"}}})
+    with pytest.raises(ValueError):
+        get_ids({"query_clause": {"kongs') OR 1 --": 1}})
+
+
+def test_put_items_bulk_counts_duplicates(db):
+    """Existing `_id`s, and `_id`s repeated in the batch, are duplicates"""
+
+    db.put_item({"_id": "a", "kongs": 1}, DB_NAME, STATE)
+
+    counts = db.put_items_bulk(
+        [
+            {"_id": "a", "kongs": 2},
+            {"_id": "b", "kongs": 2},
+            {"_id": "b", "kongs": 3},
+            {"_id": "c", "kongs": 2},
+        ],
+        DB_NAME,
+        STATE,
+        batch_size=2,
+    )
+
+    assert counts == {"inserted": 2, "duplicates": 2}
+    # * the first write of an `_id` wins, unless it is overwritten
+    assert db.get_item("a", DB_NAME, STATE)["kongs"] == 1
+    assert db.get_item("b", DB_NAME, STATE)["kongs"] == 2
+
+    counts = db.put_items_bulk(
+        [{"_id": "a", "kongs": 5}], DB_NAME, STATE, overwrite=True
+    )
+
+    assert counts == {"inserted": 0, "duplicates": 1}
+    assert db.get_item("a", DB_NAME, STATE)["kongs"] == 5
+
+
+def test_put_items_atomic_writes_all_or_nothing(db):
+    """The state and the checkpoint are written in a single transaction"""
+
+    assert db.put_items_atomic(
+        [
+            (DB_NAME, STATE, [{"_id": "a", "kongs": 1}]),
+            (DB_NAME, CHECKPOINT, [{"_id": 1, "block_height": 1}]),
+        ]
+    )
+    assert db.get_item("a", DB_NAME, STATE) == {"_id": "a", "kongs": 1}
+    assert db.get_item(1, DB_NAME, CHECKPOINT) == {"_id": 1, "block_height": 1}
+
+    # * the checkpoint item has no `_id`, so the state write is rolled back
+    with pytest.raises(KeyError):
+        db.put_items_atomic(
+            [
+                (DB_NAME, STATE, [{"_id": "a", "kongs": 2}]),
+                (DB_NAME, CHECKPOINT, [{"block_height": 2}]),
+            ]
+        )
+
+    assert db.get_item("a", DB_NAME, STATE) == {"_id": "a", "kongs": 1}
+    assert db.get_item(1, DB_NAME, CHECKPOINT) == {"_id": 1, "block_height": 1}
+
+
+def test_iter_items_reads_in_batches(db):
+    """The cursor is read `batch_size` rows at a time, until it is exhausted"""
+
+    _put_holders(db)
+
+    items = db.iter_items(
+        DB_NAME,
+        STATE,
+        {"sort": {"sort_by": "meta.block", "direction": -1}},
+        batch_size=3,
+        projection=["kongs"],
+    )
+
+    assert list(items) == [
+        {"_id": "b", "kongs": 1},
+        {"_id": "c", "kongs": 7},
+        {"_id": "a", "kongs": 3},
+        {"_id": 1, "kongs": 0},
+    ]
+    assert not list(db.iter_items(DB_NAME, "empty"))
+
+
+def test_watch_reports_writes_of_the_item_by_other_connections(db, tmp_path):
+    """Commits that do not change the item are not reported"""
+
+    db.put_item({"_id": 1, "block_height": 1}, DB_NAME, CHECKPOINT)
+    watch = db.watch_item(1, DB_NAME, CHECKPOINT)
+
+    # * e.g. the extractor, in another process
+    writer = SqliteDB(str(tmp_path / "test.sqlite"))
+
+    try:
+        assert not watch.wait(0.1)
+
+        writer.put_item({"_id": "a", "kongs": 1}, DB_NAME, STATE)
+        assert not watch.wait(0.1)
+
+        writer.put_item({"_id": 1, "block_height": 1}, DB_NAME, CHECKPOINT)
+        assert not watch.wait(0.1)
+
+        writer.put_item({"_id": 1, "block_height": 2}, DB_NAME, CHECKPOINT)
+        assert watch.wait(1.0)
+    finally:
+        watch.close()
+
+
+def test_values_that_json_does_not_have_are_stored_as_json(db):
+    """They are read back as their closest json value"""
+
+    signed_at = datetime(2022, 3, 1, 12, 30, tzinfo=timezone.utc)
+
+    db.put_item(
+        {
+            "_id": "a",
+            "signed_at": signed_at,
+            "kongs": {3, 1},
+            "bid": Decimal("1.50"),
+            "topic": b"\x01\x02",
+            "amount": np.uint64(2**64 - 1),
+            "ids": np.array([1, 2]),
+        },
+        DB_NAME,
+        STATE,
+    )
+
+    item = db.get_item("a", DB_NAME, STATE)
+
+    assert item["signed_at"] == "2022-03-01T12:30:00+00:00"
+    assert sorted(item["kongs"]) == [1, 3]
+    assert item["bid"] == "1.50"
+    assert item["topic"] == "0x0102"
+    assert item["amount"] == 2**64 - 1
+    assert item["ids"] == [1, 2]
+
+    with pytest.raises(TypeError):
+        db.put_item({"_id": "b", "value": object()}, DB_NAME, STATE)
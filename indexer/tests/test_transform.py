@@ -0,0 +1,170 @@
+"""
+The transform host reads the raw transactions once for all of its transformers,
+each of which commits its state together with its own block height
+"""
+import sys
+import types
+from typing import Any, Dict, List, Optional, Tuple
+
+import pytest
+
+from config import Config
+from interfaces.idb import IDB
+from interfaces.itransformer import ITransformer
+from sqlite_db import SqliteDB
+from transform.main import Transform
+
+DB_NAME = "ethereum-indexer"
+ADDRESS = "0x" + "ab" * 20
+RAW = f"{ADDRESS}-1"
+NAMES = ["first_counter", "second_counter"]
+
+
+class CrashedError(Exception):
+    """Stands in for the process dying"""
+
+
+class Transformer(ITransformer):
+    """Counts the transactions of every block that it is handed"""
+
+    def __init__(
+        self,
+        address: str,
+        network_id: int,
+        db: IDB,
+        collection_name: Optional[str] = None,
+    ):
+        self._db = db
+        self._collection_name = collection_name or f"{address}-{network_id}-state"
+        self._seen: Dict[int, int] = {
+            item["_id"]: item["seen"]
+            for item in db.iter_items(DB_NAME, self._collection_name)
+        }
+        self._changed: List[int] = []
+
+    def entrypoint(self, txn: Any) -> None:
+        block_height = txn["block_height"]
+        self._seen[block_height] = self._seen.get(block_height, 0) + 1
+        self._changed.append(block_height)
+
+    def flush(self) -> None:
+        for block_height in self._changed:
+            self._db.put_item(
+                {"_id": block_height, "seen": self._seen[block_height]},
+                DB_NAME,
+                self._collection_name,
+            )
+        self._changed = []
+
+
+@pytest.fixture(name="db")
+def fixture_db(tmp_path, monkeypatch) -> SqliteDB:
+    """The db of the host, with raw transactions extracted up to block 10"""
+
+    monkeypatch.setenv("DB_BACKEND", "sqlite")
+    monkeypatch.setenv("SQLITE_PATH", str(tmp_path / "test.sqlite"))
+    monkeypatch.delenv("SNAPSHOT_DIR", raising=False)
+
+    for name in NAMES:
+        module_name = f"transformers.{name}.main"
+        module = types.ModuleType(module_name)
+        setattr(module, "Transformer", Transformer)
+        monkeypatch.setitem(sys.modules, module_name, module)
+
+    db = SqliteDB()
+    db.put_items(
+        [
+            {
+                "_id": f"txn-{block_height}",
+                "block_height": block_height,
+                "block_signed_at": "2022-01-01T00:00:00Z",
+                "log_events": [],
+            }
+            for block_height in range(1, 11)
+        ],
+        DB_NAME,
+        RAW,
+    )
+    db.put_item({"_id": 1, "block_height": 10}, DB_NAME, f"{RAW}-block-height")
+
+    return db
+
+
+def _get_state(db: SqliteDB, prefix: str) -> Tuple[Optional[int], Dict[int, int]]:
+    """
+    Returns:
+        Tuple[Optional[int], Dict[int, int]]: the block height of the state, and
+        the number of times that each block was transformed.
+    """
+
+    checkpoint = db.get_item(1, DB_NAME, f"{prefix}-block-height-state")
+    seen = {
+        item["_id"]: item["seen"]
+        for item in db.get_all_items(DB_NAME, f"{prefix}-state")
+    }
+
+    return None if checkpoint is None else checkpoint["block_height"], seen
+
+
+def test_first_transformer_keeps_the_single_transformer_collections(db):
+    """Adding a transformer to a config does not move the state of the first"""
+
+    Transform(Config(ADDRESS, "test.log", NAMES[0], 1)).transform()
+    assert _get_state(db, RAW) == (10, {block: 1 for block in range(1, 11)})
+
+    db.put_items(
+        [
+            {
+                "_id": "txn-11",
+                "block_height": 11,
+                "block_signed_at": "2022-01-01T00:00:00Z",
+                "log_events": [],
+            }
+        ],
+        DB_NAME,
+        RAW,
+    )
+    db.put_item({"_id": 1, "block_height": 11}, DB_NAME, f"{RAW}-block-height")
+
+    Transform(Config(ADDRESS, "test.log", NAMES, 1)).transform()
+
+    # * the first one only transforms the new block, the second one catches up
+    assert _get_state(db, RAW) == (11, {block: 1 for block in range(1, 12)})
+    assert _get_state(db, f"{RAW}-{NAMES[1]}") == (
+        11,
+        {block: 1 for block in range(1, 12)},
+    )
+
+
+def test_each_transformer_commits_its_state_with_its_block_height(db, monkeypatch):
+    """A crash in between the commits of the transformers transforms nothing twice"""
+
+    second_prefix = f"{RAW}-{NAMES[1]}"
+    put_items_atomic = SqliteDB.put_items_atomic
+
+    def crash_on_the_second(self, writes, write_concern=None):
+        if any(
+            collection == f"{second_prefix}-block-height-state"
+            for _, collection, _ in writes
+        ):
+            raise CrashedError()
+
+        return put_items_atomic(self, writes, write_concern)
+
+    monkeypatch.setattr(SqliteDB, "put_items_atomic", crash_on_the_second)
+
+    with pytest.raises(CrashedError):
+        Transform(Config(ADDRESS, "test.log", NAMES, 1), batch_size=3).transform()
+
+    # * the first one committed, the second one did not, and each of the states
+    # * matches its block height
+    block_height, seen = _get_state(db, RAW)
+    assert block_height is not None
+    assert seen == {block: 1 for block in range(1, block_height + 1)}
+    assert _get_state(db, second_prefix) == (None, {})
+
+    monkeypatch.setattr(SqliteDB, "put_items_atomic", put_items_atomic)
+    Transform(Config(ADDRESS, "test.log", NAMES, 1), batch_size=3).transform()
+
+    for prefix in (RAW, second_prefix):
+        assert _get_state(db, prefix) == (10, {block: 1 for block in range(1, 11)})
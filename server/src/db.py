@@ -23,13 +23,11 @@ def check_environ(env_var: str) -> None:
         raise ValueError(f"{env_var} environment variable not set.")
 
 
-check_environ("MONGO_URI")
-
-
 class DB(IDB):
     """@inheritdoc IDB"""
 
     def __init__(self):
+        check_environ("MONGO_URI")
         self.client = motor.motor_asyncio.AsyncIOMotorClient(os.getenv("MONGO_URI"))
 
     def _get_collection(self, database_name: str, collection_name: str):
@@ -83,3 +81,27 @@ class DB(IDB):
             return await cursor.to_list(length=limit)
 
         return await cursor.find().to_list(length=limit)
+
+
+def get_db() -> IDB:
+    """
+    Storage backend selected by the DB_BACKEND environment variable, like in
+    the indexer: "mongo" (the default) at MONGO_URI, or "sqlite", the indexer's
+    embedded file at SQLITE_PATH.
+
+    Returns:
+        IDB: the backend.
+    """
+
+    backend = os.getenv("DB_BACKEND", "mongo")
+
+    if backend == "mongo":
+        return DB()
+
+    if backend == "sqlite":
+        # pylint: disable=import-outside-toplevel
+        from sqlite_db import SqliteDB
+
+        return SqliteDB()
+
+    raise ValueError(f"Unknown DB_BACKEND: {backend}")
@@ -6,12 +6,12 @@
 from typing import Dict, List
 from tartiflette import Resolver
 
-from db import DB
+from db import get_db
 
 DATABASE_NAME = "ethereum-indexer"
 COLLECTION_NAME = "0xEf0182dc0574cd5874494a120750FD222FdB909a-state"
 
-db = DB()
+db = get_db()
 
 
 @Resolver("Query.kongsByAddress")
@@ -24,8 +24,12 @@ async def resolve_kongs_by_address(_parent, args, _ctx, _info) -> Dict:
     """
     wallet_address = args["address"]
 
-    result = await db.get_item(1, DATABASE_NAME, COLLECTION_NAME)
-    return result[wallet_address]
+    # * the state is one item per holder
+    result = await db.get_item(wallet_address, DATABASE_NAME, COLLECTION_NAME)
+    if result is None:
+        return []
+
+    return result["kongs"]
 
 
 @Resolver("Query.kongHolders")
@@ -38,7 +42,7 @@ async def resolve_kong_holders(_parent, _args, _ctx, _info) -> List[str]:
         Graphql schema.
     """
 
-    result = await db.get_item(1, DATABASE_NAME, COLLECTION_NAME)
+    result = await db.get_all_items(DATABASE_NAME, COLLECTION_NAME, options={})
 
-    del result["_id"]  # remove index
-    return list(result.keys())
+    # * the holders that sold all of their kongs keep an item with none
+    return [item["_id"] for item in result if len(item["kongs"]) > 0]
@@ -0,0 +1,209 @@
+"""IDB Implementation on the indexer's embedded SQLite database"""
+
+import asyncio
+import json
+import os
+import re
+import sqlite3
+import threading
+from datetime import date
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Tuple
+
+from interfaces.idb import IDB
+
+SQLITE_PATH = "ethereum-indexer.sqlite"
+# milliseconds to wait for the indexer's write lock before giving up
+BUSY_TIMEOUT = 30_000
+
+# mongo comparison operators that the queries support
+OPERATORS = {"$gt": ">", "$gte": ">=", "$lt": "<", "$lte": "<=", "$ne": "!="}
+
+FIELD_PATTERN = re.compile(r"^[A-Za-z0-9_]+(\.[A-Za-z0-9_]+)*$")
+
+
+def encode_value(value: Any) -> Any:
+    """
+    The `default` of the json encoding of the `_id`s. The indexer's `SqliteDB`
+    stores the values that json does not have as their closest json value, see
+    `encode_value` in indexer/src/sqlite_db.py, so they are looked up as such.
+
+    Raises:
+        TypeError: if the value can not be an `_id` of the indexer.
+    """
+
+    if isinstance(value, date):
+        return value.isoformat()
+
+    if isinstance(value, Decimal):
+        return str(value)
+
+    if isinstance(value, bytes):
+        return "0x" + value.hex()
+
+    raise TypeError(f"{type(value).__name__} can not be an _id in sqlite.")
+
+
+class SqliteDB(IDB):
+    """
+    @inheritdoc IDB
+
+    Reads the file that the indexer's `SqliteDB` writes, on the same host. The
+    file is in WAL mode, so reads never wait for the indexer's writes. SQLite
+    is blocking, so the queries run in the default executor.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self._path = path or os.getenv("SQLITE_PATH", SQLITE_PATH)
+        # * connections can not be shared between threads
+        self._local = threading.local()
+
+    def _get_connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+
+        if connection is None:
+            connection = sqlite3.connect(
+                self._path, timeout=BUSY_TIMEOUT / 1000, isolation_level=None
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            self._local.connection = connection
+
+        return connection
+
+    @staticmethod
+    def _get_table(database_name: str, collection_name: str) -> str:
+        return '"' + f"{database_name}.{collection_name}".replace('"', '""') + '"'
+
+    def _table_exists(self, database_name: str, collection_name: str) -> bool:
+        row = (
+            self._get_connection()
+            .execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                (f"{database_name}.{collection_name}",),
+            )
+            .fetchone()
+        )
+        return row is not None
+
+    @staticmethod
+    def _field(field: str) -> str:
+        if not FIELD_PATTERN.match(field):
+            raise ValueError(f"Unsupported field name: {field}")
+
+        return f"json_extract(doc, '$.{field}')"
+
+    def _translate_query(self, query: Dict) -> Tuple[str, List[Any]]:
+        clauses = []
+        params: List[Any] = []
+
+        for field, condition in query.items():
+            column = self._field(field)
+
+            if not isinstance(condition, dict):
+                clauses.append(f"{column} = ?")
+                params.append(condition)
+                continue
+
+            for operator, value in condition.items():
+                if operator == "$in":
+                    clauses.append(f"{column} IN ({', '.join('?' * len(value))})")
+                    params.extend(value)
+                elif operator in OPERATORS:
+                    clauses.append(f"{column} {OPERATORS[operator]} ?")
+                    params.append(value)
+                else:
+                    raise ValueError(f"Unsupported query operator: {operator}")
+
+        return " AND ".join(clauses) or "1", params
+
+    def _get_item(
+        self, identifier: str, database_name: str, collection_name: str
+    ) -> Any:
+        if not self._table_exists(database_name, collection_name):
+            return None
+
+        table = self._get_table(database_name, collection_name)
+        row = (
+            self._get_connection()
+            .execute(
+                f"SELECT doc FROM {table} WHERE _id = ?",
+                (json.dumps(identifier, default=encode_value),),
+            )
+            .fetchone()
+        )
+
+        return None if row is None else json.loads(row[0])
+
+    def _count_documents(
+        self, database_name: str, collection_name: str, options: Optional[Dict]
+    ) -> int:
+        if not self._table_exists(database_name, collection_name):
+            return 0
+
+        table = self._get_table(database_name, collection_name)
+        where, params = self._translate_query((options or {}).get("query", {}))
+
+        return (
+            self._get_connection()
+            .execute(f"SELECT COUNT(*) FROM {table} WHERE {where}", params)
+            .fetchone()[0]
+        )
+
+    def _get_all_items(
+        self,
+        database_name: str,
+        collection_name: str,
+        limit: int,
+        options: Optional[Dict],
+    ) -> List[Any]:
+        if not self._table_exists(database_name, collection_name):
+            return []
+
+        table = self._get_table(database_name, collection_name)
+        options = options or {}
+
+        where, params = self._translate_query(options.get("query", {}))
+        statement = f"SELECT doc FROM {table} WHERE {where}"
+
+        if "sort" in options:
+            # [('fieldName1', pymongo.ASCENDING), ('fieldName2', pymongo.DESCENDING)]
+            order_by = [
+                f"{self._field(field)} {'DESC' if direction == -1 else 'ASC'}"
+                for field, direction in options["sort"]
+            ]
+            statement += f" ORDER BY {', '.join(order_by)}"
+
+        # * collations are not supported, the default is binary
+        statement += " LIMIT ?"
+        params.append(limit)
+
+        return [
+            json.loads(row[0])
+            for row in self._get_connection().execute(statement, params)
+        ]
+
+    async def get_item(
+        self, identifier: str, database_name: str, collection_name: str
+    ) -> Any:
+        return await asyncio.to_thread(
+            self._get_item, identifier, database_name, collection_name
+        )
+
+    async def count_documents(
+        self, database_name: str, collection_name: str, options: Optional[Dict] = None
+    ) -> int:
+        return await asyncio.to_thread(
+            self._count_documents, database_name, collection_name, options
+        )
+
+    async def get_all_items(
+        self,
+        database_name: str,
+        collection_name: str,
+        limit: int = -1,
+        options: Optional[Dict] = None,
+    ) -> List[Any]:
+        # * a negative limit is no limit in sqlite
+        return await asyncio.to_thread(
+            self._get_all_items, database_name, collection_name, limit, options
+        )